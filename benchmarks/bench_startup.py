@@ -0,0 +1,92 @@
+"""
+Start-up time of the utclib command line tools
+
+Each command is run in a fresh interpreter, the time from the start of
+"import utclib.main" to its end is measured (the interpreter start-up itself
+is excluded) and the best of several repeats is compared to a budget:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py -r 10 --help-budget 0.2
+
+The script exits with status 1 if a command is over its budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+root = Path(__file__).resolve().parents[1]
+TEST_FILE = root / 'tests' / 'unit' / 'test_data' / 'input.tfex'
+
+SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import utclib.main as main
+sys.argv = [{name!r}] + {args!r}
+try:
+    getattr(main, {name!r})()
+except SystemExit:
+    pass
+print(json.dumps({{'elapsed': time.perf_counter() - t0}}))
+"""
+
+
+def elapsed(name, args):
+    """ Time (s) of one run of the entry point name with args
+    """
+    env = dict(os.environ, PYTHONPATH=str(root / 'src'))
+    code = SCRIPT.format(name=name, args=args)
+    out = subprocess.run([sys.executable, '-c', code], env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])['elapsed']
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Start-up time of the utclib command line tools")
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=5,
+        help="number of repeats, the best time is kept (default : 5)")
+    parser.add_argument(
+        '--help-budget',
+        type=float,
+        default=0.3,
+        help="budget (s) of the --help of each tool (default : 0.3)")
+    parser.add_argument(
+        '--convert-budget',
+        type=float,
+        default=1.0,
+        help="budget (s) of the conversion of the small test file "
+             "(default : 1.0)")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        runs = [(name + ' --help', name, ['--help'], args.help_budget)
+                for name in ('tfexconv', 'tfexdiff', 'tfexplot')]
+        runs.append(('tfexconv ' + TEST_FILE.name, 'tfexconv',
+                     ['-t', 'tfex', str(TEST_FILE),
+                      '-o', os.path.join(tmpdir, 'out.tfex')],
+                     args.convert_budget))
+        over = []
+        for label, name, cmd_args, budget in runs:
+            best = min(elapsed(name, cmd_args) for _ in range(args.repeat))
+            print("{:25s} best={:.3f} s budget={:.3f} s".format(
+                label, best, budget), file=sys.stderr)
+            if best > budget:
+                over.append(label)
+    if over:
+        for label in over:
+            print("OVER BUDGET {}".format(label), file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Benchmark suite for the utclib hot paths
+
+Each benchmark is run on synthetic data for a list of sizes (number of rows)
+and the best wall time of several repeats is stored in a JSON file, so that
+results of two releases can be compared:
+
+    python benchmarks/bench_utclib.py -n 1000 10000 100000 -o new.json
+    python benchmarks/bench_utclib.py -n 1000 10000 -o new.json -c old.json
+
+With -c, the script exits with status 1 if a benchmark is slower than the
+reference by more than the tolerance factor.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import utclib.converters as conv
+import utclib.pycggtts as pc
+import utclib.stability as stability
+import utclib.synthetic as synthetic
+from utclib import tfex
+from utclib.tabarray import tabarray
+from utclib.taiseconds import taiseconds
+
+MJD0 = 60000
+
+# Synthetic data generators
+
+
+def gen_mjd_sod(n, step=1):
+    """ n epochs starting at MJD0, every step seconds
+    """
+    t = np.arange(n, dtype=np.int64) * step
+    return MJD0 + t // 86400, t % 86400
+
+
+def gen_tfex_file(path, n):
+    synthetic.write_tfex(path, ndays=n // 86400 + 1, nlines=n)
+
+
+def gen_cggtts_file(path, n):
+    """ Single file with about 1000 lines per day
+    """
+    synthetic.write_cggtts(path, ndays=n // 1000 + 1, nlines=n)
+
+
+def gen_tsoft_file(path, n):
+    mjd, sod = gen_mjd_sod(n, 300)
+    rng = np.random.default_rng(0)
+    val = rng.normal(0, 10, n)
+    with open(path, "w") as fp:
+        fp.write("LINK/AAA__OP3-PT3 Tau0= 300s\n")
+        for m, s, v in zip(mjd, sod, val):
+            fp.write("{:.5f} {:.3f} {:.3f} {:.3f}\n".format(
+                m + s / 86400, v, v, 0))
+
+
+def gen_ippp_file(path, n):
+    mjd, sod = gen_mjd_sod(n, 30)
+    rng = np.random.default_rng(0)
+    val = rng.normal(0, 10, n)
+    with open(path, "w") as fp:
+        fp.write("LAB1 = OP\nLAB2 = PT\n@END Header\n")
+        for m, s, v in zip(mjd, sod, val):
+            fp.write("{:d} {:02d}{:02d}{:02d} {:.3f}\n".format(
+                m, s // 3600, s // 60 % 60, s % 60, v))
+
+
+# Benchmarks : each setup function returns the callable to time
+
+def setup_fromMJD(n, tmpdir):
+    mjd = MJD0 + np.arange(n) / 86400
+    return lambda: taiseconds.fromMJD(mjd)
+
+
+def setup_fromMJDSoD(n, tmpdir):
+    mjd, sod = gen_mjd_sod(n)
+    return lambda: taiseconds.fromMJDSoD(mjd, sod.astype(np.float64))
+
+
+def setup_fromUnixTime(n, tmpdir):
+    unix = 1.7e9 + np.arange(n, dtype=np.float64)
+    return lambda: taiseconds.fromUnixTime(unix)
+
+
+def setup_fromUTCCalendar(n, tmpdir):
+    ones = np.ones(n)
+    sec = np.arange(n, dtype=np.float64) % 60
+    return lambda: taiseconds.fromUTCCalendar(
+        2022 * ones, ones, ones, 0 * ones, 0 * ones, sec.copy())
+
+
+def _ts(n):
+    mjd, sod = gen_mjd_sod(n)
+    return taiseconds.fromMJDSoD(mjd, sod.astype(np.float64))
+
+
+def _uncached(getter):
+    """ Time the computation, not the lookup in the taiseconds cache
+    """
+    def call():
+        getter.__self__.clear_cache()
+        return getter()
+    return call
+
+
+def setup_getMJD(n, tmpdir):
+    return _uncached(_ts(n).getMJD)
+
+
+def setup_getIntMJDSOD(n, tmpdir):
+    return _uncached(_ts(n).getIntMJDSOD)
+
+
+def setup_getCalendarDate(n, tmpdir):
+    return _uncached(_ts(n).getCalendarDate)
+
+
+def setup_getNPDateTime(n, tmpdir):
+    return _uncached(_ts(n).getNPDateTime)
+
+
+def setup_tfex_from_file(n, tmpdir):
+    path = os.path.join(tmpdir, "bench.tfex")
+    gen_tfex_file(path, n)
+    return lambda: tfex.tfex.from_file(path)
+
+
+def setup_tfex_write_to_file(n, tmpdir):
+    path = os.path.join(tmpdir, "bench.tfex")
+    gen_tfex_file(path, n)
+    tf = tfex.tfex.from_file(path)
+    return lambda: tf.write_to_file(os.path.join(tmpdir, "out.tfex"))
+
+
+def setup_cggtts_read(n, tmpdir):
+    path = os.path.join(tmpdir, "gmxx0160.000")
+    gen_cggtts_file(path, n)
+    return lambda: pc.Cggtts().read(path)
+
+
+def setup_cggtts_write(n, tmpdir):
+    path = os.path.join(tmpdir, "gmxx0160.000")
+    gen_cggtts_file(path, n)
+    cg = pc.Cggtts()
+    cg.read(path)
+    return lambda: cg.write(tmpdir, filename="out.cggtts", force=True)
+
+
+def setup_refsys_average(n, tmpdir):
+    path = os.path.join(tmpdir, "gmxx0160.000")
+    gen_cggtts_file(path, n)
+    cg = pc.Cggtts()
+    cg.read(path)
+    return cg.refsys_weighted_average_per_epoch
+
+
+def setup_parse_tsoft(n, tmpdir):
+    path = os.path.join(tmpdir, "OP3PT3.PPPA_")
+    gen_tsoft_file(path, n)
+    return lambda: conv.parse_tsoft_file(path)
+
+
+def setup_parse_ippp(n, tmpdir):
+    path = os.path.join(tmpdir, "OPPT.ippp")
+    gen_ippp_file(path, n)
+    return lambda: conv.parse_ippp_tools_file(path)
+
+
+def setup_parse_cggtts(n, tmpdir):
+    path = os.path.join(tmpdir, "gmxx0160.000")
+    gen_cggtts_file(path, n)
+    return lambda: conv.parse_cggtts_file(path)
+
+
+def setup_tabarray_setitem(n, tmpdir):
+    t = tabarray(np.empty((n, ), dtype=[("a", np.float64), ("b", np.int32)]))
+    values = np.arange(n, dtype=np.float64)
+
+    def fill():
+        t[:, 0] = values
+        t[:, 1] = values
+    return fill
+
+
+def setup_mdev_octave(n, tmpdir):
+    x = np.cumsum(np.random.default_rng(0).normal(0, 1e-12, n))
+    return lambda: stability.deviation(x, 1., "mdev")
+
+
+# name: (setup function, largest size run by default)
+BENCHMARKS = {
+    "taiseconds.fromMJD": (setup_fromMJD, None),
+    "taiseconds.fromMJDSoD": (setup_fromMJDSoD, None),
+    "taiseconds.fromUnixTime": (setup_fromUnixTime, None),
+    "taiseconds.fromUTCCalendar": (setup_fromUTCCalendar, None),
+    "taiseconds.getMJD": (setup_getMJD, None),
+    "taiseconds.getIntMJDSOD": (setup_getIntMJDSOD, None),
+    "taiseconds.getCalendarDate": (setup_getCalendarDate, None),
+    "taiseconds.getNPDateTime": (setup_getNPDateTime, None),
+    "tfex.from_file": (setup_tfex_from_file, 10**6),
+    "tfex.write_to_file": (setup_tfex_write_to_file, 10**6),
+    "Cggtts.read": (setup_cggtts_read, 10**5),
+    "Cggtts.write": (setup_cggtts_write, 10**5),
+    "Cggtts.refsys_weighted_average_per_epoch": (setup_refsys_average,
+                                                 10**5),
+    "converters.parse_tsoft_file": (setup_parse_tsoft, 10**6),
+    "converters.parse_ippp_tools_file": (setup_parse_ippp, 10**6),
+    "converters.parse_cggtts_file": (setup_parse_cggtts, 10**5),
+    "tabarray.__setitem__": (setup_tabarray_setitem, None),
+    "stability.deviation(mdev)": (setup_mdev_octave, None),
+}
+
+
+def run(names, sizes, repeat, max_rows=None):
+    """ Run the benchmarks and return a list of result dicts
+    """
+    results = []
+    for name in names:
+        setup, default_max = BENCHMARKS[name]
+        limit = default_max if max_rows is None else max_rows
+        for n in sizes:
+            if limit is not None and n > limit:
+                continue
+            with tempfile.TemporaryDirectory() as tmpdir:
+                func = setup(n, tmpdir)
+                times = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    func()
+                    times.append(time.perf_counter() - t0)
+            res = {"name": name, "n": n, "repeat": repeat,
+                   "best_s": min(times), "mean_s": sum(times) / len(times)}
+            print("{:45s} n={:<9d} best={:.4g} s".format(
+                name, n, res["best_s"]), file=sys.stderr)
+            results.append(res)
+    return results
+
+
+def compare(results, reference, tolerance):
+    """ Return the list of (name, n, ratio) slower than reference * tolerance
+    """
+    ref = {(r["name"], r["n"]): r["best_s"] for r in reference["results"]}
+    regressions = []
+    for r in results:
+        key = (r["name"], r["n"])
+        if key not in ref or ref[key] == 0:
+            continue
+        ratio = r["best_s"] / ref[key]
+        print("{:45s} n={:<9d} x{:.2f}".format(r["name"], r["n"], ratio),
+              file=sys.stderr)
+        if ratio > tolerance:
+            regressions.append((r["name"], r["n"], ratio))
+    return regressions
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark suite for the utclib hot paths")
+    parser.add_argument(
+        '-n', '--sizes',
+        type=float,
+        nargs='+',
+        default=[1e3, 1e4, 1e5],
+        help="number of rows (default : 1e3 1e4 1e5)")
+    parser.add_argument(
+        '-b', '--bench',
+        nargs='+',
+        default=list(BENCHMARKS),
+        choices=list(BENCHMARKS),
+        help="benchmarks to run (default : all)")
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=3,
+        help="number of repeats, the best time is kept (default : 3)")
+    parser.add_argument(
+        '--max-rows',
+        type=float,
+        help="override the per-benchmark size limit (slow pure python paths)")
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        default="bench_output.json",
+        help="JSON output file (default : bench_output.json)")
+    parser.add_argument(
+        '-c', '--compare',
+        type=str,
+        help="reference JSON file to compare with")
+    parser.add_argument(
+        '-t', '--tolerance',
+        type=float,
+        default=1.25,
+        help="slowdown factor reported as a regression (default : 1.25)")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+    sizes = [int(n) for n in args.sizes]
+    max_rows = None if args.max_rows is None else int(args.max_rows)
+    results = run(args.bench, sizes, args.repeat, max_rows)
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as fp:
+        json.dump(report, fp, indent=1)
+    if args.compare:
+        with open(args.compare) as fp:
+            reference = json.load(fp)
+        regressions = compare(results, reference, args.tolerance)
+        if regressions:
+            for name, n, ratio in regressions:
+                print("REGRESSION {} n={} x{:.2f}".format(name, n, ratio),
+                      file=sys.stderr)
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
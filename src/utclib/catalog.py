@@ -0,0 +1,273 @@
+"""
+catalog  - A persistent SQLite index of CGGTTS and tfex archives
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Usage:
+
+    cat = catalog.Catalog("archive.sqlite")
+    cat.update(["/data/cggtts", "/data/links"])
+    rows = cat.find_cggtts(const="GAL", lab="XX", mjd_start=60000,
+                           mjd_stop=60030)
+    links = cat.load_tfex(ts="UTC(PTB)", mjd_start=60250, mjd_stop=60260)
+
+CGGTTS files are recognized by their name (see Cggtts.gen_filename), tfex
+files by their ".tfex" extension, both possibly followed by a compression
+extension (see utclib.compression). Only the headers are read. A file is
+indexed again only when its size or mtime changed.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+
+from utclib import profiling
+from utclib.compression import split_ext
+
+# x f ll mo MJ.DDD, see Cggtts.parse_filename
+CGGTTS_NAME = re.compile(r"^[grecj][smz]\w{4}\d{2}\.\d{3}$", re.IGNORECASE)
+TFEX_EXT = ".tfex"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, kind TEXT, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS cggtts (
+    path TEXT PRIMARY KEY, const TEXT, freq_code TEXT, lab TEXT, rcvr TEXT,
+    mjd INTEGER, frc TEXT, lab_name TEXT, rcvr_name TEXT,
+    iono INTEGER);
+CREATE INDEX IF NOT EXISTS cggtts_query ON cggtts (const, lab, mjd);
+CREATE TABLE IF NOT EXISTS tfex (
+    path TEXT PRIMARY KEY, mjd_start REAL, mjd_stop REAL,
+    sampling_s REAL, ndata INTEGER, labels TEXT, refpoints TEXT);
+CREATE TABLE IF NOT EXISTS refpoints (
+    path TEXT, id TEXT, ts TEXT, dev TEXT, type TEXT);
+CREATE INDEX IF NOT EXISTS refpoints_ts ON refpoints (ts);
+CREATE INDEX IF NOT EXISTS refpoints_path ON refpoints (path);
+"""
+
+
+def file_kind(name):
+    """ 'cggtts', 'tfex' or None, according to the file name
+    """
+    name, _ = split_ext(name)
+    if CGGTTS_NAME.match(name):
+        return 'cggtts'
+    if name.endswith(TFEX_EXT):
+        return 'tfex'
+    return None
+
+
+class Catalog:
+    """ Index of the CGGTTS and tfex files found under some directories
+    """
+    def __init__(self, db_path):
+        """
+        Parameters
+        ----------
+        db_path : str
+            SQLite database, created if needed
+        """
+        self.db_path = db_path
+        self.con = sqlite3.connect(db_path)
+        self.con.row_factory = sqlite3.Row
+        self.con.executescript(SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def scan(self, directory):
+        """ Yield (path, kind, size, mtime_ns) of the indexable files under
+        directory
+        """
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as err:
+            logging.warning("Cannot scan %s: %s" % (directory, err))
+            return
+        for entry in entries:
+            if entry.is_dir():
+                yield from self.scan(entry.path)
+                continue
+            kind = file_kind(entry.name)
+            if kind is None:
+                continue
+            st = entry.stat()
+            yield (os.path.abspath(entry.path), kind, st.st_size,
+                   st.st_mtime_ns)
+
+    @profiling.profiled("catalog.update")
+    def update(self, directories):
+        """ Index new and modified files, forget deleted ones
+
+        Parameters
+        ----------
+        directories : list of str
+
+        Returns
+        -------
+        int : number of files (re)indexed
+        """
+        known = {row['path']: (row['size'], row['mtime_ns'])
+                 for row in self.con.execute(
+                     "SELECT path, size, mtime_ns FROM files")}
+        nindexed = 0
+        with self.con:
+            for directory in directories:
+                root = os.path.join(os.path.abspath(directory), "")
+                seen = set()
+                for path, kind, size, mtime_ns in self.scan(directory):
+                    seen.add(path)
+                    if known.get(path) == (size, mtime_ns):
+                        continue
+                    self.forget(path)
+                    try:
+                        if kind == 'cggtts':
+                            self.index_cggtts(path)
+                        else:
+                            self.index_tfex(path)
+                    except (SystemExit, Exception) as err:
+                        logging.warning("Cannot index %s: %s" % (path, err))
+                        continue
+                    self.con.execute(
+                        "INSERT INTO files VALUES (?, ?, ?, ?)",
+                        (path, kind, size, mtime_ns))
+                    nindexed += 1
+                for path in known:
+                    if path.startswith(root) and path not in seen:
+                        self.forget(path)
+        return nindexed
+
+    def forget(self, path):
+        for table in ("files", "cggtts", "tfex", "refpoints"):
+            self.con.execute(
+                "DELETE FROM {} WHERE path = ?".format(table), (path, ))
+
+    def index_cggtts(self, path):
+        import utclib.pycggtts as pc
+
+        cg = pc.Cggtts()
+        cg.read_header(path)
+        name = os.path.basename(split_ext(path)[0])
+        self.con.execute(
+            "INSERT INTO cggtts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, cg.const, name[1].upper(), name[2:4].upper(),
+             name[4:6].upper(), cg.mjd, cg.freq, cg.header['LAB'],
+             cg.header['RCVR'], int(cg.iono_avail)))
+
+    def index_tfex(self, path):
+        import utclib.tfexhdr as tfexhdr
+
+        hdr = tfexhdr.tfexhdr()
+        hdr.read(path)
+        refpoints = hdr.REFPOINTS or []
+        labels = [c['label'] for c in hdr.COLUMNS or []]
+        self.con.execute(
+            "INSERT INTO tfex VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, hdr.MJDSTART, hdr.MJDSTOP, hdr.SAMPLING_INTERVAL_s,
+             hdr.NDATA, json.dumps(labels), json.dumps(refpoints)))
+        self.con.executemany(
+            "INSERT INTO refpoints VALUES (?, ?, ?, ?, ?)",
+            [(path, rp.get('id'), rp.get('ts'), rp.get('dev'), rp.get('type'))
+             for rp in refpoints])
+
+    def find_cggtts(self, const=None, freq_code=None, lab=None, rcvr=None,
+                    frc=None, mjd_start=None, mjd_stop=None):
+        """ CGGTTS files matching all the given criteria
+
+        Parameters
+        ----------
+        const : str (opt)
+            constellation (GPS, GAL...)
+        freq_code : str (opt)
+            S, M or Z (2nd character of the file name)
+        lab, rcvr : str (opt)
+            2-character lab and receiver identifiers of the file name
+        frc : str (opt)
+            frequency of the FRC column (L3P, E1...)
+        mjd_start, mjd_stop : int (opt)
+            first and last day
+
+        Returns
+        -------
+        list of sqlite3.Row (path, const, freq_code, lab, rcvr, mjd, frc,
+        lab_name, rcvr_name, iono), sorted by MJD
+        """
+        where = []
+        args = []
+        for col, val in (("const", const), ("freq_code", freq_code),
+                         ("lab", lab), ("rcvr", rcvr), ("frc", frc)):
+            if val is not None:
+                where.append("{} = ?".format(col))
+                args.append(val.upper())
+        if mjd_start is not None:
+            where.append("mjd >= ?")
+            args.append(mjd_start)
+        if mjd_stop is not None:
+            where.append("mjd <= ?")
+            args.append(mjd_stop)
+        query = "SELECT * FROM cggtts"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        return self.con.execute(query + " ORDER BY mjd, path", args).fetchall()
+
+    def find_tfex(self, ts=None, dev=None, mjd_start=None, mjd_stop=None):
+        """ tfex files with a REFPOINT matching ts / dev, and overlapping
+        [mjd_start, mjd_stop]
+
+        Returns
+        -------
+        list of sqlite3.Row (path, mjd_start, mjd_stop, sampling_s, ndata,
+        labels, refpoints), sorted by MJDSTART. labels and refpoints are
+        JSON strings.
+        """
+        where = []
+        args = []
+        if ts is not None or dev is not None:
+            sub = "path IN (SELECT path FROM refpoints WHERE 1"
+            if ts is not None:
+                sub += " AND ts = ?"
+                args.append(ts)
+            if dev is not None:
+                sub += " AND dev = ?"
+                args.append(dev)
+            where.append(sub + ")")
+        if mjd_start is not None:
+            where.append("(mjd_stop IS NULL OR mjd_stop >= ?)")
+            args.append(mjd_start)
+        if mjd_stop is not None:
+            where.append("(mjd_start IS NULL OR mjd_start <= ?)")
+            args.append(mjd_stop)
+        query = "SELECT * FROM tfex"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        return self.con.execute(query + " ORDER BY mjd_start, path",
+                                args).fetchall()
+
+    def load_tfex(self, ts=None, dev=None, mjd_start=None, mjd_stop=None,
+                  **kwargs):
+        """ Read the tfex files returned by find_tfex, restricted to
+        [mjd_start, mjd_stop]. Other keyword arguments are passed to
+        tfex.from_file (columns, cache, lazy).
+
+        Returns
+        -------
+        list of utclib.tfex.tfex
+        """
+        import utclib.tfex as tfex
+
+        return [tfex.tfex.from_file(row['path'], mjd_start=mjd_start,
+                                    mjd_stop=mjd_stop, **kwargs)
+                for row in self.find_tfex(ts, dev, mjd_start, mjd_stop)]
@@ -0,0 +1,300 @@
+"""
+chaining  - Compute composite links from the REFPOINTS / trip metadata
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Conventions:
+
+- a trip leg 'XY' (or 'X-Y' for longer REFPOINT ids) is the time difference
+  X - Y. A trip ['AB', 'CE'] is the sum (A - B) + (C - E): consecutive legs
+  are joined through B and C, which should belong to the same node.
+- the node of a REFPOINT is its time scale ('ts'), or its device ('dev') if
+  the time scale is unknown. Each data column with a trip is an edge of the
+  graph, between the nodes of the first and of the last REFPOINT.
+- CONSTANT_DELAYS whose legs all belong to the trip of a column, or which
+  extend it at one of its ends, are added to this column (see
+  utclib.delays).
+
+    net = chaining.Network([tf1, tf2, tf3])
+    tf_ac = net.compute("UTC(A)", "UTC(C)")   # (A - B) + (B - C)
+    everything = net.all_pairs()
+
+Epochs are aligned exactly (nanosecond keys, see epoch_keys): a composite
+link only has the epochs common to all the links used.
+"""
+import logging
+import numpy as np
+
+from utclib import profiling
+from utclib.tabarray import tabarray
+from utclib.taiseconds import taiseconds
+
+UNKNOWN_TS = (None, "", "Unknown")
+NS = 10**9
+
+
+def parse_leg(leg):
+    """ 'XY' or 'X-Y' -> (X, Y)
+    """
+    if "-" in leg:
+        start, end = leg.split("-", 1)
+        return start.strip(), end.strip()
+    if len(leg) != 2:
+        logging.error("Cannot parse trip %s, use 'X-Y'" % leg)
+        raise SystemExit
+    return leg[0], leg[1]
+
+
+def refpoint_nodes(hdr):
+    """ {REFPOINT id: node name} of a tfex header
+    """
+    nodes = {}
+    for rp in hdr.REFPOINTS or []:
+        ts = rp.get("ts")
+        nodes[rp["id"]] = rp.get("dev") if ts in UNKNOWN_TS else ts
+    return nodes
+
+
+def epoch_keys(timestamps):
+    """ Integer nanoseconds since the TAI origin, used to match epochs
+    exactly
+    """
+    tai = timestamps.getTaiSeconds()
+    frac_ns = np.round(tai[:, 1] / (taiseconds.FRAC_MULTIPLIER / NS))
+    return tai[:, 0] * NS + frac_ns.astype(np.int64)
+
+
+def keys_to_taiseconds(keys):
+    obj = taiseconds()
+    obj.tai_seconds = np.zeros((len(keys), 2), np.int64)
+    obj.tai_seconds[:, 0] = keys // NS
+    obj.tai_seconds[:, 1] = (keys % NS) * int(taiseconds.FRAC_MULTIPLIER // NS)
+    return obj
+
+
+def constant_delay_ns(tf, trip):
+    """ Sum of the CONSTANT_DELAYS of tf applying to trip, in ns, and the
+    trip extended by them (see utclib.delays)
+    """
+    from utclib.delays import matching_delays, convert
+
+    delays, trip = matching_delays(tf.hdr, trip)
+    return sum(convert(d["value"], d.get("unit", "si:nanosecond"),
+                       "si:nanosecond") for d in delays), trip
+
+
+class Link:
+    """ A data column of a tfex object, seen as the time difference
+    start - end, in ns
+    """
+    def __init__(self, tf, label, start, end, delay_ns=0.):
+        self.tf = tf
+        self.label = label
+        self.start = start
+        self.end = end
+        self.delay_ns = delay_ns
+        self._keys = None
+        self._values = None
+
+    def __repr__(self):
+        return "Link({} - {}, {})".format(self.start, self.end, self.label)
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = epoch_keys(self.tf.timestamps)
+        return self._keys
+
+    @property
+    def values_ns(self):
+        if self._values is None:
+            from utclib.tfex import unit_scales
+
+            col = [c for c in self.tf.hdr.COLUMNS
+                   if c["label"] == self.label][0]
+            scale = unit_scales[col["unit"]] * NS
+            self._values = (np.asarray(self.tf.get_values(self.label),
+                                       dtype=np.float64) * scale
+                            + self.delay_ns)
+        return self._values
+
+
+def links_from_tfex(tf):
+    """ Links of the data columns of tf having a trip
+
+    Returns
+    -------
+    list of Link
+    """
+    from utclib.tfex import unit_scales
+
+    nodes = refpoint_nodes(tf.hdr)
+    links = []
+    for col in tf.hdr.COLUMNS:
+        if col.get("timetag") or not col.get("trip"):
+            continue
+        if col.get("unit") not in unit_scales:
+            logging.warning("Column %s is not a time difference, ignored"
+                            % col["label"])
+            continue
+        delay_ns, trip = constant_delay_ns(tf, col["trip"])
+        legs = [parse_leg(leg) for leg in trip]
+        try:
+            path = [(nodes[a], nodes[b]) for a, b in legs]
+        except KeyError as err:
+            logging.error("REFPOINT %s used in a trip is not defined" % err)
+            raise SystemExit
+        for (_, end), (start, _) in zip(path[:-1], path[1:]):
+            if end != start:
+                logging.warning("Trip %s of %s is not continuous (%s, %s)"
+                                % (trip, col["label"], end, start))
+        links.append(Link(tf, col["label"], path[0][0], path[-1][1],
+                          delay_ns))
+    return links
+
+
+class Network:
+    """ Graph of time scales connected by links
+    """
+    def __init__(self, tf_list=()):
+        self.links = []
+        # node -> list of (neighbour, link, sign)
+        self.graph = {}
+        for tf in tf_list:
+            self.add(tf)
+
+    def add(self, tf):
+        """ Add the links of a tfex object
+        """
+        for link in links_from_tfex(tf):
+            if link.start == link.end:
+                continue
+            self.links.append(link)
+            self.graph.setdefault(link.start, []).append(
+                (link.end, link, 1))
+            self.graph.setdefault(link.end, []).append(
+                (link.start, link, -1))
+
+    def nodes(self):
+        return sorted(self.graph)
+
+    def path(self, start, end):
+        """ Shortest chain of links from start to end (breadth-first)
+
+        Returns
+        -------
+        list of (Link, sign) : start - end = sum of sign * link, or None
+        if the nodes are not connected
+        """
+        if start not in self.graph or end not in self.graph:
+            return None
+        previous = {start: None}
+        queue = [start]
+        for node in queue:
+            if node == end:
+                break
+            for neighbour, link, sign in self.graph[node]:
+                if neighbour not in previous:
+                    previous[neighbour] = (node, link, sign)
+                    queue.append(neighbour)
+        if end not in previous:
+            return None
+        chain = []
+        node = end
+        while previous[node] is not None:
+            node, link, sign = previous[node]
+            chain.append((link, sign))
+        return chain[::-1]
+
+    @profiling.profiled("chaining.compute")
+    def compute(self, start, end):
+        """ Composite link start - end
+
+        Returns
+        -------
+        utclib.tfex.tfex : one column 'delta_t' in ns, on the epochs common
+        to all the links of the chain, or None if not connected
+        """
+        chain = self.path(start, end)
+        if chain is None:
+            logging.warning("No path between %s and %s" % (start, end))
+            return None
+        keys = None
+        for link, sign in chain:
+            if keys is None:
+                keys = link.keys
+                values = sign * link.values_ns
+                continue
+            keys, i1, i2 = np.intersect1d(keys, link.keys,
+                                          return_indices=True)
+            values = values[i1] + sign * link.values_ns[i2]
+        return make_tfex(start, end, keys, values, chain)
+
+    def all_pairs(self, nodes=None, max_workers=None):
+        """ Composite links between all pairs of nodes, computed in
+        parallel threads
+
+        Parameters
+        ----------
+        nodes : list of str (opt)
+            nodes to consider, default all
+        max_workers : int (opt)
+            passed to ThreadPoolExecutor
+
+        Returns
+        -------
+        dict {(start, end): tfex} for start < end, connected pairs only
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if nodes is None:
+            nodes = self.nodes()
+        nodes = sorted(nodes)
+        pairs = [(a, b) for i, a in enumerate(nodes) for b in nodes[i + 1:]
+                 if self.path(a, b) is not None]
+        # Decode all the links once, before sharing them between threads
+        for link in self.links:
+            link.keys
+            link.values_ns
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(lambda pair: self.compute(*pair), pairs)
+            return dict(zip(pairs, results))
+
+
+def make_tfex(start, end, keys, values, chain=()):
+    """ tfex object of the time difference start - end
+    """
+    import utclib.tfex as tfex
+
+    tf = tfex.tfex()
+    tf.hdr.TFEXVER = "0.2"
+    tf.hdr.PREFIX = {'si': 'https://si-digital-framework.org/SI/units/'}
+    tf.hdr.add_refpoint(rp_id="A", rp_ts=start)
+    tf.hdr.add_refpoint(rp_id="B", rp_ts=end)
+    tf.hdr.COLUMNS = [
+        {'timetag': True, 'label': 'MJD', 'scale': 'utc', 'unit': 'si:day',
+         'format': '5d'},
+        {'timetag': True, 'label': 'SoD', 'scale': 'utc',
+         'unit': 'si:second', 'format': '9.3f'},
+        {'label': 'delta_t', 'trip': ['AB'], 'unit': 'si:nanosecond',
+         'format': '12.3f'}]
+    tf.hdr.NDATA = len(keys)
+    tf.hdr.COMMENT = "Chained: " + " ".join(
+        "{}{}".format("+" if sign > 0 else "-", link) for link, sign in chain)
+    tf.parse_dtypes()
+    tf.data = tabarray(np.empty((len(keys), ), dtype=[('delta_t', np.float64)]))
+    tf.data[:, 0] = values
+    tf.timestamps = keys_to_taiseconds(keys)
+    return tf
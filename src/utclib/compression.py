@@ -0,0 +1,71 @@
+"""
+compression  - Transparent access to gzip, bzip2 and xz compressed files
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+The compression is chosen from the file extension. Compressed files are
+(de)compressed as a stream while the readers iterate on lines: no
+temporary copy is made.
+"""
+import os
+
+# Extension -> name of the standard library module
+EXTENSIONS = {".gz": "gzip",
+              ".bz2": "bz2",
+              ".xz": "lzma"}
+
+
+def split_ext(path):
+    """ Split path into (uncompressed path, compression extension or "")
+    """
+    root, ext = os.path.splitext(str(path))
+    if ext.lower() in EXTENSIONS:
+        return root, ext
+    return str(path), ""
+
+
+def open_text(path, mode="r", errors=None):
+    """ Open a text file, compressed or not according to its extension
+
+    Parameters
+    ----------
+    path : str
+    mode : str
+        "r", "w" or "a"
+    errors : str (opt)
+        passed to open(), e.g. 'replace'
+
+    Returns
+    -------
+    text file object
+    """
+    _, ext = split_ext(path)
+    if not ext:
+        return open(path, mode, errors=errors)
+    import importlib
+    module = importlib.import_module(EXTENSIONS[ext.lower()])
+    return module.open(path, mode + "t", errors=errors)
+
+
+def find_variant(path):
+    """ Return path if it exists, otherwise the first existing compressed
+    variant of it (path.gz, path.bz2, path.xz), or None
+    """
+    if os.path.exists(path):
+        return path
+    for ext in EXTENSIONS:
+        if os.path.exists(str(path) + ext):
+            return str(path) + ext
+    return None
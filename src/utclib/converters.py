@@ -1,10 +1,12 @@
 """ Utilities to convert to / from tfex
 """
 
-import utclib.tfex as tfex
-import numpy as np
+import logging
 import re
 
+from utclib import profiling
+from utclib.compression import open_text
+
 
 def hhmmss2d(hhmmss):
     hh = int(hhmmss[:2])
@@ -18,14 +20,18 @@ def hhmmss2s(hhmmss_as_int):
     ss = hhmmss_as_int % 100
     return hh * 3600 + mm * 60 + ss
 
+@profiling.profiled("converters.parse_tsoft_file")
 def parse_tsoft_file(filename):
+    import numpy as np
+    import utclib.tfex as tfex
+    from utclib.taiseconds import decimal_from_text, seconds_from_day_fraction
     first_line = True
     rem = "____"
     loc = "____"
     tech = "Unknown" # Can be : GPSP3, GPSPPP, TWSTFT, etc...
     tau0 = None
-    mjd = []
-    sod = []
+    mjd_text = []
+    last_day = 0
     val = []
     smo = []
     dlt = []
@@ -50,7 +56,7 @@ def parse_tsoft_file(filename):
             tech = tc
 
     pattern_tau0 = r"Tau0=\s*(?P<tau0>\d+)s"
-    with open(filename) as fp:
+    with open_text(filename) as fp:
         for line in fp:
             ls = line.split()
             if first_line:
@@ -71,11 +77,12 @@ def parse_tsoft_file(filename):
             if len(ls) != 4:
                 continue
             try:
-                if len(mjd) != 0 and float(ls[0]) < mjd[-1]:
+                day = float(ls[0])
+                if day < last_day:
                     break
-                mjd.append(int(np.floor(float(ls[0]))))
-                sod.append(int(np.floor((float(ls[0])%1 * 86400))))
                 val.append(float(ls[1]))
+                mjd_text.append(ls[0])
+                last_day = int(day)
                 try:
                     smo.append(float(ls[2]))
                 except ValueError:
@@ -88,6 +95,18 @@ def parse_tsoft_file(filename):
             except ValueError:
                 continue
 
+    # Fractional MJDs decoded exactly, rounded to the second (5 decimals
+    # of a day are 0.864 s)
+    decoded = decimal_from_text(mjd_text)
+    if decoded is None:
+        logging.error("Invalid MJDs in %s" % filename)
+        raise SystemExit
+    mjd, day_frac = decoded
+    sod, frac = seconds_from_day_fraction(day_frac)
+    sod += frac >= 10**16 // 2
+    mjd += sod // 86400
+    sod %= 86400
+
     tf = tfex.tfex.from_arrays([
         (mjd,
          {'timetag': True,
@@ -125,16 +144,18 @@ def parse_tsoft_file(filename):
     return tf
 
 
+@profiling.profiled("converters.parse_ippp_tools_file")
 def parse_ippp_tools_file(filename):
     """ Converts from the custom "IPPP tools" format
     """
+    import utclib.tfex as tfex
     lab1 = ""
     lab2 = ""
     sign_changed = False
     mjd = []
     sod = []
     val = []
-    with open(filename) as fp:
+    with open_text(filename) as fp:
         for line in fp:
             if "LAB1 =" in line:
                 lab1 = line.split()[2]
@@ -153,7 +174,7 @@ def parse_ippp_tools_file(filename):
                 if not sign_changed:
                     val_i = -float(val_i)
                 mjd.append(int(mjd_i))
-                sod.append(int(hhmmss2s(hhmmss_i)))
+                sod.append(int(hhmmss2s(int(hhmmss_i))))
                 val.append(float(val_i))
             except ValueError:
                 continue
@@ -186,9 +207,11 @@ def parse_ippp_tools_file(filename):
     return tf
 
 
+@profiling.profiled("converters.parse_cggtts_file")
 def parse_cggtts_file(filename):
     """ Convert the REFSYS values from a CGGTTS file into a TFEX object
     """
+    import utclib.tfex as tfex
     import utclib.pycggtts as pc
     cg = pc.Cggtts()
     cg.read(filename)
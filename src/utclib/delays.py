@@ -0,0 +1,233 @@
+"""
+delays  - Apply CONSTANT_DELAYS and calibration corrections to tfex links
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+A CONSTANT_DELAYS entry applies to a data column when all the legs of its
+trip belong to the trip of the column (a correction of these legs), or when
+it extends the trip of the column: its first leg starts at the last REFPOINT
+of the trip, or its last leg ends at the first one (see utclib.chaining for
+the trip conventions). With the trip ['AB', 'CE'], a delay ['ED'] gives
+(A - B) + (C - E) + (E - D), and the trip of the column becomes
+['AB', 'CE', 'ED'] once the delay is applied. Its value, converted to the
+unit of the column, is added to the column. Corrections are made in place on the field views of the data
+array: no copy of the table is made. Scaled integer columns (see
+tfex.from_file) are corrected by whole counts of their last decimal, and
+only rebuilt if they need to be widened to int64.
+
+Time-varying calibrations are tfex step series: each value is valid from its
+epoch until the epoch of the next line.
+
+    delays.apply_constant_delays(tf)
+    delays.apply_calibration(tf, 'delta_t', tfex.tfex.from_file('cal.tfex'))
+"""
+import logging
+import numpy as np
+
+from utclib import profiling
+from utclib.chaining import epoch_keys, parse_leg
+
+
+def matching_delays(hdr, trip):
+    """ CONSTANT_DELAYS of hdr applying to trip
+
+    The delays are taken in the order of the header, each extension moving
+    the end of the trip it is joined to.
+
+    Parameters
+    ----------
+    hdr : utclib.tfex.tfexheader
+    trip : list of str
+
+    Returns
+    -------
+    (list of delays, trip extended by the delays)
+    """
+    legs = [parse_leg(leg) for leg in trip]
+    trip = list(trip)
+    delays = []
+    for delay in hdr.CONSTANT_DELAYS or []:
+        delay_legs = [parse_leg(leg) for leg in delay["trip"]]
+        if set(delay_legs) <= set(legs):
+            pass
+        elif delay_legs[0][0] == legs[-1][1]:
+            legs, trip = legs + delay_legs, trip + list(delay["trip"])
+        elif delay_legs[-1][1] == legs[0][0]:
+            legs, trip = delay_legs + legs, list(delay["trip"]) + trip
+        else:
+            continue
+        delays.append(delay)
+    return delays, trip
+
+
+def convert(value, unit, to_unit):
+    """ Convert a time value between two units of tfex.unit_scales
+    """
+    from utclib.tfex import unit_scales
+
+    for u in (unit, to_unit):
+        if u not in unit_scales:
+            logging.error("Not a time unit: %s" % u)
+            raise SystemExit
+    return value * (unit_scales[unit] / unit_scales[to_unit])
+
+
+def _add(tf, label, values):
+    """ Add values (in the unit of the column, NaN : undefined) to a data
+    column, in place. Values are left unchanged where the correction is
+    undefined, and flagged invalid in the validity mask of the column.
+    """
+    from utclib.tfex import widen_add
+
+    values = np.asarray(values, dtype=np.float64)
+    undefined = np.isnan(values)
+    values = np.where(undefined, 0., values)
+    if label not in tf.scales:
+        field = _field(tf, label)
+        field += values
+    else:
+        counts = values * 10.0**tf.scales[label]
+        rounded = np.round(counts)
+        if np.any(np.abs(counts - rounded) > 1e-6):
+            logging.warning("Correction of %s rounded to the precision of "
+                            "the column" % label)
+        if not tf.data[label].flags.writeable:
+            logging.error("Column %s is read-only (memory-mapped file?)"
+                          % label)
+            raise SystemExit
+        tf.set_column(label, widen_add(tf.data[label],
+                                       rounded.astype(np.int64)))
+    if np.any(undefined):
+        valid = tf.data.get_valid(label)
+        tf.data.set_valid(label, ~undefined if valid is None
+                          else valid & ~undefined)
+
+
+def _field(tf, label):
+    """ Writable float view of a data column
+    """
+    field = tf.data[label]
+    if field.dtype.kind != "f":
+        logging.error("Column %s should contain floats" % label)
+        raise SystemExit
+    if not field.flags.writeable:
+        logging.error("Column %s is read-only (memory-mapped file?)" % label)
+        raise SystemExit
+    return field
+
+
+@profiling.profiled("delays.apply_constant_delays")
+def apply_constant_delays(tf, remove=True):
+    """ Add the CONSTANT_DELAYS to the data columns they apply to
+
+    Parameters
+    ----------
+    tf : utclib.tfex.tfex or list of them
+    remove : bool
+        remove the applied delays from the header, so that applying twice
+        has no effect
+
+    Returns
+    -------
+    list of (label, delay) applied (for a list input: list of such lists)
+    """
+    if isinstance(tf, (list, tuple)):
+        return [apply_constant_delays(t, remove) for t in tf]
+    applied = []
+    for col in tf.hdr.COLUMNS:
+        if col.get("timetag") or not col.get("trip"):
+            continue
+        delays, trip = matching_delays(tf.hdr, col["trip"])
+        if not delays:
+            continue
+        col["trip"] = trip
+        total = sum(convert(d["value"], d.get("unit", "si:nanosecond"),
+                            col.get("unit")) for d in delays)
+        _add(tf, col["label"], total)
+        applied += [(col["label"], d) for d in delays]
+    if remove and applied:
+        used = [d for _, d in applied]
+        left = [d for d in tf.hdr.CONSTANT_DELAYS
+                if not any(d is u for u in used)]
+        tf.hdr.CONSTANT_DELAYS = left or None
+    return applied
+
+
+def step_values(cal, cal_label, timestamps):
+    """ Value of a step series at the given epochs
+
+    Parameters
+    ----------
+    cal : utclib.tfex.tfex
+        step series, each value valid until the next epoch
+    cal_label : str
+        column of cal
+    timestamps : utclib.taiseconds.taiseconds
+
+    Returns
+    -------
+    numpy array, NaN before the first epoch of cal
+    """
+    keys = epoch_keys(cal.timestamps)
+    values = np.asarray(cal.get_values(cal_label), dtype=np.float64)
+    order = np.argsort(keys, kind="stable")
+    idx = np.searchsorted(keys[order], epoch_keys(timestamps),
+                          side="right") - 1
+    out = values[order][np.maximum(idx, 0)]
+    out[idx < 0] = np.nan
+    return out
+
+
+@profiling.profiled("delays.apply_calibration")
+def apply_calibration(tf, label, cal, cal_label=None, sign=1):
+    """ Add a time-varying calibration to a data column, in place
+
+    Parameters
+    ----------
+    tf : utclib.tfex.tfex or list of them
+    label : str
+        column to correct
+    cal : utclib.tfex.tfex
+        step series of the calibration
+    cal_label : str (opt)
+        column of cal, default : its first data column
+    sign : int
+        1 to add the calibration, -1 to remove it
+
+    Returns
+    -------
+    int : number of values left uncorrected (epochs before the first
+    calibration). They keep their value and are flagged invalid in the
+    validity mask of the column (see tabarray.set_valid)
+    """
+    if isinstance(tf, (list, tuple)):
+        return sum(apply_calibration(t, label, cal, cal_label, sign)
+                   for t in tf)
+    if cal_label is None:
+        cal_label = cal.data.dtype.names[0]
+    unit = [c.get("unit") for c in tf.hdr.COLUMNS if c["label"] == label]
+    cal_unit = [c.get("unit") for c in cal.hdr.COLUMNS
+                if c["label"] == cal_label]
+    if not unit or not cal_unit:
+        logging.error("Unknown column %s or %s" % (label, cal_label))
+        raise SystemExit
+    values = convert(step_values(cal, cal_label, tf.timestamps),
+                     cal_unit[0], unit[0])
+    undefined = np.count_nonzero(np.isnan(values))
+    if undefined:
+        logging.warning("%d epochs before the first calibration of %s"
+                        % (undefined, label))
+    _add(tf, label, sign * values)
+    return undefined
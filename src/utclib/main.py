@@ -1,7 +1,19 @@
 import argparse
 import os
 import logging
-import utclib.tfex as tfex
+from utclib import profiling
+
+# Profiling
+
+def start_profiling(args):
+    if args.profile:
+        profiling.enable()
+
+
+def stop_profiling(args):
+    if args.profile:
+        profiling.dump(args.profile)
+        profiling.disable()
 
 # Convert
 
@@ -18,22 +30,33 @@ def get_parser_conv():
     parser.add_argument(
         '-o', '--output',
         type=str,
-        help="output file (default : same with .tfex extension)"
+        help="output file (default : same with .tfex or .tfexb extension)"
     )
     parser.add_argument(
         '-t', '--type',
         default="tsoft",
-        help="Link type (tsoft, ippp, cggtts)")
+        help="Link type (tsoft, ippp, cggtts, tfex, tfexbin)")
+    parser.add_argument(
+        '-b', '--binary',
+        action='store_true',
+        help="write a binary tfex file (see utclib.tfexbin)")
+    parser.add_argument(
+        '--profile',
+        type=str,
+        help="write a JSON report of the time and memory spent in each "
+             "processing stage to this file")
     return parser
 
 
 def tfexconv():
     import utclib.converters as conv
     args = get_parser_conv().parse_args()
+    start_profiling(args)
 
+    ext = ".tfexb" if args.binary else ".tfex"
     if not args.output:
         args.output = os.path.join(".",
-                                   os.path.splitext(args.input)[0] + ".tfex")
+                                   os.path.splitext(args.input)[0] + ext)
     if args.type == "tsoft":
         tf = conv.parse_tsoft_file(args.input)
     elif args.type == "ippp":
@@ -43,11 +66,22 @@ def tfexconv():
         args.output = os.path.join(
             ".",
             os.path.splitext(args.input)[0] +
-            "_{:05d}.tfex".format(tf.hdr.MJDSTART))
+            "_{:05d}".format(tf.hdr.MJDSTART) + ext)
+    elif args.type == "tfex":
+        import utclib.tfex as tfex
+        tf = tfex.tfex.from_file(args.input)
+    elif args.type == "tfexbin":
+        import utclib.tfexbin as tfexbin
+        tf = tfexbin.from_file(args.input)
     else:
         logging.error("Unknown or unimplemented input type: %s" % args.type )
         raise SystemExit
-    tf.write_to_file(args.output)
+    if args.binary:
+        import utclib.tfexbin as tfexbin
+        tfexbin.write_to_file(tf, args.output)
+    else:
+        tf.write_to_file(args.output)
+    stop_profiling(args)
 
 # diff
 
@@ -70,11 +104,18 @@ def get_parser_diff():
         type=str,
         help="output file (default : ./input1-input2.tfex)"
     )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        help="write a JSON report of the time and memory spent in each "
+             "processing stage to this file")
     return parser
 
 
 def tfexdiff():
     args = get_parser_diff().parse_args()
+    import utclib.tfex as tfex
+    start_profiling(args)
 
     if not args.output:
         args.output = os.path.join(
@@ -85,4 +126,75 @@ def tfexdiff():
     tf2 = tfex.tfex.from_file(args.input2)
     interp = tf2.interpolate(tf1.timestamps)
     diff.write_to_file(args.output)
+    stop_profiling(args)
+
+
+# plot
+
+def get_parser_plot():
+    """ Dedicated function to collect command line parameters, so it can
+    autogenerate doc too
+    """
+    parser = argparse.ArgumentParser(
+        description="Command-line utility for time and frequency links")
+    parser.add_argument(
+        'inputs',
+        type=str,
+        nargs='+',
+        help="tfex file(s) to plot")
+    parser.add_argument(
+        '-c', '--columns',
+        type=str,
+        nargs='+',
+        help="labels of the columns to plot (default : all data columns)")
+    parser.add_argument(
+        '--start',
+        type=float,
+        help="first MJD to plot")
+    parser.add_argument(
+        '--stop',
+        type=float,
+        help="last MJD to plot")
+    parser.add_argument(
+        '-n', '--nbins',
+        type=int,
+        default=2000,
+        help="number of min/max buckets along the time axis (default : 2000)")
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        help="save the plot to this file instead of displaying it"
+    )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        help="write a JSON report of the time and memory spent in each "
+             "processing stage to this file")
+    return parser
 
+
+def tfexplot():
+    args = get_parser_plot().parse_args()
+    start_profiling(args)
+    try:
+        import matplotlib
+        if args.output:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        logging.error("tfexplot needs matplotlib")
+        raise SystemExit
+    import utclib.plotting as plotting
+    import utclib.tfex as tfex
+
+    tf_list = [tfex.tfex.from_file(f, mjd_start=args.start,
+                                   mjd_stop=args.stop)
+               for f in args.inputs]
+    labels = [os.path.basename(f) for f in args.inputs]
+    plotting.plot_tfex(tf_list, columns=args.columns, nbins=args.nbins,
+                       labels=labels)
+    stop_profiling(args)
+    if args.output:
+        plt.savefig(args.output)
+    else:
+        plt.show()
@@ -0,0 +1,115 @@
+"""
+plotting  - Plot tfex links, decimating large series before rendering
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import logging
+import numpy as np
+
+
+def minmax_decimate(x, y, nbins=2000):
+    """ Reduce a series to at most 2 points per bucket, keeping the shape
+
+    The x range is split in nbins buckets of equal width (typically one per
+    pixel). In each bucket only the minimum and maximum of y are kept, so
+    that peaks and outliers remain visible once plotted.
+
+    Parameters
+    ----------
+    x : numpy array (nx1)
+        abscissa, sorted in increasing order
+    y : numpy array (nx1)
+        values, NaNs are ignored
+    nbins : int
+        number of buckets
+
+    Returns
+    -------
+    (x, y) : decimated numpy arrays, in increasing x order
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if not valid.all():
+        x = x[valid]
+        y = y[valid]
+    if x.size <= 2 * nbins:
+        return x, y
+
+    # Bucket number of each point, then first index of each non-empty bucket
+    span = x[-1] - x[0]
+    if span > 0:
+        bucket = np.minimum(((x - x[0]) / span * nbins).astype(np.int64),
+                            nbins - 1)
+    else:
+        bucket = np.zeros(x.size, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, x.size])
+
+    # Index of the first min (resp. max) of each bucket
+    idx = np.arange(x.size)
+    ymin = np.repeat(np.minimum.reduceat(y, starts), counts)
+    ymax = np.repeat(np.maximum.reduceat(y, starts), counts)
+    imin = np.minimum.reduceat(np.where(y == ymin, idx, x.size), starts)
+    imax = np.minimum.reduceat(np.where(y == ymax, idx, x.size), starts)
+
+    keep = np.unique(np.concatenate([imin, imax, [0, x.size - 1]]))
+    return x[keep], y[keep]
+
+
+def plot_tfex(tf_list, columns=None, nbins=2000, ax=None, labels=None):
+    """ Plot data columns of tfex objects against MJD
+
+    Parameters
+    ----------
+    tf_list : list of utclib.tfex.tfex
+        links to plot
+    columns : list of str (opt)
+        labels of the columns to plot, all data columns if None
+    nbins : int
+        number of buckets used by minmax_decimate
+    ax : matplotlib.axes.Axes (opt)
+        axes to plot in, a new figure is created if None
+    labels : list of str (opt)
+        legend prefix for each tfex object
+
+    Returns
+    -------
+    matplotlib.axes.Axes
+    """
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        _, ax = plt.subplots()
+    if labels is None:
+        labels = [str(i) for i in range(len(tf_list))]
+    for tf, name in zip(tf_list, labels):
+        if len(tf.data) == 0:
+            logging.warning("No data to plot for %s" % name)
+            continue
+        mjd = tf.timestamps.getMJD()
+        cols = tf.data.dtype.names if columns is None else columns
+        for label in cols:
+            if label not in tf.data.dtype.names:
+                logging.warning("No column %s in %s" % (label, name))
+                continue
+            if tf.data.dtype[label].kind not in "iuf":
+                continue
+            # In the unit of the column, NaN (not plotted) where missing
+            x, y = minmax_decimate(mjd, tf.get_values(label), nbins)
+            ax.plot(x, y, label="{} {}".format(name, label))
+    ax.set_xlabel("MJD")
+    ax.legend()
+    return ax
@@ -0,0 +1,220 @@
+"""
+profiling  - Opt-in stage-level timing of the readers, writers and converters
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Usage:
+
+    from utclib import profiling
+    profiling.enable()
+    tf = tfex.tfex.from_file("link.tfex")
+    print(profiling.get_report())
+    profiling.disable()
+
+Stages are nested: a stage opened while another one is running is recorded
+as "parent/child". Nothing is recorded (and almost nothing is spent) while
+profiling is disabled.
+"""
+import functools
+import time
+
+# Active Profiler, None when profiling is disabled
+_profiler = None
+
+
+class Stage:
+    """ A running stage. Instrumented code may set rows once known
+    """
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.mem_base = 0
+        self.mem_peak = 0
+
+
+class Profiler:
+    """ Collects one record per executed stage
+    """
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self.owns_tracing = False
+        self._stack = []
+
+    def start(self, stage):
+        if self.trace_memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent.mem_peak = max(parent.mem_peak, peak)
+            tracemalloc.reset_peak()
+            stage.mem_base = current
+            stage.mem_peak = current
+        stage.path = "/".join([s.name for s in self._stack] + [stage.name])
+        self._stack.append(stage)
+        stage.t0 = time.perf_counter()
+
+    def stop(self, stage):
+        wall = time.perf_counter() - stage.t0
+        self._stack.pop()
+        record = {"stage": stage.path, "wall_s": wall, "rows": stage.rows}
+        if self.trace_memory:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1]
+            stage.mem_peak = max(stage.mem_peak, peak)
+            tracemalloc.reset_peak()
+            if self._stack:
+                parent = self._stack[-1]
+                parent.mem_peak = max(parent.mem_peak, stage.mem_peak)
+            record["peak_bytes"] = stage.mem_peak - stage.mem_base
+        self.records.append(record)
+
+    def report(self):
+        """ Records aggregated per stage, sorted by stage path
+
+        Returns
+        -------
+        list of dict : stage, calls, wall_s, rows, peak_bytes
+        """
+        summary = {}
+        for rec in self.records:
+            agg = summary.setdefault(
+                rec["stage"],
+                {"stage": rec["stage"], "calls": 0, "wall_s": 0.,
+                 "rows": None, "peak_bytes": None})
+            agg["calls"] += 1
+            agg["wall_s"] += rec["wall_s"]
+            if rec["rows"] is not None:
+                agg["rows"] = (agg["rows"] or 0) + rec["rows"]
+            if "peak_bytes" in rec:
+                agg["peak_bytes"] = max(agg["peak_bytes"] or 0,
+                                        rec["peak_bytes"])
+        # Parents end after their children: sort by path so the report
+        # reads top-down
+        return sorted(summary.values(), key=lambda a: a["stage"])
+
+
+class _StageContext:
+    def __init__(self, name, rows):
+        self.stage = Stage(name, rows)
+        self.profiler = None
+
+    def __enter__(self):
+        # Keep the profiler that was active when the stage started, so that
+        # enabling / disabling inside a stage is harmless
+        self.profiler = _profiler
+        if self.profiler is not None:
+            self.profiler.start(self.stage)
+        return self.stage
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.stop(self.stage)
+        return False
+
+
+def stage(name, rows=None):
+    """ Context manager timing a stage
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    rows : int (opt)
+        number of rows processed, can also be set later on the returned
+        Stage object
+    """
+    return _StageContext(name, rows)
+
+
+def profiled(name):
+    """ Decorator recording each call of a function as a stage
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(trace_memory=True):
+    """ Start recording stages
+
+    Parameters
+    ----------
+    trace_memory : bool
+        also record the peak of memory allocated by Python during each
+        stage (uses tracemalloc, which slows down execution)
+
+    Returns
+    -------
+    Profiler
+    """
+    global _profiler
+    owns_tracing = False
+    if trace_memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            owns_tracing = True
+    _profiler = Profiler(trace_memory)
+    _profiler.owns_tracing = owns_tracing
+    return _profiler
+
+
+def disable():
+    """ Stop recording stages
+
+    Returns
+    -------
+    Profiler : the profiler that was active, or None
+    """
+    global _profiler
+    profiler = _profiler
+    _profiler = None
+    if profiler is not None and profiler.owns_tracing:
+        import tracemalloc
+        tracemalloc.stop()
+    return profiler
+
+
+def is_enabled():
+    return _profiler is not None
+
+
+def get_report():
+    """ Aggregated records of the active profiler (see Profiler.report)
+    """
+    if _profiler is None:
+        return []
+    return _profiler.report()
+
+
+def dump(file_path, profiler=None):
+    """ Write the report and the raw records to a JSON file
+    """
+    import json
+
+    if profiler is None:
+        profiler = _profiler
+    out = {"stages": profiler.report() if profiler else [],
+           "records": profiler.records if profiler else []}
+    with open(file_path, "w") as fp:
+        json.dump(out, fp, indent=1)
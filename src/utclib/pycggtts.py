@@ -6,9 +6,11 @@ import re
 import os
 import logging
 import argparse
-import pandas as pd
 import numpy as np
 
+from utclib import profiling
+from utclib import compression
+
 log = logging.getLogger(__name__)
 
 
@@ -169,7 +171,7 @@ class Cggtts():
                              'repr': 's'},
                             {'label': 'CK',
                              'rng': [112, 113],
-                             'dtype': int,
+                             'dtype': str,
                              'repr': 's'},
                             ]
 
@@ -315,14 +317,16 @@ class Cggtts():
         return '{:02x}'.format(sum(ck_str.encode('ascii')) % 256).upper()
 
     def parse_data(self, line):
-        """ Section 3.5, "data line"
+        """ Section 3.5, "data line". Invalid integers ('*', blank) are
+        returned as None, they become <NA> in the nullable integer columns
+        of the DataFrame.
         """
         buf = []
         for c in self.cols:
             try:
                 strval = line[c['rng'][0] - 1: c['rng'][1]].strip()
             except IndexError:
-                buf.append('')
+                buf.append('' if c['dtype'] is str else None)
                 continue
             try:
                 if c['dtype'] is str:
@@ -330,7 +334,7 @@ class Cggtts():
                 elif c['dtype'] is int:
                     buf.append(int(strval))
             except ValueError:
-                buf.append(np.nan)
+                buf.append(None)
 
         # checksum verification
         if self.iono_avail:
@@ -344,15 +348,45 @@ class Cggtts():
 
     def read_from_path(self, path):
         """ Automatically determine the filename from attributes, and
-        look for file in path """
+        look for file in path, or for a compressed version of it """
 
-        full_path = os.path.join(path, self.gen_filename())
-        if not os.path.exists(full_path):
-            log.debug(
-                "File not found for loading cggtts: {}".format(full_path))
+        full_path = compression.find_variant(
+            os.path.join(path, self.gen_filename()))
+        if full_path is None:
+            log.debug("File not found for loading cggtts: {}".format(
+                os.path.join(path, self.gen_filename())))
             return
         self.read(full_path)
 
+    def read_header(self, filename, parse_filename=True):
+        """ Read the header of a CGGTTS file without loading the data.
+        The frequency is taken from the FRC column of the first data line if
+        not set yet.
+
+        Parameters
+        ----------
+        filename: str
+            complete path to a CGGTTS file
+        parse_filename: bool
+            If True, will attempt to deduce metadata from the filename
+        """
+        if parse_filename:
+            self.parse_filename(filename)
+        with compression.open_text(filename, errors='replace') as fp:
+            line = fp.readline()
+            while line and len(line.strip()) != 0:
+                self.parse_header(line)
+                line = fp.readline()
+            line_header = fp.readline()
+            fp.readline()
+            first_line = fp.readline().strip()
+        self.iono_avail = 'MSIO' in line_header
+        cols = self.cols_iono if self.iono_avail else self.cols_noiono
+        if self.freq is None and first_line:
+            rng = [c['rng'] for c in cols if c['label'] == 'FRC'][0]
+            self.freq = first_line[rng[0] - 1: rng[1]].strip()
+
+    @profiling.profiled("Cggtts.read")
     def read(self, filename, parse_filename=True):
         """ Read a CGGTTS file and populate the object
 
@@ -364,9 +398,12 @@ class Cggtts():
             If True, will attempt to deduce metadata from the filename
             If False, filling the metadata can be done at a later stage
         """
+        import pandas as pd
+
         if parse_filename:
             self.parse_filename(filename)
-        with open(filename, errors='replace') as fp:
+        with (profiling.stage("parse") as st,
+              compression.open_text(filename, errors='replace') as fp):
             in_header = True
             line_header_parsed = False
             unit_header_parsed = False
@@ -397,13 +434,20 @@ class Cggtts():
                     unit_header_parsed = True
                     continue
                 raw_data.append(self.parse_data(line.strip()))
+            st.rows = len(raw_data)
         self.update_line_unit_header()
-        self.df = pd.DataFrame(raw_data)
+        with profiling.stage("dataframe", rows=len(raw_data)):
+            self.df = pd.DataFrame(raw_data)
         if len(self.df) == 0:
             log.debug("Empty file for {} {} {}".format(
                 self.const, self.freq, self.mjd))
             return
         self.df.columns = [x['label'] for x in self.cols]
+        # Integer columns with missing values were upcast to float: keep
+        # them integer, with a validity mask (pandas nullable integers)
+        for col in self.cols:
+            if col['dtype'] is int and self.df[col['label']].dtype.kind == 'f':
+                self.df[col['label']] = self.df[col['label']].astype("Int64")
         # Add supplementary column : mjd float
         self.df['mjdfloat'] = (self.df['MJD'] +
                                self.df['STTIME'].apply(sttime2d))
@@ -412,7 +456,8 @@ class Cggtts():
         if self.freq is None:
             self.freq = self.df['FRC'].iloc[0]
 
-    def write(self, path, filename=None, force=False):
+    @profiling.profiled("Cggtts.write")
+    def write(self, path, filename=None, force=False, compress=None):
         """ Write a CGGTTS file on disk
         Parameters
         ----------
@@ -422,17 +467,22 @@ class Cggtts():
             If not provided, the filename will be generated from metadata
         force: bool (opt, default=False)
             Overwrite if the file exists
+        compress: str (opt)
+            '.gz', '.bz2' or '.xz': compress the output, the extension is
+            added to the file name
         """
 
         if not os.path.exists(path):
             os.makedirs(path)
         if filename is None:
             filename = self.gen_filename()
+        if compress is not None:
+            filename += compress
         fullpath = os.path.join(path, filename)
         if os.path.exists(fullpath) and not force:
             log.error("File exists, exiting...")
             raise SystemExit
-        with open(fullpath, 'w') as fp:
+        with compression.open_text(fullpath, 'w') as fp:
             fp.write(self.gen_header_output())
             fp.write(self.gen_data_output())
 
@@ -445,6 +495,7 @@ class Cggtts():
         outs += "\n{}\n{}\n".format(self.line_header, self.unit_header)
         return outs
 
+    @profiling.profiled("Cggtts.gen_data_output")
     def gen_data_output(self):
         """ Return a data string generated from the object
         """
@@ -464,12 +515,13 @@ class Cggtts():
                     data_str += (
                         ("{:" + str(w) + col['repr'] + "} ").format(
                             col['dtype'](row[col['label']])))
-                except ValueError:
-                    data_str += ("{:" + str(w) + "} ").format(
-                        '*')
+                except (ValueError, TypeError):
+                    # Missing value : field filled with '*'
+                    data_str += "*" * w + " "
             out.append(data_str)
         return "\n".join(out) + "\n"
 
+    @profiling.profiled("Cggtts.refsys_median_per_epoch")
     def refsys_median_per_epoch(self):
         """ Calculate the median of each epoch
 
@@ -484,9 +536,10 @@ class Cggtts():
             log.error('Trying to get median_per_epoch from empty file')
             return None
         refsys = self.df[['MJD', 'STTIME', 'mjdfloat', 'REFSYS']].copy()
-        refsys['REFSYS'] = refsys['REFSYS'].div(10)
+        refsys['REFSYS'] = refsys['REFSYS'].astype(float).div(10)
         return refsys.groupby(['MJD', 'STTIME']).median()
 
+    @profiling.profiled("Cggtts.refsys_weighted_average_per_epoch")
     def refsys_weighted_average_per_epoch(self):
         """ Return 1 REFSYS value per epoch, obtained by averaging
         all REFSYS data with weight = sin**2(elev)
@@ -495,6 +548,8 @@ class Cggtts():
         -------
         np.array
         """
+        import pandas as pd
+
         output = []
         try:
             refsys = self.df[
@@ -506,8 +561,8 @@ class Cggtts():
                 output,
                 columns=['MJD', 'STTIME', 'mjdfloat', 'REFSYS'])
             return output
-        refsys['REFSYS'] = refsys['REFSYS'].div(10)
-        refsys['ELV'] = refsys['ELV'].div(10)
+        refsys['REFSYS'] = refsys['REFSYS'].astype(float).div(10)
+        refsys['ELV'] = refsys['ELV'].astype(float).div(10)
         refsys['sin2elv'] = refsys['ELV'].map(
             lambda x: np.sin(np.radians(x))**2)
         last_mjdfloat = None
@@ -561,8 +616,9 @@ def gen_from_marker_sig_mjd(marker, sig, mjd):
     return Cggtts(const=const, freq=freq, ll=ll, mo=mo, mjd=mjd)
 
 
+@profiling.profiled("pycggtts.load_multiple_files")
 def load_multiple_files(paths_cggtts, marker, sig,
-                        ext_type=None):
+                        ext_type=None, catalog=None):
     """ Load multiple cggtts files
 
     Parameters
@@ -573,22 +629,41 @@ def load_multiple_files(paths_cggtts, marker, sig,
         receiver marker
     sig: string
         GNSS signal (e.g. GPS_L3P)
+    catalog: utclib.catalog.Catalog (opt)
+        If set, files are looked up in the catalog instead of the paths
+        ('path' entries are then ignored)
 
     Returns
     -------
     output: pycggts.Cggtts()
     """
+    import pandas as pd
+
     output = gen_from_marker_sig_mjd(marker, sig, paths_cggtts[0]['mjd'])
     if ext_type:
         output.extend(ext_type=ext_type)
+    found = {}
+    if catalog is not None:
+        mjds = [mjd_path['mjd'] for mjd_path in paths_cggtts]
+        for row in catalog.find_cggtts(
+                const=output.const, freq_code=output.freq_code,
+                lab=output.ll, rcvr=output.mo, frc=output.freq,
+                mjd_start=min(mjds), mjd_stop=max(mjds)):
+            found.setdefault(row['mjd'], []).append(row['path'])
+        for mjd, paths in found.items():
+            if len(paths) > 1:
+                log.warning("Several cggtts files for %s %s %s: %s, "
+                            "reading %s" % (marker, sig, mjd, paths, paths[0]))
     df_list = []
     for mjd_path in paths_cggtts:
         mjd = mjd_path['mjd']
-        cggtts_path = mjd_path['path']
         cg = gen_from_marker_sig_mjd(marker, sig, mjd)
         if ext_type:
             cg.extend(ext_type=ext_type)
-        cg.read_from_path(cggtts_path)
+        if catalog is None:
+            cg.read_from_path(mjd_path['path'])
+        elif mjd in found:
+            cg.read(found[mjd][0])
         if cg.is_empty():
             log.warning("No cggtts data for %s %s %s" %
                         (marker, sig, mjd))
@@ -602,6 +677,8 @@ def load_multiple_files(paths_cggtts, marker, sig,
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "pattern",
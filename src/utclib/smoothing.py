@@ -0,0 +1,282 @@
+"""
+smoothing  - Vondrak smoothing of tfex columns
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+The Vondrak smoother minimizes
+
+    sum_i p_i (y_i - z_i)^2 + lambda sum_k h_k (D3 z)_k^2
+
+where D3 z is the third divided difference of z (times 6, i.e. an estimate
+of the third derivative) over 4 consecutive epochs, and h_k the mean
+spacing of these epochs. Times are expressed in units of the median
+sampling interval h, so that for regular sampling the transfer function is
+close to 1 / (1 + lambda (2 pi f h)^6): lambda is chosen from the cutoff
+period, where the amplitude is halved.
+
+The normal equations form a symmetric positive definite system with 3
+sub-diagonals, solved in O(n) with scipy.linalg.solveh_banded when scipy is
+installed, or otherwise by block cyclic reduction over 3 x 3 blocks, which
+only involves numpy operations on vectors of blocks. Their
+conditioning grows as lambda, so series sampled more densely than
+POINTS_PER_CUTOFF points per cutoff period are first averaged in bins (the
+attenuation of the bin averaging at the cutoff is below 1e-4).
+
+    smoothing.tfex_vondrak(tf, 'delta_t', cutoff_s=5 * 86400)
+"""
+import logging
+import numpy as np
+
+from utclib import profiling
+
+# Points per system solved at once
+SEGMENT = 2**20
+# Beyond this number of points per cutoff period the system becomes too
+# ill-conditioned for double precision: data are first averaged in bins
+POINTS_PER_CUTOFF = 400
+
+
+def smoothing_factor(cutoff_s, h):
+    """ lambda for which the amplitude of a sine of period cutoff_s is
+    halved, for times in units of h
+    """
+    return (cutoff_s / (2 * np.pi * h)) ** 6
+
+
+def _third_differences(t):
+    """ Coefficients (n-3 x 4) of 6 x the third divided differences over 4
+    consecutive epochs, and the mean spacing of these epochs
+    """
+    n = len(t)
+    pts = np.stack([t[j: n - 3 + j] for j in range(4)], axis=1)
+    coef = np.full(pts.shape, 6.)
+    for j in range(4):
+        for m in range(4):
+            if m != j:
+                coef[:, j] /= pts[:, j] - pts[:, m]
+    return coef, (pts[:, 3] - pts[:, 0]) / 3
+
+
+def _solve_banded(diags, b):
+    """ Solve A z = b, A symmetric with diags[d][i] = A[i, i - d], d = 0..3
+    """
+    try:
+        from scipy.linalg import solveh_banded
+    except ImportError:
+        solveh_banded = None
+    if solveh_banded is not None:
+        # Upper form: ab[3 - d, j] = A[j - d, j]
+        return solveh_banded(np.stack(diags[::-1]), b)
+
+    # A is block tridiagonal with 3 x 3 blocks: A[k, k] = D[k],
+    # A[k, k - 1] = L[k], A[k - 1, k] = L[k]^T (padded with identity rows)
+    n = len(b)
+    m = -(-n // 3)
+    pad = [np.zeros(3 * m) for d in range(4)]
+    for d in range(4):
+        pad[d][:n] = diags[d]
+    pad[0][n:] = 1.
+    rows = 3 * np.arange(m)
+    blk_d = np.zeros((m, 3, 3))
+    blk_l = np.zeros((m, 3, 3))
+    for r in range(3):
+        for c in range(3):
+            blk_d[:, r, c] = pad[abs(r - c)][rows + max(r, c)]
+            if c >= r:
+                blk_l[1:, r, c] = pad[3 + r - c][rows[1:] + r]
+    rhs = np.zeros((m, 3, 1))
+    rhs.reshape(-1)[:n] = b
+    z = _block_cyclic_reduction(blk_d, blk_l, np.swapaxes(blk_l, 1, 2)[1:],
+                                rhs)
+    return z.reshape(-1)[:n]
+
+
+def _block_cyclic_reduction(blk_d, blk_l, blk_u, rhs):
+    """ Solve the block tridiagonal system
+    L[k] x[k - 1] + D[k] x[k] + U[k] x[k + 1] = rhs[k]
+    (blk_l[0] is ignored, blk_u has one block less), eliminating the odd
+    blocks at each level: O(n) operations on vectors of blocks
+    """
+    m = len(blk_d)
+    if m == 1:
+        return np.linalg.solve(blk_d, rhs)
+    if m == 2:
+        a = np.block([[blk_d[0], blk_u[0]], [blk_l[1], blk_d[1]]])
+        return np.linalg.solve(a, rhs.reshape(6, 1)).reshape(2, 3, 1)
+    if m % 2 == 0:
+        # Odd number of blocks, so that odd blocks have two neighbours
+        blk_d = np.concatenate([blk_d, np.eye(3)[None]])
+        blk_l = np.concatenate([blk_l, np.zeros((1, 3, 3))])
+        blk_u = np.concatenate([blk_u, np.zeros((1, 3, 3))])
+        rhs = np.concatenate([rhs, np.zeros((1, 3, 1))])
+    inv_o = np.linalg.inv(blk_d[1::2])
+    l_o, u_o, rhs_o = blk_l[1::2], blk_u[1::2], rhs[1::2]
+    # Even blocks, with the odd neighbours substituted
+    left = blk_l[2::2] @ inv_o         # from the odd block on the left
+    right = blk_u[0::2] @ inv_o        # from the odd block on the right
+    new_d = blk_d[0::2].copy()
+    new_d[1:] -= left @ u_o
+    new_d[:-1] -= right @ l_o
+    new_l = np.zeros_like(new_d)
+    new_l[1:] = -left @ l_o
+    new_rhs = rhs[0::2].copy()
+    new_rhs[1:] -= left @ rhs_o
+    new_rhs[:-1] -= right @ rhs_o
+    x_e = _block_cyclic_reduction(new_d, new_l, -right @ u_o, new_rhs)
+    x = np.empty_like(rhs)
+    x[0::2] = x_e
+    x[1::2] = inv_o @ (rhs_o - l_o @ x_e[:-1] - u_o @ x_e[1:])
+    return x[:m]
+
+
+def _vondrak_segment(t, y, p, lam):
+    n = len(t)
+    if n < 4 or np.count_nonzero(p) < 4:
+        return np.full(n, np.nan)
+    coef, h = _third_differences(t)
+    diags = [p.copy(), np.zeros(n), np.zeros(n), np.zeros(n)]
+    w = lam * h
+    for a in range(4):
+        for b in range(a, 4):
+            diags[b - a][b: b + n - 3] += w * coef[:, a] * coef[:, b]
+    return _solve_banded(diags, p * y)
+
+
+def _vondrak_segments(t, y, p, cutoff_s, segment, overlap):
+    n = len(t)
+    if n < 4:
+        return np.full(n, np.nan)
+    h = np.median(np.diff(t))
+    tn = (t - t[0]) / h
+    lam = smoothing_factor(cutoff_s, h)
+    if n <= segment:
+        return _vondrak_segment(tn, y, p, lam)
+
+    if overlap is None:
+        overlap = int(np.ceil(3 * cutoff_s / h))
+    overlap = min(overlap, segment // 4)
+    step = segment - 2 * overlap
+    z = np.empty(n)
+    for start in range(0, n, step):
+        stop = min(n, start + step)
+        lo = max(0, start - overlap)
+        hi = min(n, stop + overlap)
+        zs = _vondrak_segment(tn[lo:hi], y[lo:hi], p[lo:hi], lam)
+        z[start:stop] = zs[start - lo: stop - lo]
+    return z
+
+
+@profiling.profiled("smoothing.vondrak")
+def vondrak(t, y, cutoff_s, weights=None, segment=SEGMENT, overlap=None):
+    """ Vondrak smoothing of an irregularly sampled series
+
+    Parameters
+    ----------
+    t : numpy array
+        epochs in s, increasing
+    y : numpy array
+        values, NaN for missing values (they get a zero weight, the
+        smoothed curve is interpolated there)
+    cutoff_s : float
+        period (s) at which the amplitude is halved
+    weights : numpy array (opt)
+        relative weight of each value, default 1
+    segment : int
+        longer series are smoothed by overlapping segments of this number of
+        points, bounding the memory used
+    overlap : int (opt)
+        points added on each side of a segment, discarded afterwards.
+        Default : 3 cutoff periods
+
+    Returns
+    -------
+    numpy array : smoothed values at the epochs t
+    """
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(t)
+    if n < 2:
+        return y.copy()
+    if not np.all(np.diff(t) > 0):
+        logging.error("Epochs should be increasing")
+        raise SystemExit
+    p = np.ones(n) if weights is None else \
+        np.asarray(weights, dtype=np.float64).copy()
+    p[~np.isfinite(y)] = 0
+    if not np.any(p > 0):
+        return np.full(n, np.nan)
+    p /= np.mean(p[p > 0])
+    y = np.where(p > 0, y, 0.)
+    h = np.median(np.diff(t))
+    if cutoff_s / h <= POINTS_PER_CUTOFF:
+        return _vondrak_segments(t, y, p, cutoff_s, segment, overlap)
+
+    # Dense series: smooth the weighted means over bins of about
+    # cutoff_s / POINTS_PER_CUTOFF (a multiple of h), then interpolate
+    valid = p > 0
+    width = np.ceil(cutoff_s / h / POINTS_PER_CUTOFF) * h
+    _, bins = np.unique(np.floor((t[valid] - t[0]) / width),
+                        return_inverse=True)
+    pb = np.bincount(bins, p[valid])
+    tb = np.bincount(bins, p[valid] * t[valid]) / pb
+    yb = np.bincount(bins, p[valid] * y[valid]) / pb
+    zb = _vondrak_segments(tb, yb, pb / np.mean(pb), cutoff_s, segment,
+                           overlap)
+    return np.interp(t, tb, zb)
+
+
+def tfex_vondrak(tf, label, cutoff_s, new_label=None, **kwargs):
+    """ Smooth a tfex data column and add the result as a new column
+
+    Parameters
+    ----------
+    tf : utclib.tfex.tfex
+    label : str
+        label of the column to smooth
+    cutoff_s : float
+        period (s) at which the amplitude is halved
+    new_label : str (opt)
+        label of the new column, default : label + " smoothed Vondrak"
+    kwargs :
+        passed to vondrak (weights, in the order of the data lines,
+        segment, overlap)
+
+    Returns
+    -------
+    numpy array : smoothed values, in the order of the data lines
+    """
+    if new_label is None:
+        new_label = label + " smoothed Vondrak"
+    meta = [c for c in tf.hdr.COLUMNS if c["label"] == label]
+    if not meta:
+        logging.error("No column %s in COLUMNS" % label)
+        raise SystemExit
+    seconds, _ = tf.timestamps.getFromMinEpoch()
+    order = np.argsort(seconds, kind='stable')
+    if kwargs.get("weights") is not None:
+        kwargs["weights"] = np.asarray(kwargs["weights"])[order]
+    z = np.empty(len(seconds))
+    z[order] = vondrak(seconds[order],
+                       np.asarray(tf.get_values(label), dtype=np.float64)[order],
+                       cutoff_s, **kwargs)
+    metadata = {"label": new_label}
+    metadata.update({k: v for k, v in meta[0].items() if k != "label"})
+    tf.add_column(z, metadata)
+    # Recorded in the COMMENT of the header, one line per processing
+    note = "{}: Vondrak smoothing of {}, cutoff {:g} s".format(
+        new_label, label, cutoff_s)
+    tf.hdr.COMMENT = note if not tf.hdr.COMMENT \
+        else tf.hdr.COMMENT.rstrip("\n") + "\n" + note
+    return z
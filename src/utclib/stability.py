@@ -0,0 +1,303 @@
+"""
+stability  - Allan, modified Allan and time deviations of tfex columns
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Deviations are computed from phase (time difference) data x sampled every
+tau0, for averaging times tau = m * tau0:
+
+    adev   non-overlapping Allan deviation
+    oadev  overlapping Allan deviation
+    mdev   modified Allan deviation
+    tdev   time deviation, tau / sqrt(3) * mdev
+
+Each term of the estimators is a second difference of x (summed over m
+consecutive positions for mdev/tdev, using a cumulative sum), so the cost is
+O(n) per tau. Gaps are NaN samples: the terms involving them are skipped,
+and the normalization uses the number of terms actually used.
+
+    taus, dev, nterms = stability.tfex_deviation(tf, 'delta_t', 'mdev')
+
+The same accumulator is used for arrays held in memory and for streams of
+chunks (DeviationAccumulator.push), e.g. a series spread over daily files.
+"""
+import logging
+import numpy as np
+
+from utclib import profiling
+
+KINDS = ("adev", "oadev", "mdev", "tdev")
+# Number of terms processed at once, bounds the temporary memory
+BLOCK = 2**20
+
+
+def averaging_factors(n, kind="oadev", taus="octave"):
+    """ Averaging factors m usable with n phase samples
+
+    Parameters
+    ----------
+    n : int
+        number of phase samples
+    kind : str
+        one of KINDS
+    taus : str or list of int
+        'octave' (m = 1, 2, 4...), 'all' (every m) or explicit factors
+
+    Returns
+    -------
+    numpy array of int64
+    """
+    m_max = (n - 1) // 2 if kind in ("adev", "oadev") else n // 3
+    if isinstance(taus, str):
+        if taus == "octave":
+            ms = 2 ** np.arange(int(np.log2(max(m_max, 1))) + 1)
+        elif taus == "all":
+            ms = np.arange(1, m_max + 1)
+        else:
+            logging.error("Unknown tau spacing: %s" % taus)
+            raise SystemExit
+    else:
+        ms = np.unique(np.asarray(taus, dtype=np.int64))
+    return ms[(ms >= 1) & (ms <= m_max)].astype(np.int64)
+
+
+class DeviationAccumulator:
+    """ Accumulates the squared terms of a deviation estimator over chunks
+    of phase data
+
+        acc = DeviationAccumulator(tau0=1, ms=[1, 10, 100], kind='oadev')
+        for chunk in chunks:
+            acc.push(chunk)
+        taus, dev, nterms = acc.result()
+
+    Chunks are consecutive: a gap between them should be pushed as NaN
+    (see push_timed). Only the last samples needed by the largest m are
+    kept between pushes.
+    """
+    def __init__(self, tau0, ms, kind="oadev"):
+        """
+        Parameters
+        ----------
+        tau0 : float
+            sampling interval, in s
+        ms : list of int
+            averaging factors
+        kind : str
+            one of KINDS
+        """
+        if kind not in KINDS:
+            logging.error("Unknown deviation: %s" % kind)
+            raise SystemExit
+        self.tau0 = float(tau0)
+        self.ms = np.asarray(ms, dtype=np.int64)
+        self.kind = kind
+        self.sumsq = np.zeros(len(self.ms))
+        self.nterms = np.zeros(len(self.ms), dtype=np.int64)
+        # span of a term in samples
+        self.span = 2 * self.ms + 1 if kind in ("adev", "oadev") \
+            else 3 * self.ms
+        self.tail = np.empty(0)
+        # Index of the first sample of tail in the whole series
+        self.start = 0
+        # For push_timed: origin and index of the next expected sample
+        self.t0 = None
+        self.next_index = 0
+
+    def push(self, x):
+        """ Add consecutive phase samples
+
+        Parameters
+        ----------
+        x : numpy array
+            phase, in s, NaN for missing samples
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if x.size == 0:
+            return
+        arr = np.concatenate([self.tail, x]) if self.tail.size else x
+        offset = self.tail.size
+        for k, m in enumerate(self.ms):
+            # Terms ending in the new samples
+            j0 = max(0, offset - int(self.span[k]) + 1)
+            j1 = arr.size - int(self.span[k]) + 1
+            if j1 <= j0:
+                continue
+            for b in range(j0, j1, BLOCK):
+                sumsq, n = self._terms(arr, int(m), b, min(b + BLOCK, j1))
+                self.sumsq[k] += sumsq
+                self.nterms[k] += n
+        keep = min(arr.size, int(self.span.max()) - 1) if self.ms.size \
+            else 0
+        self.start += arr.size - keep
+        self.tail = arr[arr.size - keep:].copy()
+
+    def push_timed(self, x, seconds):
+        """ Add phase samples dated in seconds, gaps are filled with NaN
+
+        Parameters
+        ----------
+        x : numpy array
+            phase, in s
+        seconds : numpy array
+            epochs of the samples, in s from any fixed origin, increasing
+        """
+        seconds = np.asarray(seconds, dtype=np.float64)
+        if seconds.size == 0:
+            return
+        if self.t0 is None:
+            self.t0 = seconds[0]
+        grid, idx0 = to_grid(seconds - self.t0, x, self.tau0)
+        if idx0 < self.next_index:
+            logging.error("Samples should be pushed in increasing order")
+            raise SystemExit
+        # Terms spanning a longer gap are invalid anyway
+        nfill = min(idx0 - self.next_index, int(self.span.max()))
+        if nfill > 0:
+            self.push(np.full(nfill, np.nan))
+        self.push(grid)
+        self.next_index = idx0 + grid.size
+
+    def _terms(self, arr, m, j0, j1):
+        """ Sum of squares and number of valid terms j0 <= j < j1
+        """
+        if self.kind in ("adev", "oadev"):
+            if self.kind == "adev":
+                # Terms starting on a multiple of m of the whole series
+                first = j0 + (-(self.start + j0)) % m
+                j = np.arange(first, j1, m)
+                d = arr[j + 2 * m] - 2 * arr[j + m] + arr[j]
+            else:
+                d = (arr[j0 + 2 * m: j1 + 2 * m] - 2 * arr[j0 + m: j1 + m]
+                     + arr[j0: j1])
+            valid = ~np.isnan(d)
+            return np.sum(d[valid] ** 2), np.count_nonzero(valid)
+        # mdev / tdev: sums of m consecutive second differences
+        d = (arr[j0 + 2 * m: j1 + 3 * m - 1] - 2 * arr[j0 + m: j1 + 2 * m - 1]
+             + arr[j0: j1 + m - 1])
+        nan = np.isnan(d)
+        csum = np.concatenate([[0.], np.cumsum(np.where(nan, 0., d))])
+        cnan = np.concatenate([[0], np.cumsum(nan)])
+        s = csum[m:] - csum[:-m]
+        valid = (cnan[m:] - cnan[:-m]) == 0
+        return np.sum(s[valid] ** 2), np.count_nonzero(valid)
+
+    def result(self):
+        """
+        Returns
+        -------
+        (taus, dev, nterms) : numpy arrays, taus in s. dev is NaN where no
+        term could be computed
+        """
+        taus = self.ms * self.tau0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = self.sumsq / self.nterms / (2 * taus ** 2)
+            if self.kind in ("mdev", "tdev"):
+                var /= self.ms.astype(np.float64) ** 2
+        dev = np.sqrt(var)
+        if self.kind == "tdev":
+            dev *= taus / np.sqrt(3)
+        return taus, dev, self.nterms.copy()
+
+
+def to_grid(seconds, x, tau0):
+    """ Place samples on a regular grid of step tau0, NaN where missing
+
+    Parameters
+    ----------
+    seconds : numpy array
+        epochs in s, increasing
+    x : numpy array
+        values
+    tau0 : float
+        grid step, in s
+
+    Returns
+    -------
+    (grid, idx0) : numpy array of the values, index of its first element
+    on the grid starting at seconds = 0
+    """
+    pos = np.asarray(seconds, dtype=np.float64) / tau0
+    idx = np.round(pos).astype(np.int64)
+    if np.any(np.abs(pos - idx) > 1e-3):
+        logging.warning("Epochs not on a %g s grid, rounded" % tau0)
+    idx0 = idx[0]
+    grid = np.full(idx[-1] - idx0 + 1, np.nan)
+    grid[idx - idx0] = x
+    return grid, idx0
+
+
+@profiling.profiled("stability.deviation")
+def deviation(x, tau0, kind="oadev", taus="octave"):
+    """ Deviation of regularly sampled phase data
+
+    Parameters
+    ----------
+    x : numpy array
+        phase in s, NaN for missing samples
+    tau0 : float
+        sampling interval in s
+    kind : str
+        one of KINDS
+    taus : str or list of int
+        see averaging_factors. 'all' costs O(n) per tau, i.e. O(n^2)
+
+    Returns
+    -------
+    (taus, dev, nterms) : numpy arrays, taus in s
+    """
+    x = np.asarray(x, dtype=np.float64)
+    acc = DeviationAccumulator(tau0, averaging_factors(x.size, kind, taus),
+                               kind)
+    acc.push(x)
+    return acc.result()
+
+
+def tfex_deviation(tf, label, kind="oadev", taus="octave", tau0=None):
+    """ Deviation of a tfex data column, gaps found from the timestamps
+
+    Parameters
+    ----------
+    tf : utclib.tfex.tfex
+    label : str
+        label of a time difference column
+    kind : str
+        one of KINDS
+    taus : str or list of int
+        see averaging_factors
+    tau0 : float (opt)
+        sampling interval in s, default : SAMPLING_INTERVAL_s of the header,
+        or the median interval between epochs
+
+    Returns
+    -------
+    (taus, dev, nterms) : numpy arrays, taus and dev in s
+    """
+    from utclib.tfex import unit_scales
+
+    unit = [c.get("unit") for c in tf.hdr.COLUMNS if c["label"] == label]
+    if not unit or unit[0] not in unit_scales:
+        logging.error("Column %s should be a time difference" % label)
+        raise SystemExit
+    seconds, _ = tf.timestamps.getFromMinEpoch()
+    order = np.argsort(seconds, kind='stable')
+    seconds = seconds[order]
+    if tau0 is None:
+        tau0 = tf.hdr.SAMPLING_INTERVAL_s
+    if tau0 is None:
+        tau0 = np.median(np.diff(seconds))
+    x = np.asarray(tf.get_values(label), dtype=np.float64)[order] * \
+        unit_scales[unit[0]]
+    grid, _ = to_grid(seconds, x, tau0)
+    return deviation(grid, tau0, kind, taus)
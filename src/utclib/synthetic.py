@@ -0,0 +1,457 @@
+"""
+synthetic  - Generate synthetic CGGTTS and tfex files for load testing
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+All generators are seeded, so that the same call always produces the same
+files, and write day by day so that many years of data can be generated
+without holding them in memory.
+"""
+import argparse
+import logging
+import os
+import numpy as np
+
+import utclib.pycggtts as pc
+import utclib.tfexhdr as tfexhdr
+
+# Number of satellites and orbital period (day) per constellation
+ORBITS = {'GPS': (32, 0.49863),
+          'GLO': (24, 0.46950),
+          'GAL': (28, 0.58700),
+          'BDS': (30, 0.53680),
+          'QZS': (4, 0.99727)}
+# Elevation mask (deg) and nominal track length (s)
+ELV_MIN = 10
+TRKL = 780
+# MJD of the reference day of the BIPM tracking schedule (first track 00:02)
+MJD_SCHEDULE0 = 50722
+
+
+def track_starts(mjd):
+    """ Start of the 16 min tracks of the BIPM schedule, in s of day
+
+    Parameters
+    ----------
+    mjd : int
+
+    Returns
+    -------
+    numpy array of int
+    """
+    first = (2 - 4 * (mjd - MJD_SCHEDULE0)) % 16
+    starts = np.arange(first, 1440, 16) * 60
+    return starts[starts + TRKL <= 86400]
+
+
+def gen_cggtts_object(const='GPS', freq='L3P', ll='XX', mo='01', mjd=60000,
+                      iono=None, ext_type=None):
+    """ Return a Cggtts object with header and columns set, without data
+
+    Parameters
+    ----------
+    const, freq, ll, mo, mjd :
+        see pycggtts.Cggtts
+    iono : bool (opt)
+        write the MSIO/SMSI/ISG columns. Default : True for dual frequency
+        codes (freq_code 'Z')
+    ext_type : str (opt)
+        extension passed to Cggtts.extend (REFUTC or TGD)
+    """
+    cg = pc.Cggtts(const=const, freq=freq, ll=ll, mo=mo, mjd=mjd)
+    if cg.freq_code is None:
+        logging.error("Unknown frequency code for %s" % freq)
+        raise SystemExit
+    cg.iono_avail = (cg.freq_code == 'Z') if iono is None else iono
+    cg.update_cols()
+    if ext_type:
+        cg.extend(ext_type=ext_type)
+    cg.update_line_unit_header()
+    cg.header.update({
+        "CGGTTS     GENERIC DATA FORMAT VERSION": "2E",
+        "REV DATE": "2024-01-01",
+        "RCVR": "SYNTHETIC {}{} 1 2024 v1.0".format(ll, mo),
+        "CH": "20",
+        "IMS": "{}{} 1 2024 v1.0".format(ll, mo) if cg.iono_avail else "99999",
+        "LAB": ll,
+        "X": "+4027881.79 m",
+        "Y": "+306998.67 m",
+        "Z": "+4919499.05 m",
+        "FRAME": "ITRF",
+        "COMMENTS": "synthetic data generated by utclib.synthetic",
+        "INT DLY": "0.0 ns ({} {})     CAL_ID = none".format(const, freq),
+        "CAB DLY": "0.0 ns",
+        "REF DLY": "0.0 ns",
+        "REF": "UTC({})".format(ll)})
+    cg.header["CKSUM"] = header_checksum(cg)
+    return cg
+
+
+def header_checksum(cg):
+    """ Header checksum (sect. 3.2): sum of the characters from the first
+    "C" of "CGGTTS" to the space after "CKSUM =", line feeds excluded
+    """
+    outs = ""
+    for key, val in cg.header.items():
+        if key == "CKSUM":
+            outs += "CKSUM = "
+            break
+        outs += "{} = {}".format(key, val)
+    return cg.checksum(outs)
+
+
+def cggtts_day_lines(cg, mjd, rng, state):
+    """ Data lines of one day
+
+    Parameters
+    ----------
+    cg : pycggtts.Cggtts
+        object returned by gen_cggtts_object
+    mjd : int
+    rng : numpy.random.Generator
+    state : dict
+        per-satellite orbit phases and lab clock offset, updated in place
+
+    Returns
+    -------
+    list of str
+    """
+    nsat, period = ORBITS[cg.const]
+    letter = cg.const_code[cg.const]
+    starts = track_starts(mjd)
+    # Elevation of each satellite at mid-track, as a simple periodic model
+    t = mjd + (starts[:, None] + TRKL / 2) / 86400
+    phase = t / period + state['phase'][None, :]
+    elv = np.minimum(90, (state['elv_max'][None, :] + 35) *
+                     np.sin(2 * np.pi * phase) - 35)
+    azth = np.mod(state['azth0'][None, :] + 360 * phase, 360)
+    lines = []
+    for i, sttime in enumerate(starts):
+        state['refsys'] += rng.normal(0, 2)
+        for sat in np.flatnonzero(elv[i] >= ELV_MIN):
+            sin_elv = np.sin(np.radians(elv[i, sat]))
+            mdtr = 24 / sin_elv
+            mdio = rng.uniform(20, 300)
+            values = {
+                'SAT': "{}{:02d}".format(letter, sat + 1),
+                'CL': "FF",
+                'MJD': mjd,
+                'STTIME': "{:02d}{:02d}{:02d}".format(
+                    sttime // 3600, sttime // 60 % 60, sttime % 60),
+                'TRKL': TRKL,
+                'ELV': int(round(elv[i, sat] * 10)),
+                'AZTH': int(round(azth[i, sat] * 10)),
+                'REFSV': int(rng.integers(-5000000, 5000000)),
+                'SRSV': int(rng.normal(0, 30)),
+                'REFSYS': int(round(state['refsys'] +
+                                    rng.normal(0, 15) / sin_elv)),
+                'SRSYS': int(rng.normal(0, 10)),
+                'DSG': int(rng.uniform(10, 80)),
+                'IOE': int(rng.integers(0, 256)),
+                'MDTR': int(round(mdtr * 10)),
+                'SMDT': int(rng.normal(0, 5)),
+                'MDIO': int(round(mdio)),
+                'SMDI': int(rng.normal(0, 5)),
+                'MSIO': int(round(mdio + rng.normal(0, 20))),
+                'SMSI': int(rng.normal(0, 5)),
+                'ISG': int(rng.uniform(5, 40)),
+                'FR': 0,
+                'HC': 0,
+                'FRC': cg.freq,
+                'REFUTC': int(round(state['refsys'] + rng.normal(0, 5))),
+                'DUTC': int(rng.normal(0, 3)),
+                'TGD': int(rng.normal(0, 40))}
+            lines.append(cggtts_line(cg, values))
+    return lines
+
+
+def cggtts_line(cg, values):
+    """ Format one data line at the positions given in cg.cols, with its
+    checksum (sect. 3.5)
+    """
+    line = ""
+    ck_end = 125 if cg.iono_avail else 111
+    for col in sorted(cg.cols, key=lambda c: c['rng'][0]):
+        first, last = col['rng']
+        line = line.ljust(first - 1)
+        if col['label'] == 'CK':
+            line += cg.checksum(line[:ck_end])
+        else:
+            line += "{:>{w}}".format(values[col['label']],
+                                     w=last - first + 1)
+    return line
+
+
+def write_cggtts(path, const='GPS', freq='L3P', ll='XX', mo='01',
+                 mjd_start=60000, ndays=1, iono=None, ext_type=None, seed=0,
+                 nlines=None):
+    """ Write ndays of data in a single CGGTTS file
+
+    Parameters
+    ----------
+    path : str
+        output file
+    const, freq, ll, mo :
+        see pycggtts.Cggtts
+    mjd_start : int
+        first day
+    ndays : int
+        number of days
+    iono, ext_type :
+        see gen_cggtts_object
+    seed : int
+        seed of the random generator
+    nlines : int (opt)
+        stop after this number of data lines
+
+    Returns
+    -------
+    int : number of data lines written
+    """
+    cg = gen_cggtts_object(const, freq, ll, mo, mjd_start, iono, ext_type)
+    rng = np.random.default_rng(seed)
+    state = init_cggtts_state(cg, rng)
+    count = 0
+    with open(path, "w") as fp:
+        fp.write(cg.gen_header_output())
+        for mjd in range(mjd_start, mjd_start + ndays):
+            lines = cggtts_day_lines(cg, mjd, rng, state)
+            if nlines is not None:
+                lines = lines[:nlines - count]
+            if lines:
+                fp.write("\n".join(lines) + "\n")
+            count += len(lines)
+            if nlines is not None and count >= nlines:
+                break
+    return count
+
+
+def gen_cggtts_archive(directory, const='GPS', freq='L3P', ll='XX', mo='01',
+                       mjd_start=60000, ndays=1, iono=None, ext_type=None,
+                       seed=0):
+    """ Write one CGGTTS file per day, named according to Cggtts.gen_filename
+
+    Parameters
+    ----------
+    directory : str
+        output directory, created if needed
+    others :
+        see write_cggtts
+
+    Returns
+    -------
+    list of str : paths of the files written
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    rng = np.random.default_rng(seed)
+    state = None
+    paths = []
+    for mjd in range(mjd_start, mjd_start + ndays):
+        cg = gen_cggtts_object(const, freq, ll, mo, mjd, iono, ext_type)
+        if state is None:
+            state = init_cggtts_state(cg, rng)
+        lines = cggtts_day_lines(cg, mjd, rng, state)
+        path = os.path.join(directory, cg.gen_filename())
+        with open(path, "w") as fp:
+            fp.write(cg.gen_header_output())
+            fp.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def init_cggtts_state(cg, rng):
+    nsat = ORBITS[cg.const][0]
+    return {'phase': rng.uniform(0, 1, nsat),
+            'elv_max': rng.uniform(60, 90, nsat),
+            'azth0': rng.uniform(0, 360, nsat),
+            'refsys': rng.normal(0, 100)}
+
+
+def write_tfex(path, ndays=1, ncols=1, sampling_s=1, mjd_start=60000,
+               gap_fraction=0., missing_fraction=0., fmt='10.3f', seed=0,
+               nlines=None):
+    """ Write a tfex file containing random walk + white noise links
+
+    Parameters
+    ----------
+    path : str
+        output file
+    ndays : int
+        number of days
+    ncols : int
+        number of data columns
+    sampling_s : float
+        sampling interval in s, should divide 86400
+    mjd_start : int
+        first day
+    gap_fraction : float
+        fraction of epochs removed, as blocks of consecutive epochs
+    missing_fraction : float
+        fraction of values replaced by "*"
+    fmt : str
+        format of the data columns
+    seed : int
+        seed of the random generator
+    nlines : int (opt)
+        stop after this number of data lines
+
+    Returns
+    -------
+    int : number of data lines written
+    """
+    nepoch = int(round(86400 / sampling_s))
+    int_sod = float(sampling_s).is_integer()
+    sod_fmt = '5d' if int_sod else '9.3f'
+    width = int(fmt.split('.')[0])
+
+    # First pass on the gaps only, to write NDATA in the header
+    keep_days = [day_gaps(seed, day, nepoch, gap_fraction)
+                 for day in range(ndays)]
+    counts = np.cumsum([int(k.sum()) for k in keep_days])
+    ndata = int(counts[-1]) if ndays else 0
+    if nlines is not None:
+        ndata = min(ndata, nlines)
+    # MJDSTOP : MJD of the last epoch written
+    mjd_stop = mjd_start
+    if ndata > 0:
+        day = int(np.searchsorted(counts, ndata))
+        before = int(counts[day - 1]) if day > 0 else 0
+        last = np.flatnonzero(keep_days[day])[ndata - before - 1]
+        mjd_stop = mjd_start + day + last * sampling_s / 86400
+
+    hdr = tfexhdr.tfexhdr()
+    hdr.TFEXVER = "0.2"
+    hdr.MJDSTART = mjd_start
+    hdr.MJDSTOP = mjd_stop
+    hdr.NDATA = ndata
+    hdr.PREFIX = {'si': 'https://si-digital-framework.org/SI/units/'}
+    hdr.SAMPLING_INTERVAL_s = float(sampling_s)
+    hdr.MISSING_EPOCHS = gap_fraction > 0
+    hdr.AUTHOR = "utclib.synthetic"
+    hdr.add_refpoint(rp_id="A", rp_ts="UTC(XX)", rp_dev="XX01",
+                     rp_type="GNSS")
+    hdr.add_refpoint(rp_id="B", rp_ts="UTC(YY)", rp_dev="YY01",
+                     rp_type="GNSS")
+    hdr.COLUMNS = [
+        {'timetag': True, 'label': 'MJD', 'scale': 'utc', 'unit': 'si:day',
+         'format': '5d'},
+        {'timetag': True, 'label': 'SoD', 'scale': 'utc',
+         'unit': 'si:second', 'format': sod_fmt}]
+    for j in range(ncols):
+        hdr.COLUMNS.append(
+            {'label': 'delta_t' if j == 0 else 'delta_t_{}'.format(j),
+             'trip': ['AB'], 'unit': 'si:nanosecond', 'format': fmt})
+
+    rng = np.random.default_rng(seed)
+    level = rng.normal(0, 100, ncols)
+    count = 0
+    with open(path, "w") as fp:
+        fp.write(hdr.write() + "\n")
+        for day, keep in enumerate(keep_days):
+            # Random walk carried from one day to the next
+            walk = level + np.cumsum(
+                rng.normal(0, 0.01, (nepoch, ncols)), axis=0)
+            level = walk[-1]
+            values = walk + rng.normal(0, 0.1, (nepoch, ncols))
+            idx = np.flatnonzero(keep)
+            if nlines is not None:
+                idx = idx[:nlines - count]
+            cols = [np.char.mod('%5d', np.full(idx.size, mjd_start + day)),
+                    np.char.mod('%' + sod_fmt, idx * sampling_s)]
+            for j in range(ncols):
+                col = np.char.mod('%' + fmt, values[idx, j])
+                missing = rng.uniform(0, 1, idx.size) < missing_fraction
+                col[missing] = '*'.rjust(width)
+                cols.append(col)
+            lines = cols[0]
+            for col in cols[1:]:
+                lines = np.char.add(np.char.add(lines, ' '), col)
+            if lines.size:
+                fp.write("\n".join(lines.tolist()) + "\n")
+            count += idx.size
+            if nlines is not None and count >= nlines:
+                break
+    return count
+
+
+def day_gaps(seed, day, nepoch, gap_fraction):
+    """ Boolean array of the epochs kept for a day, with gaps as blocks
+    """
+    keep = np.full(nepoch, True)
+    if gap_fraction <= 0:
+        return keep
+    rng = np.random.default_rng([seed, day])
+    ngap = max(1, rng.poisson(3))
+    lengths = rng.exponential(gap_fraction * nepoch / ngap, ngap)
+    for length in lengths.astype(np.int64):
+        start = rng.integers(0, nepoch)
+        keep[start:start + length] = False
+    return keep
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic CGGTTS or tfex files")
+    parser.add_argument(
+        "kind",
+        choices=["cggtts", "tfex"],
+        help="file type")
+    parser.add_argument(
+        "output",
+        help="output directory (cggtts) or file (tfex)")
+    parser.add_argument(
+        "--days", "-d",
+        type=int,
+        default=1,
+        help="number of days")
+    parser.add_argument(
+        "--mjd", "-m",
+        type=int,
+        default=60000,
+        help="first MJD")
+    parser.add_argument(
+        "--sig", "-s",
+        default="GPS_L3P",
+        help="cggtts constellation and frequency (e.g. GAL_L3E)")
+    parser.add_argument(
+        "--ext",
+        help="cggtts extension (REFUTC or TGD)")
+    parser.add_argument(
+        "--sampling",
+        type=float,
+        default=1,
+        help="tfex sampling interval in s")
+    parser.add_argument(
+        "--gaps",
+        type=float,
+        default=0,
+        help="tfex fraction of missing epochs")
+    parser.add_argument(
+        "--missing",
+        type=float,
+        default=0,
+        help="tfex fraction of '*' values")
+    args = parser.parse_args()
+
+    if args.kind == "cggtts":
+        const, freq = args.sig.split('_')
+        gen_cggtts_archive(args.output, const=const, freq=freq,
+                           mjd_start=args.mjd, ndays=args.days,
+                           ext_type=args.ext)
+    else:
+        write_tfex(args.output, ndays=args.days, sampling_s=args.sampling,
+                   mjd_start=args.mjd, gap_fraction=args.gaps,
+                   missing_fraction=args.missing)
@@ -19,30 +19,121 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import numpy as np
 
+
+def _select_valid(valid, key):
+    """ Validity masks of the rows / columns selected by key
+    """
+    if isinstance(key, list) and key and isinstance(key[0], str):
+        return {name: valid[name] for name in key if name in valid}
+    return {name: mask[key] for name, mask in valid.items()}
+
+
+def _assign_valid(table, key, value):
+    """ Update the validity masks of table after value was assigned to the
+    rows selected by key : the rows take the masks of value (valid if it
+    has none)
+    """
+    if isinstance(key, str) or (isinstance(key, list) and key
+                                and isinstance(key[0], str)):
+        return
+    value_valid = getattr(value, "valid", {})
+    for name in set(table.valid) | set(value_valid):
+        mask = table.valid.get(name)
+        mask = np.ones(len(table), dtype=np.bool_) if mask is None \
+            else mask.copy()
+        mask[key] = value_valid.get(name, True)
+        table.set_valid(name, mask)
+
+
+def masked_reduce(table, col, func=np.mean, **kwargs):
+    """ Reduction of a column over its valid rows, without copying it
+
+    Parameters
+    ----------
+    table : tabarray or coltabarray
+    col : int or str
+        column position or label
+    func : numpy function accepting a where argument
+        np.sum, np.mean, np.std, np.min (with initial=)...
+    kwargs :
+        passed to func
+
+    Returns
+    -------
+    func(column, where=validity mask)
+    """
+    values = table[:, col]
+    mask = table.get_valid(col)
+    if mask is None:
+        return func(values, **kwargs)
+    return func(values, where=mask, **kwargs)
+
+
 class tabarray(np.ndarray):
+    """ Structured array with matrix like syntax. Missing values of a
+    column are flagged by a validity mask (see set_valid), so that integer
+    columns keep their dtype.
+    """
     def __new__(cls, input_array):
         if type(input_array) is np.ndarray and input_array.ndim > 1:
             raise Exception("Sorry, mulitidmensional array not supported") 
         return np.asarray(input_array).view(cls)
+
+    def __array_finalize__(self, obj):
+        # {label: bool array}, False for missing values. Columns without
+        # entry have no missing value. Kept by copies and ufunc results,
+        # row selections get theirs from __getitem__.
+        valid = getattr(obj, "valid", None)
+        if (valid and self.dtype.names is not None
+                and getattr(obj, "shape", None) == self.shape):
+            self.valid = dict(valid)
+        else:
+            self.valid = {}
+
+    def get_valid(self, col):
+        """ Validity mask (one byte per row) of a column, None if all its
+        values are valid
+        """
+        return self.valid.get(self._field_name(col))
+
+    def set_valid(self, col, mask):
+        """ Set the validity mask of a column, None or all True if all its
+        values are valid
+        """
+        name = self._field_name(col)
+        if mask is None or np.all(mask):
+            self.valid.pop(name, None)
+        else:
+            self.valid[name] = np.asarray(mask, dtype=np.bool_)
     
+    def _field_name(self, col):
+        """ Name of a field given by its label or its position
+        """
+        if isinstance(col, str):
+            return col
+        return self.dtype.names[col]
+
     def __getitem__(self, key):
         """
          Summary line.
         
          overloading the __getitem__ method from ndarray.
          This way array[:][array.dtype.names[0]] becomes simply array[:,0]
+         (or array[:, 'label']).
          For a one dimensional structured array array[:,0] would throw an error so no coflict is possible
     
         
          """
-        if type(key) is tuple and len(key) == 2:
-            t_obj = super(tabarray, self).__getitem__(key[0])
-            if type(t_obj) is np.void:
-                return t_obj[key[1]]  # case single
-            else:
-                return super(tabarray,t_obj).__getitem__(self.dtype.names[key[1]]) # case slice
-        else:
-            return super(tabarray, self).__getitem__(key)
+        if (type(key) is tuple and len(key) == 2
+                and self.dtype.names is not None):
+            field = super(tabarray, self).__getitem__(
+                self._field_name(key[1]))
+            return field[key[0]]
+        out = super(tabarray, self).__getitem__(key)
+        if (self.valid and isinstance(out, tabarray)
+                and out.dtype.names is not None):
+            out.valid = _select_valid(self.valid, key)
+        return out
 
     def __setitem__(self, key, value):
         """
@@ -51,33 +142,145 @@ class tabarray(np.ndarray):
          overloading the __setitem__ method from ndarray.
          This way array[:][array.dtype.names[0]] = ... becomes simply array[:,0] = ...
          For a one dimensional structured array array[:,0] would throw an error so no coflict is possible
-    
-        
+
+         The assignment is made on the field view, i.e. in a single numpy
+         operation (any row index, negative steps and broadcasting allowed).
          """
-        if not isinstance(key, int) and len(key) == (self.ndim +1):
-            if type(key[0]) is slice:
-                if key[0].start is None:
-                    start = 0
-                else:
-                    start = key[0].start
-                
-                if key[0].stop is None:
-                    stop = len(self)
-                else:
-                    stop = key[0].stop
-                
-                if key[0].step is None:
-                    step = 1
-                else:
-                    step = key[0].step
-                    
-                
-                for d in range(start, stop, step):
-                    super(tabarray, self).__getitem__(d).__setitem__(key[1],value[d-start])
-                    
-            else:
-                super(tabarray, self).__getitem__(key[0]).__setitem__(key[1],value)
+        if (type(key) is tuple and len(key) == 2
+                and self.dtype.names is not None):
+            field = super(tabarray, self).__getitem__(
+                self._field_name(key[1]))
+            np.ndarray.__setitem__(field, key[0], value)
         else:
             super(tabarray, self).__setitem__(key,value)
-        
+            if self.valid or getattr(value, "valid", None):
+                _assign_valid(self, key, value)
+
 
+class coltabarray:
+    """ Column-store counterpart of tabarray: one contiguous numpy array per
+    column instead of one structured (record) array, with the same indexing
+    syntax:
+
+        t[:, 0], t[:, 'label'], t['label']   column (a view)
+        t[rows]                              coltabarray of the selected rows
+        t[['a', 'b']]                        coltabarray of some columns
+        t[:, 0] = ...                        assignment to a column
+
+    dtype is the equivalent structured dtype, and np.asarray(t) returns the
+    record layout (see to_records), so that code written for tabarray keeps
+    working.
+    """
+    def __init__(self, columns):
+        """
+        Parameters
+        ----------
+        columns : dict or list of (label, numpy array)
+            the arrays are used as is (no copy) when they are contiguous
+        """
+        items = columns.items() if isinstance(columns, dict) else columns
+        self.columns = {}
+        for label, values in items:
+            self.columns[label] = np.ascontiguousarray(values)
+        lengths = set(len(v) for v in self.columns.values())
+        if len(lengths) > 1:
+            raise Exception("All the columns should have the same length")
+        self._len = lengths.pop() if lengths else 0
+        self.dtype = np.dtype([(label, v.dtype)
+                               for label, v in self.columns.items()])
+        # Validity masks, as in tabarray
+        self.valid = {}
+
+    @classmethod
+    def empty(cls, n, dtype):
+        """ Uninitialized coltabarray of n rows, dtype : structured dtype or
+        list of (label, type)
+        """
+        dtype = np.dtype(dtype)
+        return cls([(name, np.empty((n, ), dtype=dtype[name]))
+                    for name in dtype.names])
+
+    get_valid = tabarray.get_valid
+    set_valid = tabarray.set_valid
+
+    @classmethod
+    def from_records(cls, records):
+        """ coltabarray from a structured array or tabarray. Each field is
+        copied into a contiguous array, except when it is already contiguous
+        (single field without padding) : it is then a view.
+        """
+        out = cls([(name, np.asarray(records)[name])
+                   for name in records.dtype.names])
+        out.valid = dict(getattr(records, "valid", {}))
+        return out
+
+    def to_records(self):
+        """ tabarray with the same content (a copy)
+        """
+        out = np.empty((self._len, ), dtype=self.dtype)
+        for name, values in self.columns.items():
+            out[name] = values
+        out = tabarray(out)
+        out.valid = dict(self.valid)
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        out = np.asarray(self.to_records())
+        return out if dtype is None else out.astype(dtype)
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def shape(self):
+        return (self._len, )
+
+    @property
+    def size(self):
+        return self._len
+
+    @property
+    def ndim(self):
+        return 1
+
+    def __repr__(self):
+        return "coltabarray({})".format(repr(self.to_records()))
+
+    def _field_name(self, col):
+        if isinstance(col, str):
+            return col
+        return self.dtype.names[col]
+
+    def __getitem__(self, key):
+        if type(key) is tuple and len(key) == 2:
+            return self.columns[self._field_name(key[1])][key[0]]
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, (int, np.integer)):
+            return tuple(v[key] for v in self.columns.values())
+        if isinstance(key, list) and key and isinstance(key[0], str):
+            out = coltabarray([(name, self.columns[name]) for name in key])
+        else:
+            out = coltabarray([(name, v[key])
+                               for name, v in self.columns.items()])
+        out.valid = _select_valid(self.valid, key)
+        return out
+
+    def __setitem__(self, key, value):
+        if type(key) is tuple and len(key) == 2:
+            self.columns[self._field_name(key[1])][key[0]] = value
+        elif isinstance(key, str):
+            self.columns[key][...] = value
+        else:
+            # Rows : value is a record, a structured array or a coltabarray
+            source = value
+            if isinstance(value, coltabarray):
+                value = value.columns
+            elif isinstance(value, np.ndarray) and value.dtype.names:
+                value = {name: value[name] for name in value.dtype.names}
+            else:
+                value = dict(zip(self.columns, value))
+            for name, v in self.columns.items():
+                v[key] = value[name]
+            if self.valid or getattr(source, "valid", None):
+                _assign_valid(self, key, source)
@@ -15,9 +15,174 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import functools
 import numpy as np
 
 
+def _copied(out):
+    """ copy of the arrays of a cached getter result """
+    if isinstance(out, tuple):
+        return tuple(_copied(a) for a in out)
+    if isinstance(out, np.ndarray):
+        return out.copy()
+    return out
+
+
+def _memoized(method):
+    """ Cache the result of a getter on the object, per arguments. The
+    cached arrays are read-only: callers get writable copies, which is much
+    cheaper than computing them again, while the getters called from
+    another getter share the cached arrays. Within one call, results too
+    large for the cache are computed only once (see taiseconds.clear_cache)
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        outer = self._call_results is None
+        out = self._lookup(key)
+        if out is not None:
+            return _copied(out) if outer else out
+        if outer:
+            self._call_results = {}
+        try:
+            out = method(self, *args, **kwargs)
+        finally:
+            if outer:
+                self._call_results = None
+        cached = self._store(key, out)
+        if outer:
+            return _copied(out) if cached else out
+        if not cached:
+            self._call_results[key] = out
+        return out
+    return wrapper
+
+
+def days_from_civil(years, months, days):
+    """ number of days since 1970-01-01 of proleptic Gregorian dates, in
+    integer arithmetic (H. Hinnant, chrono-compatible low-level date
+    algorithms)
+    Parameters
+    ----------
+    years, months, days : numpy arrays (nx) int64
+
+    Output
+    ----------
+    days : numpy array (nx) int64
+    """
+    years = years - (months <= 2)
+    era = years // 400
+    yoe = years - era*400                                    # [0, 399]
+    doy = (153*(months + np.where(months > 2, -3, 9)) + 2)//5 + days - 1
+    doe = yoe*365 + yoe//4 - yoe//100 + doy                  # [0, 146096]
+    return era*146097 + doe - 719468
+
+
+def civil_from_days(day_number):
+    """ inverse of days_from_civil
+    Parameters
+    ----------
+    day_number : numpy array (nx) int64 days since 1970-01-01
+
+    Output
+    ----------
+    years, months, days : numpy arrays (nx) int64
+    """
+    z = day_number + 719468
+    era = z // 146097
+    doe = z - era*146097                                     # [0, 146096]
+    yoe = (doe - doe//1460 + doe//36524 - doe//146096)//365  # [0, 399]
+    doy = doe - (365*yoe + yoe//4 - yoe//100)                # [0, 365]
+    mp = (5*doy + 2)//153                                    # [0, 11]
+    days = doy - (153*mp + 2)//5 + 1                         # [1, 31]
+    months = np.where(mp < 10, mp + 3, mp - 9)               # [1, 12]
+    return yoe + era*400 + (months <= 2), months, days
+
+
+def decimal_from_text(texts):
+    """ exact decoding of decimal strings ('  86399.1234567890123', '-1.5',
+    '42'), in integer digit arithmetic : no float round-trip. The strings
+    are decoded together as a character matrix.
+    Parameters
+    ----------
+    texts : numpy array (nx) or list of str, blank padded, with at most 18
+            integer digits. Decimals beyond the 16th are truncated.
+
+    Output
+    ----------
+    ints : numpy array (nx) int64 floor of the values
+    frac : numpy array (nx) int64 values - ints, in 1 / FRAC_MULTIPLIER
+    (None if a string is not a decimal number)
+    """
+    raw = np.array(texts, ndmin=1)
+    if raw.dtype.kind not in 'SU':
+        raw = raw.astype(np.bytes_)
+    # One code per character : bytes, or UCS4 for str (no conversion)
+    code = np.uint8 if raw.dtype.kind == 'S' else np.uint32
+    n, width = raw.size, raw.dtype.itemsize // np.dtype(code).itemsize
+    mat = raw.view(code).reshape(n, width)
+    digits = mat - code(ord('0'))                   # wraps around below '0'
+    is_digit = digits <= 9
+    is_dot = mat == ord('.')
+    filled = (mat != ord(' ')) & (mat != 0)
+    # Layout : blanks, sign, digits, dot, digits, blanks
+    first = np.argmax(filled, axis=1)
+    last = width - 1 - np.argmax(filled[:, ::-1], axis=1)
+    dot = np.where(np.any(is_dot, axis=1), np.argmax(is_dot, axis=1),
+                   last + 1)
+    pos = np.arange(width)
+    sign = mat[np.arange(n), first]
+    has_sign = (sign == ord('-')) | (sign == ord('+'))
+    inside = (pos >= (first + has_sign)[:, None]) & (pos <= last[:, None])
+    ok = np.all(is_digit | is_dot | ~inside, axis=1)
+    ok &= ((np.count_nonzero(is_dot, axis=1) <= 1)
+           & np.any(is_digit, axis=1)
+           & (dot - first - has_sign <= 18))
+    if not np.all(ok):
+        print("ERROR: invalid decimal numbers: {}".format(raw[~ok][:5]))
+        return
+
+    # Each digit weighs 10**(dot-1-i) in the integer part and
+    # 10**(16-(i-dot)) among the 16 first decimals : one weighted sum along
+    # the rows per position of the dot (a single one for fixed formats)
+    values = np.where(is_digit, digits, 0).astype(np.uint8)
+    powers = 10**np.arange(19, dtype=np.int64)
+    ints = np.zeros(n, np.int64)
+    frac = np.zeros(n, np.int64)
+    dots = np.unique(dot)
+    for d in dots:
+        rows = slice(None) if len(dots) == 1 else dot == d
+        rank = d - pos
+        ints[rows] = np.einsum('ij,j->i', values[rows],
+                               np.where(rank > 0, powers[rank.clip(1, 19) - 1], 0))
+        frac[rows] = np.einsum(
+            'ij,j->i', values[rows],
+            np.where((rank < 0) & (rank >= -16), powers[(16 + rank).clip(0, 18)],
+                     0))
+    negative = sign == ord('-')
+    ints[negative] = -ints[negative] - (frac[negative] > 0)
+    frac[negative] = np.where(frac[negative] > 0,
+                              10**16 - frac[negative], 0)
+    return ints, frac
+
+
+def seconds_from_day_fraction(frac):
+    """ exact conversion of day fractions to seconds
+    Parameters
+    ----------
+    frac : numpy array (nx) int64 fraction of day, in 1 / FRAC_MULTIPLIER
+
+    Output
+    ----------
+    seconds : numpy array (nx) int64 whole seconds
+    frac : numpy array (nx) int64 remaining fraction, in 1 / FRAC_MULTIPLIER
+    """
+    # 86400 * frac overflows int64 : multiply the two halves separately
+    high, low = np.divmod(frac, 10**8)
+    seconds, rest = np.divmod(high*86400, 10**8)
+    carry, frac = np.divmod(rest*10**8 + low*86400, 10**16)
+    return seconds + carry, frac
+
 
 class taiseconds:
     """
@@ -33,6 +198,8 @@ class taiseconds:
     TAISEC_BDS0 = 1514764833
     TAISEC_GAL0 = 1313971219
     DSEC_TAIGPS = 19
+    # Maximum size of the results cached on each object (see clear_cache)
+    CACHE_MAX_BYTES = 2**28
     # first colums in second elsapsed since TAI start epoch, second could is the number of non leap secons elapsed , third colum is TAI - UTC in seconds after that date
     LEAP_SEC_TAB = np.array( [[ 441763210, 10]   # 1972   1    1 UTC
                              ,[ 457488011, 11]   # 1972   7    1 UTC
@@ -64,11 +231,87 @@ class taiseconds:
                              ,[1861920037, 37]]) # 2017   1    1 UTC
     def __init__(self):
 
+        # Results of the getters, see _memoized
+        self._cache = {}
+        self._cache_bytes = 0
+        # Results of the getters too large for the cache, kept during the
+        # outermost getter call (see _memoized)
+        self._call_results = None
         # HEADER
         self.tai_seconds = None                    #  nx 2 numpy int64 array:
                                                    #  first colums seconds sinc TAI origin
                                                    #  fractional part of the second in attoseconds 1e-18s
-
+        # Compressed form (see compress): None or dict with the grid
+        # start / step ([seconds, fraction]), its number of slots, the
+        # sorted slots without epoch ('missing'), and the slots whose epoch
+        # is off the grid ('irregular') with their epochs ('irregular_tai')
+        self._grid = None
+
+    @property
+    def tai_seconds(self):
+        """ n x 2 int64 array, built from the grid on first access for
+        compressed objects (which are then no longer compressed, since the
+        array may be modified in place). Use getTaiSeconds to only read it.
+        """
+        if self._grid is not None:
+            self._tai_seconds = self._materialize()
+            self._grid = None
+        return self._tai_seconds
+
+    @tai_seconds.setter
+    def tai_seconds(self, value):
+        self._grid = None
+        self._tai_seconds = value
+        self.clear_cache()
+
+    def clear_cache(self):
+        """ forget the cached results of the getters (getMJD,
+        getIntMJDSOD...). Done automatically by the modifications made
+        through the object (tai_seconds = ..., obj[idx] = ..., append), to
+        be called after modifying the tai_seconds array in place.
+        """
+        self._cache = {}
+        self._cache_bytes = 0
+
+    def _lookup(self, key):
+        """ cached getter result, None if not available """
+        out = self._cache.get(key)
+        if out is None and self._call_results is not None:
+            out = self._call_results.get(key)
+        return out
+
+    def _store(self, key, out):
+        """ cache a getter result, oldest results are dropped beyond
+        CACHE_MAX_BYTES. Returns False if the result is too large to be
+        cached.
+        """
+        arrays = [a for a in (out if isinstance(out, tuple) else (out, ))
+                  if isinstance(a, np.ndarray)]
+        nbytes = sum(a.nbytes for a in arrays)
+        if nbytes > self.CACHE_MAX_BYTES:
+            return False
+        for a in arrays:
+            a.flags.writeable = False
+        while self._cache_bytes + nbytes > self.CACHE_MAX_BYTES:
+            old_key = next(iter(self._cache))
+            old = self._cache.pop(old_key)
+            self._cache_bytes -= sum(
+                a.nbytes for a in (old if isinstance(old, tuple) else (old, ))
+                if isinstance(a, np.ndarray))
+        self._cache[key] = out
+        self._cache_bytes += nbytes
+        return True
+
+    @property
+    def is_compressed(self):
+        return self._grid is not None
+
+    def __len__(self):
+        if self._grid is not None:
+            return self._grid['count'] - len(self._grid['missing'])
+        if self._tai_seconds is None:
+            return 0
+        return self._tai_seconds.shape[0]
 
     @classmethod
     def fromMJD(self,mjd):
@@ -86,6 +329,29 @@ class taiseconds:
         obj.applyLeapSecond()
         return obj
     
+    @classmethod
+    def fromGrid(self, start, step, count):
+        """ create a compressed object of regularly spaced epochs
+        Parameters
+        ----------
+        start : taiseconds (1 epoch) first epoch
+        step  : float or (int, int) step in s, or seconds and fraction
+                (in 1 / FRAC_MULTIPLIER s) for an exact step
+        count : int number of epochs
+
+        """
+        obj = self()
+        if np.isscalar(step):
+            step = (int(np.floor(step)),
+                    int(round((step % 1) * self.FRAC_MULTIPLIER)))
+        obj._grid = {'start': [int(v) for v in start.tai_seconds[0]],
+                     'step': [int(v) for v in step],
+                     'count': int(count),
+                     'missing': np.zeros(0, np.int64),
+                     'irregular': np.zeros(0, np.int64),
+                     'irregular_tai': np.zeros((0, 2), np.int64)}
+        return obj
+
     @classmethod
     def fromBesselianDate(self,bess_date):
         """ createthe object from a numpy array of besselian date
@@ -123,17 +389,66 @@ class taiseconds:
         return obj
 
     @classmethod
-    def fromUnixTime(self,unixsecond):
+    def fromIntMJDSoD(self, mjd, sod, frac=None):
+        """ create the object from integer MJDs and seconds of day, exactly
+        Parameters
+        ----------
+        mjd  : numpy array (nx1) int MJDS
+        sod  : numpy array (nx1) int second of days
+        frac : numpy array (nx1) int64 (opt) fraction of second, in
+               1 / FRAC_MULTIPLIER
+
+        """
+        obj = self()
+        obj.tai_seconds = np.zeros((len(mjd),2),np.int64)
+        obj.tai_seconds[:,0] = ((np.asarray(mjd, np.int64) - obj.MJD_TAI0)*86400
+                                + np.asarray(sod, np.int64))
+        if frac is not None:
+            obj.tai_seconds[:,1] = frac
+
+        obj.applyLeapSecond()
+        return obj
+
+    @classmethod
+    def fromMJDSoDText(self, mjd, sod=None):
+        """ create the object from the text of MJDs (possibly fractional)
+        and seconds of day, decoded exactly (see decimal_from_text)
+        Parameters
+        ----------
+        mjd : numpy array (nx1) or list of str MJDS
+        sod : numpy array (nx1) or list of str (opt) Second of days
+
+        """
+        decoded = decimal_from_text(mjd)
+        if decoded is None:
+            return
+        days, day_frac = decoded
+        seconds, frac = seconds_from_day_fraction(day_frac)
+        if sod is not None:
+            decoded = decimal_from_text(sod)
+            if decoded is None:
+                return
+            seconds = seconds + decoded[0]
+            carry, frac = np.divmod(frac + decoded[1], 10**16)
+            seconds += carry
+        return self.fromIntMJDSoD(days, seconds, frac)
+
+    @classmethod
+    def fromUnixTime(self,unixsecond,frac=None):
         """ createthe object from a numpy array of unix time
         Parameters
         ----------
         unixsecond : numpy array (nx1) non leap second elapsed since 1 1 1970
+        frac : numpy array (nx1) int64 (opt) fraction of second, in
+               1 / FRAC_MULTIPLIER, added to integer unixsecond
 
         """
         obj = self()
         obj.tai_seconds = np.zeros((len(unixsecond),2),np.int64)
         obj.tai_seconds[:,0] = np.floor(unixsecond - obj.UNIX_TAI0)
         obj.tai_seconds[:,1] = np.round(np.remainder(unixsecond,1)*self.FRAC_MULTIPLIER)
+        if frac is not None:
+            obj.tai_seconds[:,1] = frac
 
         obj.applyLeapSecond()
         return obj
@@ -163,35 +478,15 @@ class taiseconds:
 
 
         obj = self()
-        seconds = np.asarray(seconds)
+        seconds = np.array(np.broadcast_arrays(
+            years, months, days, hours, minutes, seconds)[-1],
+            dtype=np.float64, ndmin=1)
 
         idx_leap = seconds >= 60
-        idx_not_leap = np.logical_not(idx_leap)
         seconds[idx_leap] -= 1
 
-        frac_seconds = np.remainder(seconds,1)
-        seconds = np.floor(seconds)
-
-        # convert ot numpy datatime64
-        milliseconds=None
-        microseconds=None
-        nanoseconds=None
-        years = np.asarray(years) - 1970
-        months = np.asarray(months) - 1
-        days = np.asarray(days) - 1
-        types = ('<M8[Y]', '<m8[M]', '<m8[D]', '<m8[h]','<m8[m]', '<m8[s]', '<m8[ms]', '<m8[us]', '<m8[ns]')
-        vals = (years, months, days, hours, minutes, seconds, milliseconds, microseconds, nanoseconds)
-        npdate = sum(np.asarray(v, dtype=t) for t, v in zip(types, vals) if v is not None)
-
-
-
-        obj.tai_seconds = np.zeros((years.size,2),np.int64)
-        timedelta = npdate - obj.DATETIME64_TAI0
-        obj.tai_seconds[:,0] = timedelta.astype('timedelta64[s]').astype(np.int64)
-        obj.tai_seconds[:,1] = np.round(frac_seconds*self.FRAC_MULTIPLIER)
-
-
-
+        obj.tai_seconds = obj._naiveCalendar(years, months, days, hours,
+                                             minutes, seconds)
         obj.applyLeapSecond()
 
         obj.tai_seconds[idx_leap,0] += 1
@@ -221,44 +516,104 @@ class taiseconds:
 
 
         obj = self()
-        seconds = np.asarray(seconds)
-
-
-        frac_seconds = np.remainder(seconds,1)
-        seconds = np.floor(seconds)
-
-        # convert ot numpy datatime64
-        milliseconds=None
-        microseconds=None
-        nanoseconds=None
-        years = np.asarray(years) - 1970
-        months = np.asarray(months) - 1
-        days = np.asarray(days) - 1
-        types = ('<M8[Y]', '<m8[M]', '<m8[D]', '<m8[h]','<m8[m]', '<m8[s]', '<m8[ms]', '<m8[us]', '<m8[ns]')
-        vals = (years, months, days, hours, minutes, seconds, milliseconds, microseconds, nanoseconds)
-        npdate = sum(np.asarray(v, dtype=t) for t, v in zip(types, vals) if v is not None)
-
-
-
-        obj.tai_seconds = np.zeros((years.size,2),np.int64)
-        timedelta = npdate - obj.DATETIME64_TAI0
-        obj.tai_seconds[:,0] = timedelta.astype('timedelta64[s]').astype(np.int64)
-        obj.tai_seconds[:,1] = np.round(frac_seconds*self.FRAC_MULTIPLIER)
+        seconds = np.array(np.broadcast_arrays(
+            years, months, days, hours, minutes, seconds)[-1],
+            dtype=np.float64, ndmin=1)
+        obj.tai_seconds = obj._naiveCalendar(years, months, days, hours,
+                                             minutes, seconds)
         obj.tai_seconds[:,0] += obj.DSEC_TAIGPS
+        return obj
 
+    def _naiveCalendar(self, years, months, days, hours, minutes, seconds):
+        """ n x 2 array of the seconds since the TAI origin of calendar
+        dates, ignoring leap seconds (integer arithmetic, see
+        days_from_civil)
+        """
+        as_int = lambda v: np.array(v, ndmin=1).astype(np.int64)
+        day_number = days_from_civil(as_int(years), as_int(months),
+                                     as_int(days))
+        int_seconds = np.floor(seconds)
+        tai_seconds = np.zeros((seconds.size,2),np.int64)
+        tai_seconds[:,0] = (day_number*86400 + as_int(hours)*3600 +
+                            as_int(minutes)*60 + int_seconds.astype(np.int64)
+                            - self.UNIX_TAI0)
+        tai_seconds[:,1] = np.round((seconds - int_seconds)*self.FRAC_MULTIPLIER)
+        return tai_seconds
 
+    @classmethod
+    def fromISO8601(self, dates):
+        """ create the object from ISO 8601 UTC strings
+        'YYYY-MM-DDTHH:MM:SS[.f...][Z]' ('T' or ' ' separator, up to 16
+        decimals, :60 for leap seconds). The strings are decoded together as
+        a byte matrix.
+        Parameters
+        ----------
+        dates : numpy array (nx) or list of str
 
+        """
+        raw = np.array(dates, dtype=np.bytes_, ndmin=1)
+        width = max(raw.dtype.itemsize, 19)
+        mat = np.zeros((raw.size, width), np.uint8)
+        mat[:, :raw.dtype.itemsize] = raw.view(np.uint8).reshape(
+            raw.size, raw.dtype.itemsize)
+        digits = mat.astype(np.int64) - ord('0')
+        is_digit = (digits >= 0) & (digits <= 9)
+        fields = [(0, 4), (5, 2), (8, 2), (11, 2), (14, 2), (17, 2)]
+        ok = np.all(is_digit[:, [p + i for p, k in fields
+                                 for i in range(k)]], axis=1)
+        ok &= (np.all(mat[:, [4, 7]] == ord('-'), axis=1)
+               & np.all(mat[:, [13, 16]] == ord(':'), axis=1)
+               & ((mat[:, 10] == ord('T')) | (mat[:, 10] == ord(' '))))
+        values = []
+        for pos, k in fields:
+            v = np.zeros(raw.size, np.int64)
+            for i in range(k):
+                v = v*10 + digits[:, pos + i]
+            values.append(v)
+        years, months, days, hours, minutes, seconds = values
+        # Fraction : digits following '.', 16 at most
+        frac = np.zeros(raw.size, np.int64)
+        end = np.full(raw.size, 19)
+        if width > 20:
+            has_frac = mat[:, 19] == ord('.')
+            run = has_frac.copy()
+            for i in range(20, width):
+                run &= is_digit[:, i]
+                if i < 36:
+                    frac += np.where(run, digits[:, i], 0) * 10**(35 - i)
+                end += run
+            end += has_frac
+        tail = mat[np.arange(raw.size), np.minimum(end, width - 1)]
+        ok &= (end == width) | (tail == ord('Z')) | (tail == 0)
+        ok &= ((end + 1 >= width)
+               | (mat[np.arange(raw.size), np.minimum(end + 1, width - 1)]
+                  == 0))
+        if not np.all(ok):
+            print("ERROR: invalid ISO 8601 dates: {}".format(
+                raw[~ok][:5]))
+            return
 
-
+        obj = self()
+        idx_leap = seconds == 60
+        seconds[idx_leap] -= 1
+        obj.tai_seconds = np.zeros((raw.size,2),np.int64)
+        obj.tai_seconds[:,0] = (days_from_civil(years, months, days)*86400
+                                + hours*3600 + minutes*60 + seconds
+                                - obj.UNIX_TAI0)
+        obj.tai_seconds[:,1] = frac
+        obj.applyLeapSecond()
+        obj.tai_seconds[idx_leap,0] += 1
         return obj
 
     @classmethod
-    def fromGPSWeekSow(self,week,sow):
+    def fromGPSWeekSow(self,week,sow,frac=None):
         """ createthe object from a numpy array of MJDs
         Parameters
         ----------
         week   : numpy array (nx)
         sow  : numpy array (nx) second of the week
+        frac : numpy array (nx) int64 (opt) fraction of second, in
+               1 / FRAC_MULTIPLIER, added to integer sow
 
         """
         obj = self()
@@ -269,16 +624,20 @@ class taiseconds:
         obj.tai_seconds = np.zeros((nep,2),np.int64)
         obj.tai_seconds[:,0] = self.TAISEC_GPS0 + week.astype(np.int64)*86400*7 + np.floor(sow).astype(np.int64)
         obj.tai_seconds[:,1] = (np.remainder(sow,1)*self.FRAC_MULTIPLIER).astype(np.int64)
+        if frac is not None:
+            obj.tai_seconds[:,1] = frac
 
         return obj
 
     @classmethod
-    def fromGALWeekSow(self,week,sow):
+    def fromGALWeekSow(self,week,sow,frac=None):
         """ createthe object from a numpy array of MJDs
         Parameters
         ----------
         week   : numpy array (nx)
         sow  : numpy array (nx) second of the week
+        frac : numpy array (nx) int64 (opt) fraction of second, in
+               1 / FRAC_MULTIPLIER, added to integer sow
 
         """
         obj = self()
@@ -289,16 +648,20 @@ class taiseconds:
         obj.tai_seconds = np.zeros((nep,2),np.int64)
         obj.tai_seconds[:,0] = self.TAISEC_GAL0 + week.astype(np.int64)*86400*7 + np.floor(sow).astype(np.int64)
         obj.tai_seconds[:,1] = (np.remainder(sow,1)*self.FRAC_MULTIPLIER).astype(np.int64)
+        if frac is not None:
+            obj.tai_seconds[:,1] = frac
 
         return obj
 
     @classmethod
-    def fromBDSWeekSow(self,week,sow):
+    def fromBDSWeekSow(self,week,sow,frac=None):
         """ createthe object from a numpy array of MJDs
         Parameters
         ----------
         week   : numpy array (nx)
         sow  : numpy array (nx) second of the week
+        frac : numpy array (nx) int64 (opt) fraction of second, in
+               1 / FRAC_MULTIPLIER, added to integer sow
 
         """
         obj = self()
@@ -309,17 +672,217 @@ class taiseconds:
         obj.tai_seconds = np.zeros((nep,2),np.int64)
         obj.tai_seconds[:,0] = self.TAISEC_BDS0 + week.astype(np.int64)*86400*7 + np.floor(sow).astype(np.int64)
         obj.tai_seconds[:,1] = (np.remainder(sow,1)*self.FRAC_MULTIPLIER).astype(np.int64)
+        if frac is not None:
+            obj.tai_seconds[:,1] = frac
 
         return obj
 
 
 
 
+    def _grid_epochs(self, pos):
+        """ exact epochs (n x 2) of the grid slots pos
+        """
+        frac_mul = int(self.FRAC_MULTIPLIER)
+        (s0, f0), (ss, sf) = self._grid['start'], self._grid['step']
+        pos = np.asarray(pos, dtype=np.int64)
+        # pos * sf may overflow int64: split sf in two 8-digit halves
+        hi, lo = divmod(sf, 10**8)
+        khi = pos * hi
+        klo = pos * lo
+        frac = f0 + (khi % 10**8) * 10**8 + klo % frac_mul
+        out = np.empty((pos.size, 2), np.int64)
+        out[:, 0] = s0 + pos * ss + khi // 10**8 + klo // frac_mul + \
+            frac // frac_mul
+        out[:, 1] = frac % frac_mul
+        return out
+
+    def _grid_slots(self, tai):
+        """ nearest grid slot of epochs (n x 2), as float (may be out of
+        the grid)
+        """
+        (s0, f0), (ss, sf) = self._grid['start'], self._grid['step']
+        dt = (tai[:, 0] - s0) + (tai[:, 1] - f0) / self.FRAC_MULTIPLIER
+        return np.round(dt / (ss + sf / self.FRAC_MULTIPLIER))
+
+    def _materialize(self):
+        grid = self._grid
+        pos = np.setdiff1d(np.arange(grid['count'], dtype=np.int64),
+                           grid['missing'], assume_unique=True)
+        out = self._grid_epochs(pos)
+        out[np.searchsorted(pos, grid['irregular'])] = grid['irregular_tai']
+        return out
+
+    def _grid_rows(self, rows):
+        """ exact epochs (n x 2) of the rows (indices in the object, >= 0)
+        of a compressed object
+        """
+        grid = self._grid
+        rows = np.asarray(rows, dtype=np.int64)
+        # row r is slot r + number of missing slots before it
+        shifted = grid['missing'] - np.arange(len(grid['missing']))
+        slots = rows + np.searchsorted(shifted, rows, side='right')
+        out = self._grid_epochs(slots)
+        if len(grid['irregular']):
+            irr = np.minimum(np.searchsorted(grid['irregular'], slots),
+                             len(grid['irregular']) - 1)
+            is_irr = grid['irregular'][irr] == slots
+            out[is_irr] = grid['irregular_tai'][irr[is_irr]]
+        return out
+
+    def getTaiSeconds(self):
+        """ the n x 2 epochs, without decompressing compressed objects (the
+        epochs built from the grid are cached, read-only, see clear_cache).
+        To be used for reading only: for uncompressed objects this is the
+        tai_seconds array itself.
+
+        Output
+        ----------
+        tai_seconds : numpy array (nx2) int64
+        """
+        if self._grid is None:
+            return self._tai_seconds
+        key = ('getTaiSeconds', (), ())
+        out = self._lookup(key)
+        if out is None:
+            out = self._materialize()
+            if (not self._store(key, out)
+                    and self._call_results is not None):
+                self._call_results[key] = out
+        return out
+
+    def compress(self, max_exceptions=0.25):
+        """ store sorted, mostly regular epochs as a grid (start, step,
+        count) plus the lists of missing slots and of off-grid epochs. The
+        step is the most frequent interval. Epochs are regular in TAI: a UTC
+        grid spanning a leap second is not compressed well.
+
+        Parameters
+        ----------
+        max_exceptions : float
+            maximum number of missing and off-grid slots, as a fraction of
+            the number of epochs
+
+        Returns
+        -------
+        bool : True if the object is (now) compressed
+        """
+        if self._grid is not None:
+            return True
+        tai = self._tai_seconds
+        if tai is None or tai.shape[0] < 2:
+            return False
+        frac_mul = int(self.FRAC_MULTIPLIER)
+        dsec = np.diff(tai[:, 0])
+        dfrac = np.diff(tai[:, 1])
+        dsec[dfrac < 0] -= 1
+        dfrac[dfrac < 0] += frac_mul
+        if np.any((dsec < 0) | ((dsec == 0) & (dfrac == 0))):
+            # not strictly increasing
+            return False
+        if np.all(dsec == dsec[0]) and np.all(dfrac == dfrac[0]):
+            step = [dsec[0], dfrac[0]]
+        else:
+            # Most frequent seconds of the intervals, then most frequent
+            # fraction among them (1-D sorts only)
+            values, counts = np.unique(dsec, return_counts=True)
+            step = [values[np.argmax(counts)]]
+            values, counts = np.unique(dfrac[dsec == step[0]],
+                                       return_counts=True)
+            step.append(values[np.argmax(counts)])
+        self._grid = {'start': [int(v) for v in tai[0]],
+                      'step': [int(v) for v in step],
+                      'count': 0}
+        slots = self._grid_slots(tai).astype(np.int64)
+        if np.any(np.diff(slots) <= 0):
+            self._grid = None
+            return False
+        off = np.any(self._grid_epochs(slots) != tai, axis=1)
+        if slots[-1] + 1 == len(slots):
+            missing = np.zeros(0, np.int64)
+        else:
+            missing = np.setdiff1d(np.arange(slots[-1] + 1, dtype=np.int64),
+                                   slots, assume_unique=True)
+        if len(missing) + np.count_nonzero(off) > max_exceptions * len(tai):
+            self._grid = None
+            return False
+        self._grid.update(count=int(slots[-1]) + 1, missing=missing,
+                          irregular=slots[off], irregular_tai=tai[off])
+        self._tai_seconds = None
+        return True
+
+    def index_of(self, epochs):
+        """ index of epochs in the object
+        Parameters
+        ----------
+        epochs : taiseconds object
+
+        Returns
+        ----------
+        idx : numpy array (nx1) int64, -1 for epochs not found. In constant
+              time per epoch for compressed objects.
+        """
+        tai = epochs.getTaiSeconds()
+        if self._grid is None:
+            keys = np.zeros(len(self), [('s', np.int64), ('f', np.int64)])
+            keys['s'], keys['f'] = self.tai_seconds[:, 0], \
+                self.tai_seconds[:, 1]
+            order = np.argsort(keys, kind='stable')
+            query = np.zeros(len(tai), keys.dtype)
+            query['s'], query['f'] = tai[:, 0], tai[:, 1]
+            pos = np.minimum(np.searchsorted(keys[order], query),
+                             len(keys) - 1)
+            if len(keys) == 0:
+                return np.full(len(tai), -1, np.int64)
+            found = keys[order][pos] == query
+            return np.where(found, order[pos], -1)
+        grid = self._grid
+        slots = self._grid_slots(tai)
+        ok = (slots >= 0) & (slots < grid['count'])
+        slots = np.where(ok, slots, 0).astype(np.int64)
+        expected = self._grid_epochs(slots)
+        if len(grid['irregular']):
+            irr = np.minimum(np.searchsorted(grid['irregular'], slots),
+                             len(grid['irregular']) - 1)
+            is_irr = grid['irregular'][irr] == slots
+            expected[is_irr] = grid['irregular_tai'][irr[is_irr]]
+        ok &= np.all(expected == tai, axis=1)
+        nmiss = np.searchsorted(grid['missing'], slots)
+        if len(grid['missing']):
+            ok &= grid['missing'][np.minimum(nmiss, len(grid['missing']) - 1)] \
+                != slots
+        return np.where(ok, slots - nmiss, -1)
+
     def __getitem__(self, key):
         """
         this function allows the class to be index as an array. E.g. extraction 4 and 5 element of a taiseconds object (lest call it taisec) becomes taisec[[3,4]]
         """
+        grid = self._grid
+        if (grid is not None and isinstance(key, slice)
+                and key.step in (None, 1) and not len(grid['missing'])
+                and not len(grid['irregular'])):
+            # contiguous part of a regular grid: stays compressed
+            start, stop, _ = key.indices(grid['count'])
+            obj = taiseconds()
+            obj._grid = dict(grid, count=max(stop - start, 0), start=[
+                int(v) for v in self._grid_epochs([start])[0]])
+            return obj
         obj = taiseconds()
+        if grid is not None:
+            # epochs of the selected rows only, the object stays compressed
+            n = len(self)
+            if isinstance(key, slice):
+                rows = np.arange(*key.indices(n))
+            elif np.asarray(key).dtype == np.bool_:
+                rows = np.flatnonzero(key)
+            else:
+                rows = np.asarray(key, dtype=np.int64)
+                if np.any((rows < -n) | (rows >= n)):
+                    raise IndexError("index out of bounds")
+                rows = np.where(rows < 0, rows + n, rows)
+            epochs = self._grid_rows(np.atleast_1d(rows))
+            obj.tai_seconds = epochs[0] if np.ndim(rows) == 0 else epochs
+            return obj
         obj.tai_seconds = self.tai_seconds[key,:]
         return obj
 
@@ -329,6 +892,7 @@ class taiseconds:
         this function allows the class to be index as an array. E.g. substituing epoch 4 and 5 of of a taiseconds object (lest call it taisec) with an other taisecond object (lets call it taisec2) becomes taisec[[3,4]] = taisec
         """
         self.tai_seconds[key,:] = value.tai_seconds
+        self.clear_cache()
 
 
 
@@ -337,6 +901,9 @@ class taiseconds:
         this function is used in the construction method after the input data are trated naively as if not leap second exist
 
         """
+        self.clear_cache()
+        if self.tai_seconds.shape[0] == 0:
+            return
         min_taisec = np.min(self.tai_seconds[:,0])
         max_taisec = np.max(self.tai_seconds[:,0])
 
@@ -358,13 +925,17 @@ class taiseconds:
             if max_taisec > 0:
                 print("WARNING: UTC TAI difference between 1 1 1958 and 1 1 1972 still nto supported")
 
+    @_memoized
     def removeLeapSecond(self):
         """
         this function is used in the output method it is the "inverse" of the applyLeapSecond function.  it does not modify the object property since this a lossy operation (it can create two epochs with the same second count)
         """
+        tai = self.getTaiSeconds()
 
 
-        tai_sec = np.copy(self.tai_seconds[:,0])
+        tai_sec = np.copy(tai[:,0])
+        if tai_sec.size == 0:
+            return tai_sec, False
         min_taisec = np.min(tai_sec)
         max_taisec = np.max(tai_sec)
 
@@ -377,7 +948,7 @@ class taiseconds:
                 tai_sec[tai_sec >= self.LEAP_SEC_TAB[i,0]] -= self.LEAP_SEC_TAB[i,1]
                 count += 1
             else:
-                idx = np.logical_and(self.tai_seconds[:,0] >= self.LEAP_SEC_TAB[i,0],self.tai_seconds[:,0] < self.LEAP_SEC_TAB[i+1,0])
+                idx = np.logical_and(tai[:,0] >= self.LEAP_SEC_TAB[i,0],tai[:,0] < self.LEAP_SEC_TAB[i+1,0])
                 tai_sec[idx] -= self.LEAP_SEC_TAB[i,1]
                 count += 1
         # leap second can not be represented in a non lap second scale
@@ -391,6 +962,7 @@ class taiseconds:
         return tai_sec, count > 1
 
 
+    @_memoized
     def getMJD(self):
         """ get the MJD
         Parameters
@@ -401,11 +973,13 @@ class taiseconds:
         mjd : numpy array (nx1) float64 MJDS
 
         """
+        tai = self.getTaiSeconds()
         tai_sec, cross_leap = self.removeLeapSecond()
         if cross_leap:
             print('WARNING: leap second crossed, causality could be compromised')
-        return tai_sec.astype(np.float64)/86400+(self.tai_seconds[:,1]/self.FRAC_MULTIPLIER).astype(np.float64)/86400 + self.MJD_TAI0
+        return tai_sec.astype(np.float64)/86400+(tai[:,1]/self.FRAC_MULTIPLIER).astype(np.float64)/86400 + self.MJD_TAI0
 
+    @_memoized
     def getIntMJDSOD(self):
         """ get the MJD
         Parameters
@@ -416,10 +990,11 @@ class taiseconds:
         mjd_sod : (numpy array, numpyarray) int64 MJDS and second of the day
 
         """
+        tai = self.getTaiSeconds()
         tai_sec, cross_leap= self.removeLeapSecond()
         if cross_leap:
             print('WARNING: leap second crossed, causality could be compromised')
-        sod = np.int64(np.remainder(tai_sec,86400)) + np.int64(np.round(self.tai_seconds[:,1]/self.FRAC_MULTIPLIER))
+        sod = np.int64(np.remainder(tai_sec,86400)) + np.int64(np.round(tai[:,1]/self.FRAC_MULTIPLIER))
         mjd = np.int64(np.floor(tai_sec/86400)) +  self.MJD_TAI0
         mjd[sod == 86400] += 1
         sod[sod == 86400] = 0
@@ -446,19 +1021,30 @@ class taiseconds:
         ----------
         unixsec : numpy array (nx1) int64 unixseconds
         """
-        tai_sec, cross_leap = self.removeLeapSecond()
+        unix, cross_leap = self._unixTimeInt()
         if cross_leap and not(disable_warn):
             print('WARNING: leap second crossed, causality could be compromised')
-        return tai_sec + self.UNIX_TAI0
+        return unix
 
+    @_memoized
+    def _unixTimeInt(self):
+        """ getUnixTimeInt and whether a leap second is crossed, cached
+        whatever disable_warn
+        """
+        tai_sec, cross_leap = self.removeLeapSecond()
+        return tai_sec + self.UNIX_TAI0, cross_leap
+
+    @_memoized
     def isLeapSec(self):
         " get leaps second index"
+        tai = self.getTaiSeconds()
 
-        idx = np.full((self.tai_seconds.shape[0],),False)
+        idx = np.full((tai.shape[0],),False)
         for i in range(1,self.LEAP_SEC_TAB.shape[0]):
-            idx = np.logical_or(idx,self.tai_seconds[:,0] == (self.LEAP_SEC_TAB[i,0]-1))
+            idx = np.logical_or(idx,tai[:,0] == (self.LEAP_SEC_TAB[i,0]-1))
         return idx
 
+    @_memoized
     def getCalendarDate(self):
         """ get the calendar date
         Parameters
@@ -473,24 +1059,23 @@ class taiseconds:
         minutes   : numpy array (nx1) int64
         seconds   : numpy array (nx1) float64
         """
+        tai = self.getTaiSeconds()
         is_leap = self.isLeapSec()
         unixsec = self.getUnixTimeInt(True)
-        dt = np.array(unixsec, dtype='datetime64[s]')
-        # see https://stackoverflow.com/questions/13648774/get-year-month-or-day-from-numpy-datetime64
-        Y, M, D, h, m, s = [dt.astype(f"M8[{x}]") for x in "YMDhms"]
-        years = Y.astype(np.int64) + 1970
-        months = (M - Y).astype(np.int64) + 1 # month
-        days = (D - M).astype(np.int64) + 1 # day
-        hours = (dt - D).astype("m8[h]").astype(np.int64) # hour
-        minutes = (dt - h).astype("m8[m]").astype(np.int64) # minute
-        seconds = (dt - m).astype("m8[s]").astype(np.int64) # second
-
-        seconds = seconds + self.tai_seconds[:,1]/self.FRAC_MULTIPLIER
+        day_number = unixsec // 86400
+        sod = unixsec - day_number*86400
+        years, months, days = civil_from_days(day_number)
+        hours = sod // 3600
+        minutes = sod // 60 % 60
+        seconds = sod % 60
+
+        seconds = seconds + tai[:,1]/self.FRAC_MULTIPLIER
 
         seconds[is_leap] += 1
 
         return years, months, days, hours, minutes, seconds
 
+    @_memoized
     def getNPDateTime(self):
         """ get the calendar date
         Parameters
@@ -498,21 +1083,55 @@ class taiseconds:
 
         Output
         ----------
-        dates     : numpy array (nx1) datetime64
+        dates     : numpy array (nx1) datetime64[ns], rounded to the
+                    nearest nanosecond. Leap seconds (:60) are shown as the
+                    next second, datetime64 can not represent them.
         
         """
-        years, months, days, hours, minutes, seconds = self.getCalendarDate()
-        years = np.asarray(years) - 1970
-        months = np.asarray(months) - 1
-        days = np.asarray(days) - 1
-        nanoseconds = np.round(np.remainder(seconds*1e6,1)*1e3)
-        microseconds = np.floor(np.remainder(seconds*1e3,1)*1e3)
-        milliseconds = np.floor(np.remainder(seconds,1)*1e3)
-        seconds = np.floor(seconds)
-        types = ('<M8[Y]', '<m8[M]', '<m8[D]', '<m8[h]','<m8[m]', '<m8[s]','<m8[ms]', '<m8[us]')#   '<m8[ns]')
-        vals = (years, months, days, hours,minutes, seconds,milliseconds, microseconds)# nanoseconds)
-        return sum(np.asarray(v, dtype=t) for t, v in zip(types, vals) if v is not None)
+        tai = self.getTaiSeconds()
+        is_leap = self.isLeapSec()
+        unixsec = self.getUnixTimeInt(True) + is_leap
+        frac_per_ns = int(self.FRAC_MULTIPLIER) // 10**9
+        nanoseconds = (tai[:,1] + frac_per_ns // 2) // frac_per_ns
+        return (unixsec*10**9 + nanoseconds).astype('datetime64[ns]')
+
+
+    def toISO8601(self, decimals=3):
+        """ get ISO 8601 UTC strings 'YYYY-MM-DDTHH:MM:SS.fffZ', built
+        together as a byte matrix
+        Parameters
+        ----------
+        decimals : int number of decimals of the seconds (0 to 16), the
+                   fraction is truncated
 
+        Output
+        ----------
+        dates : numpy array (nx1) str, leap seconds as :60
+        """
+        tai = self.getTaiSeconds()
+        is_leap = self.isLeapSec()
+        unixsec = self.getUnixTimeInt(True)
+        day_number = unixsec // 86400
+        sod = unixsec - day_number*86400
+        years, months, days = civil_from_days(day_number)
+        values = [years, months, days, sod // 3600, sod // 60 % 60,
+                  sod % 60 + is_leap]
+        fields = [(0, 4), (5, 2), (8, 2), (11, 2), (14, 2), (17, 2)]
+        width = 20 + (decimals + 1 if decimals > 0 else 0)
+        mat = np.zeros((len(unixsec), width), np.uint8)
+        mat[:, [4, 7]] = ord('-')
+        mat[:, 10] = ord('T')
+        mat[:, [13, 16]] = ord(':')
+        if decimals > 0:
+            mat[:, 19] = ord('.')
+            fields.append((20, decimals))
+            values.append(tai[:,1]
+                          // (int(self.FRAC_MULTIPLIER) // 10**decimals))
+        for (pos, k), v in zip(fields, values):
+            for i in range(k):
+                mat[:, pos + i] = ord('0') + (v // 10**(k - 1 - i)) % 10
+        mat[:, -1] = ord('Z')
+        return mat.view('S{}'.format(width)).ravel().astype(str)
 
     def getGPSWeekSow(self):
         """ create the object from a numpy array of MJDs
@@ -522,10 +1141,11 @@ class taiseconds:
         sow  : numpy array (nx) second of the week
 
         """
-        gpsec = self.tai_seconds[:,0] - self.TAISEC_GPS0
+        tai = self.getTaiSeconds()
+        gpsec = tai[:,0] - self.TAISEC_GPS0
 
         week = np.floor(gpsec/(7*86400))
-        sow  = np.remainder(gpsec,(7*86400)) + self.tai_seconds[:,1]/self.FRAC_MULTIPLIER
+        sow  = np.remainder(gpsec,(7*86400)) + tai[:,1]/self.FRAC_MULTIPLIER
 
         return week,sow
 
@@ -537,10 +1157,11 @@ class taiseconds:
         sow  : numpy array (nx) second of the week
 
         """
-        bdsec = self.tai_seconds[:,0] - self.TAISEC_BDS0
+        tai = self.getTaiSeconds()
+        bdsec = tai[:,0] - self.TAISEC_BDS0
 
         week = np.floor(bdsec/(7*86400))
-        sow  = np.remainder(bdsec,(7*86400)) + self.tai_seconds[:,1]/self.FRAC_MULTIPLIER
+        sow  = np.remainder(bdsec,(7*86400)) + tai[:,1]/self.FRAC_MULTIPLIER
 
         return week,sow
 
@@ -552,13 +1173,15 @@ class taiseconds:
         sow  : numpy array (nx) second of the week
 
         """
-        gasec = self.tai_seconds[:,0] - self.TAISEC_GAL0
+        tai = self.getTaiSeconds()
+        gasec = tai[:,0] - self.TAISEC_GAL0
 
         week = np.floor(gasec/(7*86400))
-        sow  = np.remainder(gasec,(7*86400)) + self.tai_seconds[:,1]/self.FRAC_MULTIPLIER
+        sow  = np.remainder(gasec,(7*86400)) + tai[:,1]/self.FRAC_MULTIPLIER
 
         return week,sow
 
+    @_memoized
     def getFromMinEpoch(self):
         """
         get difference from min epoch
@@ -568,9 +1191,10 @@ class taiseconds:
         diff : numpy array of float with difference from the first epoch
 
         """
+        tai = self.getTaiSeconds()
 
-        min_sec = np.min(self.tai_seconds[:,0])
-        return (self.tai_seconds[:,0]-min_sec) + self.tai_seconds[:,1]/self.FRAC_MULTIPLIER, min_sec
+        min_sec = np.min(tai[:,0])
+        return (tai[:,0]-min_sec) + tai[:,1]/self.FRAC_MULTIPLIER, min_sec
 
     def intersect(self,taisec2,rate=None):
         """
@@ -705,6 +1329,7 @@ class taiseconds:
             self.tai_seconds = to_append_obj.tai_seconds
         else:
             self.tai_seconds = np.vstack([self.tai_seconds, to_append_obj.tai_seconds])
+        self.clear_cache()
             
     def __gt__(self, taisec_comp):
         """
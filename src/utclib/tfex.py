@@ -15,19 +15,229 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import functools
 import logging
 import numpy as np
 import re
 
-from utclib.tabarray import tabarray
-from utclib.taiseconds import taiseconds
+from utclib import profiling
+from utclib.compression import open_text
+from utclib.tabarray import tabarray, coltabarray
+from utclib.taiseconds import taiseconds, decimal_from_text
 import utclib.tfexhdr as tfexhdr
 
-# Regex for parsing format string
-p = re.compile(r"(?P<fill>0?)(?P<width>\d+)\.?(?P<prec>\d*)(?P<type>[dfs])")
+# Regex for parsing format string, compiled on first use (re caches it)
+FORMAT_PATTERN = r"(?P<fill>0?)(?P<width>\d+)\.?(?P<prec>\d*)(?P<type>[dfs])"
 type_conv = {"d": np.int32,
              "f": np.float64,
              "s": str}
+# Text decoded in place of a missing value ('*'), which is flagged in the
+# validity mask of its column (see tabarray.set_valid)
+missing_fill = {np.int32: "0",
+                np.int64: "0",
+                np.float64: "nan",
+                str: ""}
+# Value of the time units of COLUMNS, in seconds
+unit_scales = {"si:second": 1.,
+               "si:millisecond": 1e-3,
+               "si:microsecond": 1e-6,
+               "si:nanosecond": 1e-9,
+               "si:picosecond": 1e-12}
+# Layouts of the data table, see utclib.tabarray
+storages = {"records": tabarray, "columns": coltabarray}
+# Authorized sets of timetags: labels of the timetag columns, and the
+# scales selecting their conversion (None : scale not used, see
+# docs/tfex/README.md)
+# Other names of the GNSS time scales (e.g. in test_data/input.tfex)
+scale_aliases = {"gpstime": "gps",
+                 "galtime": "gal",
+                 "bdstime": "bds"}
+timetag_sets = {("MJD", "SoD"): None,
+                ("MJD", ): None,
+                ("Unix", ): None,
+                ("WN", "SoW"): ("gps", "gal", "bds") + tuple(scale_aliases),
+                ("ISO8601", ): None}
+# Constructors of the GNSS week / second of week timetags, per scale
+week_sow_conv = {"gps": taiseconds.fromGPSWeekSow,
+                 "gal": taiseconds.fromGALWeekSow,
+                 "bds": taiseconds.fromBDSWeekSow}
+week_sow_conv.update({alias: week_sow_conv[name]
+                      for alias, name in scale_aliases.items()})
+
+
+def new_table(n, dtype, storage="records"):
+    """ Uninitialized data table of n rows
+
+    Parameters
+    ----------
+    n : int
+    dtype : list of (label, type)
+    storage : str
+        'records' (tabarray, one structured array) or 'columns'
+        (coltabarray, one contiguous array per column)
+    """
+    if storage not in storages:
+        logging.error("Unknown storage: %s" % storage)
+        raise SystemExit
+    if storage == "columns":
+        return coltabarray.empty(n, dtype)
+    return tabarray(np.empty((n, ), dtype=dtype))
+
+
+def scaled_dtype(width, prec):
+    """ Integer type of the counts of 10**-prec of a 'width.precf' column:
+    int32 if all the values it can represent fit, int64 otherwise
+    """
+    digits = width - (1 if prec else 0)
+    return np.int32 if digits <= 9 else np.int64
+
+
+def scaled_columns(columns, labels=None):
+    """ {label: number of decimals} of the fixed-point ('f') data columns
+
+    Parameters
+    ----------
+    columns : list of dict
+        COLUMNS of a tfex header
+    labels : list of str (opt)
+        restrict to these columns
+    """
+    scales = {}
+    for c in columns:
+        m = re.search(FORMAT_PATTERN, c["format"])
+        if (c.get("timetag") is True or m["type"] != "f"
+                or (labels is not None and c["label"] not in labels)):
+            continue
+        scales[c["label"]] = int(m["prec"] or 0)
+    return scales
+
+
+def parse_scaled(texts, prec, dtype=np.int64):
+    """ Exact decoding of decimal texts into counts of 10**-prec (rounded
+    if they have more decimals), see taiseconds.decimal_from_text
+
+    Parameters
+    ----------
+    texts : list of str
+    prec : int
+        number of decimals
+    dtype : numpy integer type
+
+    Returns
+    -------
+    numpy array of dtype
+    """
+    decoded = decimal_from_text(texts)
+    if decoded is None:
+        logging.error("Invalid fixed-point values")
+        raise SystemExit
+    ints, frac = decoded
+    if prec > 16:
+        return (ints*10**prec + frac*10**(prec - 16)).astype(dtype)
+    unit = 10**(16 - prec)
+    return (ints*10**prec + (frac + unit//2) // unit).astype(dtype)
+
+
+def format_scaled(counts, prec, width, fill=""):
+    """ Exact decimal texts of counts of 10**-prec, right-aligned on width
+    characters (padded with zeros if fill is '0'). The texts are built as a
+    character matrix, one column of digits at a time.
+
+    Parameters
+    ----------
+    counts : numpy integer array, or (whole, part) pair of integer arrays
+        for whole + part * 10**-prec, with 0 <= part < 10**prec (values
+        whose counts would overflow int64, see scaled_seconds)
+    prec : int
+        number of decimals
+    width : int
+    fill : str
+        '0' to pad with zeros
+
+    Returns
+    -------
+    list of str
+    """
+    p10 = 10**prec
+    if isinstance(counts, tuple):
+        whole, part = (np.asarray(a, dtype=np.int64) for a in counts)
+    else:
+        whole, part = np.divmod(np.asarray(counts, dtype=np.int64), p10)
+    # Sign and magnitude
+    negative = whole < 0
+    carry = negative & (part > 0)
+    ipart = np.where(negative, -whole - carry, whole)
+    fpart = np.where(carry, p10 - part, part)
+
+    # Number of integer digits, at least one, and length of each text
+    nint = np.maximum(np.searchsorted(10**np.arange(19, dtype=np.int64),
+                                      ipart, side="right"), 1)
+    length = nint + negative + (prec + 1 if prec else 0)
+    ncol = max(width, int(length.max()) if len(length) else 0)
+    mat = np.full((len(ipart), ncol), ord("0" if fill == "0" else " "),
+                  np.uint8)
+    col = ncol - 1
+    for _ in range(prec):
+        mat[:, col] = ord("0") + fpart % 10
+        fpart //= 10
+        col -= 1
+    if prec:
+        mat[:, col] = ord(".")
+        col -= 1
+    for k in range(int(nint.max()) if len(nint) else 0):
+        digit = nint > k
+        mat[digit, col - k] = ord("0") + ipart[digit] % 10
+        ipart //= 10
+    length = np.maximum(length, width)
+    if fill == "0":
+        mat[negative, ncol - length[negative]] = ord("-")
+    else:
+        mat[negative, col - nint[negative]] = ord("-")
+    out = mat.view("S%d" % ncol).ravel().astype("U%d" % ncol).tolist()
+    if ncol > width and np.any(length < ncol):
+        out = [txt[ncol - m:] for txt, m in zip(out, length.tolist())]
+    return out
+
+
+def scaled_seconds(seconds, frac, prec):
+    """ seconds + frac / FRAC_MULTIPLIER rounded to 10**-prec, as the
+    (whole, part) pair of format_scaled, exact for any prec
+    """
+    unit = 10**max(16 - prec, 0)
+    part = (np.asarray(frac, dtype=np.int64) * 10**max(prec - 16, 0)
+            + unit // 2) // unit
+    carry = part // 10**prec
+    return np.asarray(seconds, dtype=np.int64) + carry, part - carry*10**prec
+
+
+def scaled_day_fraction(mjd, sod, frac, prec):
+    """ MJD + (sod + frac / FRAC_MULTIPLIER) / 86400 rounded to 10**-prec
+    days, as the (whole, part) pair of format_scaled, in integer arithmetic
+    (prec <= 16)
+    """
+    unit = 10**(16 - prec)
+    # Long division by 86400 : the decimals beyond the 13th go second
+    high = min(prec, 13)
+    q_high, r_high = np.divmod(np.asarray(sod, dtype=np.int64) * 10**high,
+                               86400)
+    q_low, rest = np.divmod(r_high * 10**(prec - high)
+                            + np.asarray(frac, dtype=np.int64) // unit, 86400)
+    # Round half up : the part of frac below unit does not reach 86400 / 2
+    part = q_high * 10**(prec - high) + q_low + (rest >= 43200)
+    carry = part // 10**prec
+    return np.asarray(mjd, dtype=np.int64) + carry, part - carry*10**prec
+
+
+def widen_add(counts, delta):
+    """ counts + delta for integer arrays, in the dtype of counts if the
+    result fits, in int64 otherwise
+    """
+    out = counts.astype(np.int64) + delta
+    info = np.iinfo(counts.dtype)
+    if out.size and (out.min() < info.min or out.max() > info.max):
+        return out
+    return out.astype(counts.dtype)
+
 
 class tfex:
     """
@@ -38,14 +248,60 @@ class tfex:
         self.hdr = tfexhdr.tfexhdr()
         # Content
         self.flags  = []        # List of possible flags
-        self.data   = None      # tabarray object containing the data
-        self.timestamps = None  # time stamp of the data lines [obj of taiseconds]
+        self._data  = None      # tabarray object containing the data
+        self._timestamps = None # time stamp of the data lines [obj of taiseconds]
+        # Callable returning the fully decoded tfex object, set for lazy
+        # objects until data or timestamps are first accessed
+        self._loader = None
         self.dtypes = []        # dtypes for each columns
         # List of [start, end] couples for fixed format reading/writing
         self.ranges = []
         # List of columns indexes containing data (resp. timetags)
         self.data_cols = []
         self.ttag_cols = []
+        # {label: number of decimals} of the data columns stored as scaled
+        # integers (counts of 10**-decimals), see from_file
+        self.scales = {}
+
+    @property
+    def data(self):
+        if self._loader is not None:
+            self.load()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        if self._loader is not None:
+            self.load()
+        self._data = value
+
+    @property
+    def timestamps(self):
+        if self._loader is not None:
+            self.load()
+        return self._timestamps
+
+    @timestamps.setter
+    def timestamps(self, value):
+        if self._loader is not None:
+            self.load()
+        self._timestamps = value
+
+    @property
+    def is_loaded(self):
+        return self._loader is None
+
+    def load(self):
+        """ Decode data and timestamps of a lazy tfex object (no-op
+        otherwise). Called on first access to data or timestamps.
+        """
+        loader, self._loader = self._loader, None
+        if loader is None:
+            return
+        with profiling.stage("tfex.load"):
+            loaded = loader()
+        self._data = loaded._data
+        self._timestamps = loaded._timestamps
 
     def parse_dtypes(self):
         """ extract info from the COLUMNS header
@@ -57,8 +313,12 @@ class tfex:
         start = 0
         for i, c in enumerate(col):
             # Extract relevant info from format string
-            m = p.search(c["format"])
-            self.dtypes.append((c["label"], type_conv[m["type"]]))
+            m = re.search(FORMAT_PATTERN, c["format"])
+            if c["label"] in self.scales:
+                self.dtypes.append((c["label"], scaled_dtype(
+                    int(m["width"]), self.scales[c["label"]])))
+            else:
+                self.dtypes.append((c["label"], type_conv[m["type"]]))
             # update list of ranges for data reading
             self.ranges.append([start, start + int(m["width"])])
             start += int(m["width"]) + 1
@@ -69,69 +329,168 @@ class tfex:
 
 
     @classmethod
-    def from_file(self,file_path):
+    @profiling.profiled("tfex.from_file")
+    def from_file(self, file_path, mjd_start=None, mjd_stop=None,
+                  cache=None, columns=None, lazy=False, storage="records",
+                  scaled=False):
         """create tfex object from file
         Parameters
         ----------
         file_path : str
-            file path of the tfex file
+            file path of the tfex file, compressed files (.gz, .bz2, .xz)
+            are decompressed on the fly
+        mjd_start : float (opt)
+            if set, data lines before this MJD are skipped
+        mjd_stop : float (opt)
+            if set, data lines after this MJD are skipped
+        cache : utclib.tfexcache.ParseCache or True (opt)
+            if set, the whole file is parsed once and stored in this cache
+            (True : default cache), later calls read the cache entry
+        columns : list of str (opt)
+            labels of the data columns to read, the other data columns are
+            neither decoded nor kept. Timetags are always read.
+        lazy : bool
+            if True, only the header is read, data and timestamps are
+            decoded on first access
+        storage : str
+            layout of the data table, 'records' or 'columns' (see
+            new_table)
+        scaled : bool or list of str
+            if True (or for the listed columns), fixed-point data columns
+            are stored as integer counts of their last decimal, decoded and
+            written back exactly (see scales and get_values)
         """
+        if lazy:
+            tfex_obj = self()
+            tfex_obj.hdr.read(file_path)
+            if scaled:
+                tfex_obj.scales = scaled_columns(
+                    tfex_obj.hdr.COLUMNS, None if scaled is True else scaled)
+            tfex_obj.parse_dtypes()
+            if columns is not None:
+                tfex_obj.select_columns(columns)
+            tfex_obj._loader = functools.partial(
+                self.from_file, file_path, mjd_start=mjd_start,
+                mjd_stop=mjd_stop, cache=cache, columns=columns,
+                storage=storage, scaled=scaled)
+            return tfex_obj
+
+        if cache is not None and cache is not False:
+            import utclib.tfexcache as tfexcache
+            tfex_obj = tfexcache.load(self, file_path, cache)
+            if columns is not None:
+                tfex_obj.select_columns(columns)
+            if mjd_start is not None or mjd_stop is not None:
+                tfex_obj.select_mjd_range(mjd_start, mjd_stop)
+            if scaled:
+                tfex_obj.to_scaled(None if scaled is True else scaled)
+            if storage == "columns":
+                tfex_obj.data = coltabarray.from_records(tfex_obj.data)
+            return tfex_obj
+
         tfex_obj = self()
         # First load header and parse the description of the columns
         tfex_obj.hdr.read(file_path)
+        if scaled:
+            tfex_obj.scales = scaled_columns(
+                tfex_obj.hdr.COLUMNS, None if scaled is True else scaled)
         tfex_obj.parse_dtypes()
+        # Range of the integer MJD field, used to skip lines out of the
+        # requested time range before decoding them
+        mjd_rng = None
+        labels = [c["label"] for c in tfex_obj.hdr.COLUMNS]
+        if (mjd_start is not None or mjd_stop is not None) and "MJD" in labels:
+            mjd_rng = tfex_obj.ranges[labels.index("MJD")]
+            # integer MJD of the MJD / SoD timetags, else fractional MJD
+            mjd_type = (int if tfex_obj.dtypes[labels.index("MJD")][1]
+                        is np.int32 else float)
+            day_start = -np.inf if mjd_start is None else np.floor(mjd_start)
+            day_stop = np.inf if mjd_stop is None else mjd_stop
+        # Byte ranges to decode, restricted to the selected columns
+        ranges = tfex_obj.ranges
+        line_len = ranges[-1][-1]
+        if columns is not None:
+            keep = tfex_obj.select_columns(columns)
+            ranges = [ranges[i] for i in keep]
         # Now parse the data itself
         raw_cols = []
         for col in tfex_obj.hdr.COLUMNS:
             raw_cols.append([])
-        with open(file_path) as fp:
+        # Row numbers of the missing values, per column
+        missing = [[] for col in raw_cols]
+        fills = [missing_fill[dtype] for _, dtype in tfex_obj.dtypes]
+        with profiling.stage("parse_data") as st, open_text(file_path) as fp:
             linenum = 0
             for line in fp:
                 linenum += 1
                 if line[0] == "#":
                     continue
-                if len(line) < tfex_obj.ranges[-1][-1]:
+                if len(line) < line_len:
                     logging.warning("Line %d incomplete, skipping" % linenum)
                     continue
-                # scan all values and store in separate lists
-                for i in range(len(tfex_obj.dtypes)):
-                    start, end = tfex_obj.ranges[i]
+                if mjd_rng is not None:
                     try:
-                        # take correct field, don't cast yet
-                        val = line[start:end]
-                        if val[-1] == "*":
-                            val = np.nan
-                    except IndexError:
-                        val = np.nan
+                        day = mjd_type(line[mjd_rng[0]:mjd_rng[1]])
+                    except ValueError:
+                        logging.warning("Line %d has an invalid MJD, skipping"
+                                        % linenum)
+                        continue
+                    if day < day_start or day > day_stop:
+                        continue
+                # scan all values and store in separate lists
+                for i, (start, end) in enumerate(ranges):
+                    # take correct field, don't cast yet
+                    val = line[start:end]
+                    if not val or val[-1] == "*":
+                        missing[i].append(len(raw_cols[i]))
+                        val = fills[i]
                     raw_cols[i].append(val)
-
-        # Separate timetags from data
-        dtypes_data = [tfex_obj.dtypes[i] for i in tfex_obj.data_cols]
-        dtypes_timetags = [tfex_obj.dtypes[i] for i in tfex_obj.ttag_cols]
-
-        # Allocate data arrays
-        tfex_obj.data = tabarray(np.empty((len(raw_cols[0]), ),
-                                          dtype=dtypes_data))
-        timetags = tabarray(np.empty((len(raw_cols[0]), ),
-                                      dtype=dtypes_timetags))
-        # Fill data and timetags arrays, cast vectors
-        # col = number of the column in raw_cols, i = number in category
-        for i, col in enumerate(tfex_obj.data_cols):
-            tfex_obj.data[:, i] = tfex_obj.dtypes[col][1](raw_cols[col])
-        for i, col in enumerate(tfex_obj.ttag_cols):
-            timetags[:, i] = tfex_obj.dtypes[col][1](raw_cols[col])
-        tfex_obj.ingest_timetags(timetags)
+            st.rows = len(raw_cols[0])
+
+        with profiling.stage("cast", rows=len(raw_cols[0])):
+            # Separate timetags from data
+            dtypes_data = [tfex_obj.dtypes[i] for i in tfex_obj.data_cols]
+
+            # Allocate data arrays
+            tfex_obj.data = new_table(len(raw_cols[0]), dtypes_data, storage)
+            # Fill data arrays, cast vectors
+            # col = number of the column in raw_cols, i = number in category
+            for i, col in enumerate(tfex_obj.data_cols):
+                label, dtype = tfex_obj.dtypes[col]
+                if label in tfex_obj.scales:
+                    tfex_obj.data[:, i] = parse_scaled(
+                        raw_cols[col], tfex_obj.scales[label], dtype)
+                else:
+                    tfex_obj.data[:, i] = dtype(raw_cols[col])
+                if missing[col]:
+                    valid = np.ones(len(raw_cols[col]), dtype=np.bool_)
+                    valid[missing[col]] = False
+                    tfex_obj.data.set_valid(i, valid)
+        with profiling.stage("ingest_timetags", rows=len(raw_cols[0])):
+            tfex_obj.ingest_timetag_texts(
+                {tfex_obj.dtypes[col][0]: raw_cols[col]
+                 for col in tfex_obj.ttag_cols})
+        if mjd_start is not None or mjd_stop is not None:
+            tfex_obj.select_mjd_range(mjd_start, mjd_stop)
+        if tfex_obj.hdr.MISSING_EPOCHS is False:
+            # Regular epochs: kept as a grid (see taiseconds.compress)
+            tfex_obj.timestamps.compress()
         return tfex_obj
 
 
     @classmethod
-    def from_arrays(self, input_data: list):
+    @profiling.profiled("tfex.from_arrays")
+    def from_arrays(self, input_data: list, storage="records"):
         """create tfex object from existing numpy arrays
         Parameters
         ----------
         input_data : list of (np.array, metadata)
             a numpy list containing arrays and their metadata (COLUMNS dict
-            content)
+            content). Masked values of numpy masked arrays are missing
+            values.
+        storage : str
+            layout of the data table, 'records' or 'columns' (see
+            new_table)
         """
         tfex_obj = self()
         ndata = len(input_data[0][0])
@@ -145,66 +504,404 @@ class tfex:
 
         # Separate timetags from data
         dtypes_data = [tfex_obj.dtypes[i] for i in tfex_obj.data_cols]
-        dtypes_timetags = [tfex_obj.dtypes[i] for i in tfex_obj.ttag_cols]
 
         # Allocate data arrays
-        tfex_obj.data = tabarray(np.empty((ndata, ), dtype=dtypes_data))
-        timetags = tabarray(np.empty((ndata, ), dtype=dtypes_timetags))
-        # Fill data and timetags arrays, cast vectors
+        tfex_obj.data = new_table(ndata, dtypes_data, storage)
+        # Fill data arrays and timetags, cast vectors
         # col = number in input_data, i = number in category
         for i, col in enumerate(tfex_obj.data_cols):
-            tfex_obj.data[:, i] = tfex_obj.dtypes[col][1](input_data[col][0])
-        for i, col in enumerate(tfex_obj.ttag_cols):
-            timetags[:, i] = tfex_obj.dtypes[col][1](input_data[col][0])
-        tfex_obj.ingest_timetags(timetags)
+            arr = input_data[col][0]
+            if np.ma.isMaskedArray(arr):
+                tfex_obj.data.set_valid(i, ~np.ma.getmaskarray(arr))
+                dtype = tfex_obj.dtypes[col][1]
+                arr = arr.filled(dtype(missing_fill[dtype]))
+            tfex_obj.data[:, i] = tfex_obj.dtypes[col][1](arr)
+        timetags = {}
+        for col in tfex_obj.ttag_cols:
+            label, dtype = tfex_obj.dtypes[col]
+            timetags[label] = np.asarray(input_data[col][0], dtype=dtype)
+        with profiling.stage("ingest_timetags", rows=ndata):
+            tfex_obj.ingest_timetags(timetags)
         return tfex_obj
 
+    def select_columns(self, columns):
+        """ Keep only the timetags and the given data columns, in header
+        order. hdr.COLUMNS and the column descriptions are updated.
+
+        Parameters
+        ----------
+        columns : list of str
+            labels of the data columns to keep
+
+        Returns
+        -------
+        list of int : indexes of the kept columns in the previous COLUMNS
+        """
+        labels = [c["label"] for c in self.hdr.COLUMNS]
+        for label in columns:
+            if label not in labels:
+                logging.error("No column %s in COLUMNS" % label)
+                raise SystemExit
+        keep = [i for i in range(len(labels))
+                if i in self.ttag_cols or labels[i] in columns]
+        self.hdr.COLUMNS = [self.hdr.COLUMNS[i] for i in keep]
+        self.scales = {k: v for k, v in self.scales.items()
+                       if k in columns}
+        self.dtypes = []
+        self.ranges = []
+        self.data_cols = []
+        self.ttag_cols = []
+        self.parse_dtypes()
+        if isinstance(self.data, coltabarray):
+            self.data = self.data[[self.dtypes[i][0] for i in self.data_cols]]
+        elif self.data is not None:
+            from numpy.lib.recfunctions import repack_fields
+            names = [self.dtypes[i][0] for i in self.data_cols]
+            valid = self.data.valid
+            self.data = tabarray(repack_fields(np.asarray(self.data)[names]))
+            self.data.valid = {k: v for k, v in valid.items() if k in names}
+        return keep
+
+    def add_column(self, values, metadata):
+        """ Append a data column
+
+        Parameters
+        ----------
+        values : numpy array
+            one value per data line
+        metadata : dict
+            COLUMNS entry of the new column (label, unit, format...)
+        """
+        labels = [c["label"] for c in self.hdr.COLUMNS]
+        if metadata["label"] in labels:
+            logging.error("Column %s already exists" % metadata["label"])
+            raise SystemExit
+        if len(values) != len(self.data):
+            logging.error("Input arrays should have the same size")
+            raise SystemExit
+        old = self.data
+        self.hdr.COLUMNS.append(metadata)
+        self.dtypes = []
+        self.ranges = []
+        self.data_cols = []
+        self.ttag_cols = []
+        self.parse_dtypes()
+        # Existing columns keep their dtype (possibly widened, see
+        # set_column)
+        dtypes_data = [(name, old.dtype[name]) for name in old.dtype.names]
+        dtypes_data.append(self.dtypes[-1])
+        storage = "columns" if isinstance(old, coltabarray) else "records"
+        self.data = new_table(len(old), dtypes_data, storage)
+        for i, name in enumerate(old.dtype.names):
+            self.data[:, i] = old[name]
+        self.data.valid = dict(old.valid)
+        if np.ma.isMaskedArray(values):
+            self.data.set_valid(metadata["label"], ~np.ma.getmaskarray(values))
+            dtype = self.dtypes[-1][1]
+            values = values.filled(dtype(missing_fill[dtype]))
+        self.data[:, len(old.dtype.names)] = self.dtypes[-1][1](values)
+
+    def get_values(self, label):
+        """ Values of a data column in its unit: scaled integer columns and
+        columns with missing values are converted to float64 (NaN for
+        missing values), other columns are returned as stored
+        """
+        values = self.data[label]
+        valid = self.data.get_valid(label)
+        if label in self.scales:
+            out = values / 10.0**self.scales[label]
+        elif valid is not None:
+            out = values.astype(np.float64)
+        else:
+            return values
+        if valid is not None:
+            out[~valid] = np.nan
+        return out
+
+    def set_column(self, label, values):
+        """ Replace the values of a data column, in place when they have its
+        dtype. Otherwise (e.g. scaled integers widened to int64 by
+        widen_add) the data table is rebuilt with the dtype of values.
+        """
+        old = self.data
+        values = np.asarray(values)
+        if values.dtype == old.dtype[label]:
+            old[:, label] = values
+            return
+        storage = "columns" if isinstance(old, coltabarray) else "records"
+        self.data = new_table(len(old), [
+            (name, values.dtype if name == label else old.dtype[name])
+            for name in old.dtype.names], storage)
+        for name in old.dtype.names:
+            self.data[:, name] = values if name == label else old[name]
+        self.data.valid = dict(old.valid)
+        self.dtypes = [(name, values.dtype.type if name == label else dtype)
+                       for name, dtype in self.dtypes]
+
+    def to_scaled(self, labels=None):
+        """ Store fixed-point float data columns as scaled integers (see
+        from_file). Values are rounded to the precision of the format, NaN
+        become missing values.
+
+        Parameters
+        ----------
+        labels : list of str (opt)
+            columns to convert, default : all the fixed-point data columns
+        """
+        for label, prec in scaled_columns(self.hdr.COLUMNS, labels).items():
+            if label in self.scales:
+                continue
+            values = self.data[label]
+            nan = np.isnan(values)
+            counts = np.round(np.where(nan, 0., values) * 10.0**prec)
+            width = [r[1] - r[0] for (name, _), r in
+                     zip(self.dtypes, self.ranges) if name == label][0]
+            self.scales[label] = prec
+            self.set_column(label, counts.astype(scaled_dtype(width, prec)))
+            if nan.any():
+                valid = self.data.get_valid(label)
+                self.data.set_valid(label, ~nan if valid is None
+                                    else valid & ~nan)
+
+    def timetag_set(self):
+        """ Set of timetags of the COLUMNS (see timetag_sets)
+
+        Returns
+        -------
+        (labels, scale) : tuple of str, str
+            scale is None for the sets without scale, aliases are replaced
+            by the scale name (see scale_aliases)
+        """
+        ttags = [c for c in self.hdr.COLUMNS if c.get("timetag") is True]
+        labels = tuple(c["label"] for c in ttags)
+        for tt_set, scales in timetag_sets.items():
+            if sorted(tt_set) != sorted(labels):
+                continue
+            if scales is None:
+                return tt_set, None
+            found = [str(c.get("scale")).lower() for c in ttags]
+            if (any(scale not in scales for scale in found)
+                    or len(set(scale_aliases.get(scale, scale)
+                               for scale in found)) > 1):
+                logging.error("Timetags %s should have one of the scales %s"
+                              % (list(labels), list(scales)))
+                raise SystemExit
+            return tt_set, scale_aliases.get(found[0], found[0])
+        logging.error("Unknown set of timetags %s, authorized sets: %s"
+                      % (list(labels), [list(k) for k in timetag_sets]))
+        raise SystemExit
+
     def ingest_timetags(self, timetags):
         """ Take whatever timetags are input and set self.timestamps
+
+        Parameters
+        ----------
+        timetags : tabarray or dict
+            values of the timetag columns, by label (see timetag_sets)
         """
+        tt_set, scale = self.timetag_set()
+        if tt_set == ("MJD", "SoD"):
+            if (timetags['MJD'].dtype.kind == 'i'
+                    and timetags['SoD'].dtype.kind == 'i'):
+                self.timestamps = taiseconds.fromIntMJDSoD(
+                    timetags['MJD'],
+                    timetags['SoD'])
+            else:
+                self.timestamps = taiseconds.fromMJDSoD(
+                    timetags['MJD'],
+                    timetags['SoD'])
+        elif tt_set == ("MJD", ):
+            self.timestamps = taiseconds.fromMJD(
+                np.asarray(timetags['MJD'], dtype=np.float64))
+        elif tt_set == ("Unix", ):
+            self.timestamps = taiseconds.fromUnixTime(
+                np.asarray(timetags['Unix'], dtype=np.float64))
+        elif tt_set == ("WN", "SoW"):
+            self.timestamps = week_sow_conv[scale](
+                timetags['WN'],
+                np.asarray(timetags['SoW'], dtype=np.float64))
+        else:
+            timestamps = taiseconds.fromISO8601(
+                np.char.strip(np.asarray(timetags['ISO8601'], dtype=str)))
+            if timestamps is None:
+                logging.error('Invalid ISO8601 timetags')
+                raise SystemExit
+            self.timestamps = timestamps
 
-        cols = timetags.dtype.names
+    def ingest_timetag_texts(self, texts):
+        """ Set self.timestamps from the text of the timetag columns, decoded
+        exactly into seconds and fractions (see
+        taiseconds.decimal_from_text) for the numeric sets, else passed to
+        ingest_timetags
 
-        # Timestamps : assume MJD / SoD input for now
-        if 'MJD' in cols and 'SoD' in cols:
-            self.timestamps = taiseconds.fromMJDSoD(
-                timetags['MJD'],
-                timetags['SoD'])
+        Parameters
+        ----------
+        texts : dict
+            {label: list of str} of the timetag columns
+        """
+        tt_set, scale = self.timetag_set()
+        if tt_set in (("MJD", "SoD"), ("MJD", )):
+            timestamps = taiseconds.fromMJDSoDText(texts['MJD'],
+                                                   texts.get('SoD'))
+        elif tt_set == ("Unix", ):
+            decoded = decimal_from_text(texts['Unix'])
+            timestamps = None if decoded is None \
+                else taiseconds.fromUnixTime(*decoded)
+        elif tt_set == ("WN", "SoW"):
+            week = decimal_from_text(texts['WN'])
+            decoded = decimal_from_text(texts['SoW'])
+            timestamps = None if week is None or decoded is None \
+                else week_sow_conv[scale](week[0], *decoded)
         else:
-            logging.error(
-                'Need MJD and SoD timetags, other methods not implemented yet')
+            self.ingest_timetags({'ISO8601': np.asarray(texts['ISO8601'])})
+            return
+        if timestamps is None:
+            logging.error('Invalid %s timetags' % " / ".join(tt_set))
             raise SystemExit
+        self.timestamps = timestamps
 
+    def timetag_scales(self):
+        """ Number of decimals of the float Unix, SoW and fractional MJD
+        columns, which are written exactly from counts of 10**-prec seconds
+        or days (see timetag_values)
 
+        Returns
+        -------
+        dict {label: int}
+        """
+        scales = {}
+        exact = ["Unix", "SoW"]
+        if self.timetag_set()[0] == ("MJD", ):
+            exact.append("MJD")
+        for i in self.ttag_cols:
+            c = self.hdr.COLUMNS[i]
+            m = re.search(FORMAT_PATTERN, c["format"])
+            if c["label"] in exact and m["type"] == "f":
+                scales[c["label"]] = int(m["prec"] or 0)
+        return scales
+
+    def timetag_values(self):
+        """ Values of the timetag columns computed from self.timestamps, in
+        the set of timetags of the COLUMNS. Columns of timetag_scales are
+        counts of 10**-prec seconds.
+
+        Returns
+        -------
+        dict {label: numpy array}
+        """
+        tt_set, scale = self.timetag_set()
+        prec = self.timetag_scales()
+        if tt_set == ("MJD", "SoD"):
+            return dict(zip(tt_set, self.timestamps.getIntMJDSOD()))
+        if tt_set == ("MJD", ):
+            tai_sec, _ = self.timestamps.removeLeapSecond()
+            days, sod = np.divmod(tai_sec, 86400)
+            mjd = days + taiseconds.MJD_TAI0
+            if 'MJD' in prec:
+                mjd = scaled_day_fraction(
+                    mjd, sod, self.timestamps.getTaiSeconds()[:, 1],
+                    prec['MJD'])
+            return {'MJD': mjd}
+        if tt_set == ("Unix", ):
+            unix = self.timestamps.getUnixTimeInt()
+            if 'Unix' in prec:
+                unix = scaled_seconds(
+                    unix, self.timestamps.getTaiSeconds()[:, 1], prec['Unix'])
+            return {'Unix': unix}
+        if tt_set == ("WN", "SoW"):
+            week, _ = getattr(self.timestamps,
+                              "get{}WeekSow".format(scale.upper()))()
+            week = week.astype(np.int64)
+            tai = self.timestamps.getTaiSeconds()
+            sow = (tai[:, 0] - week*86400*7
+                   - getattr(taiseconds, "TAISEC_{}0".format(scale.upper())))
+            if 'SoW' in prec:
+                sow = scaled_seconds(sow, tai[:, 1], prec['SoW'])
+            return {'WN': week, 'SoW': sow}
+        width = [c for c in self.hdr.COLUMNS if c["label"] == "ISO8601"][0]
+        width = int(re.search(FORMAT_PATTERN, width["format"])["width"])
+        return {'ISO8601': self.timestamps.toISO8601(
+            min(max(width - 21, 0), 16))}
+
+
+    def select_mjd_range(self, mjd_start=None, mjd_stop=None):
+        """ Keep only the data lines with mjd_start <= MJD <= mjd_stop
+
+        Parameters
+        ----------
+        mjd_start : float (opt)
+            first MJD to keep, no lower bound if None
+        mjd_stop : float (opt)
+            last MJD to keep, no upper bound if None
+        """
+        if len(self.data) == 0:
+            return
+        mjd = self.timestamps.getMJD()
+        keep = np.full(mjd.shape, True)
+        if mjd_start is not None:
+            keep &= mjd >= mjd_start
+        if mjd_stop is not None:
+            keep &= mjd <= mjd_stop
+        if not keep.all():
+            self.data = self.data[keep]
+            self.timestamps = self.timestamps[keep]
+
+    @profiling.profiled("tfex.write_to_file")
     def write_to_file(self,file_path):
         """ write tfex object to file
         Parameters
         ----------
         file_path : str
-            file path to which the tfex object is written
+            file path to which the tfex object is written, compressed if
+            it ends with .gz, .bz2 or .xz. Missing values (invalid in the
+            validity mask, or NaN) are written as '*'
         """
         raw_cols = []
-        # For now only support mjd/sod
-        mjds, sods = self.timestamps.getIntMJDSOD()
+        # Row numbers of the missing values, per column
+        missing = []
+        with profiling.stage("timetags", rows=len(self.data)):
+            timetags = self.timetag_values()
         # store formats
         fmts = []
+        scales = {**self.scales, **self.timetag_scales()}
         for col in self.hdr.COLUMNS:
-            if col['label'] == 'MJD':
-                raw_cols.append(mjds.tolist())
-            elif col['label'] == 'SoD':
-                raw_cols.append(sods.tolist())
+            invalid = None
+            if col.get('timetag') is True:
+                values = timetags[col['label']]
+                raw_cols.append(values if col['label'] in scales
+                                else values.tolist())
             else:
-                raw_cols.append(self.data[col['label']].tolist())
+                values = self.data[col['label']]
+                raw_cols.append(values if col['label'] in scales
+                                else values.tolist())
+                valid = self.data.get_valid(col['label'])
+                invalid = np.zeros(len(values), dtype=np.bool_) \
+                    if valid is None else ~valid
+                if values.dtype.kind == "f":
+                    invalid |= np.isnan(values)
+            missing.append([] if invalid is None
+                           else np.flatnonzero(invalid).tolist())
             fmts.append("{:" + col['format'] + "} ")
-        data_output = []
-        for i in range(len(raw_cols[0])):
-            line = ""
-            for j, col in enumerate(self.dtypes):
-                line += fmts[j].format(raw_cols[j][i])
-            data_output.append(line)
+        with profiling.stage("format", rows=len(self.data)):
+            txt_cols = []
+            for j, (start, end) in enumerate(self.ranges):
+                label = self.hdr.COLUMNS[j]['label']
+                if label in scales:
+                    m = re.search(FORMAT_PATTERN,
+                                  self.hdr.COLUMNS[j]['format'])
+                    txt = [v + " " for v in format_scaled(
+                        raw_cols[j], scales[label], end - start,
+                        m["fill"])]
+                else:
+                    txt = [fmts[j].format(v) for v in raw_cols[j]]
+                star = "*".rjust(end - start) + " "
+                for i in missing[j]:
+                    txt[i] = star
+                txt_cols.append(txt)
+            data_output = ["".join(line) for line in zip(*txt_cols)]
 
         # Write to output
-        with open(file_path, "w") as fp:
+        with profiling.stage("write"), open_text(file_path, "w") as fp:
             fp.write(self.hdr.write() + "\n")
             fp.write("\n".join(data_output))
 
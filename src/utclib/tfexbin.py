@@ -0,0 +1,184 @@
+"""
+tfexbin  - A binary companion format of tfex that can be memory-mapped
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+The text tfex format stays the exchange format. This one is meant for
+internal pipelines reading the same large links many times. Layout (all
+integers little-endian uint64):
+
+    0   magic b"TFEXBIN1"
+    8   number of rows
+    16  offset of the data records
+    24  offset of the tai_seconds array
+    32  length of the header text
+    40  length of the data dtype description
+    48  header text, identical to the one of the text file (with "#")
+    ..  data dtype description (JSON list of [label, dtype] pairs, or
+        [label, dtype, offset] for columns with a validity mask)
+    ..  data records (little-endian structured array, as in tfex.data)
+    ..  tai_seconds (n x 2 little-endian int64, as in taiseconds)
+    ..  validity masks (n bytes per masked column, see tabarray.set_valid)
+
+Arrays start on ALIGN bytes boundaries so that np.memmap views of them are
+aligned, and can be used directly as tabarray / taiseconds storage.
+"""
+import json
+import logging
+import struct
+import numpy as np
+
+from utclib import profiling
+from utclib.tabarray import tabarray
+from utclib.taiseconds import taiseconds
+import utclib.tfex as tfex
+
+MAGIC = b"TFEXBIN1"
+ALIGN = 64
+PREFIX = struct.Struct("<8s5Q")
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+@profiling.profiled("tfexbin.write_to_file")
+def write_to_file(tf, file_path):
+    """ Write a tfex object to a binary tfex file
+
+    Parameters
+    ----------
+    tf : utclib.tfex.tfex
+    file_path : str
+    """
+    data = np.asarray(tf.data)
+    dtype = data.dtype.newbyteorder('<')
+    data = np.ascontiguousarray(data.astype(dtype, copy=False))
+    tai = np.ascontiguousarray(tf.timestamps.getTaiSeconds(), dtype='<i8')
+    if len(tai) != len(data):
+        logging.error("Timestamps and data should have the same size")
+        raise SystemExit
+
+    hdr_text = tf.hdr.write().encode('utf-8')
+    valid = getattr(tf.data, "valid", {})
+    # Offsets of the masks depend on the length of the description
+    # including them: iterate until stable
+    data_offset = 0
+    while True:
+        tai_offset = _align(data_offset + data.nbytes)
+        mask_offsets = {}
+        offset = tai_offset + tai.nbytes
+        for name in dtype.names:
+            if name in valid:
+                offset = mask_offsets[name] = _align(offset)
+                offset += len(data)
+        dtype_text = json.dumps(
+            [[name, dtype[name].str] + ([mask_offsets[name]]
+                                        if name in mask_offsets else [])
+             for name in dtype.names]).encode('utf-8')
+        offset = _align(PREFIX.size + len(hdr_text) + len(dtype_text))
+        if offset == data_offset:
+            break
+        data_offset = offset
+
+    with open(file_path, "wb") as fp:
+        fp.write(PREFIX.pack(MAGIC, len(data), data_offset, tai_offset,
+                             len(hdr_text), len(dtype_text)))
+        fp.write(hdr_text)
+        fp.write(dtype_text)
+        fp.write(b"\0" * (data_offset - fp.tell()))
+        fp.write(data.tobytes())
+        fp.write(b"\0" * (tai_offset - fp.tell()))
+        fp.write(tai.tobytes())
+        for name, offset in mask_offsets.items():
+            fp.write(b"\0" * (offset - fp.tell()))
+            fp.write(np.asarray(valid[name], dtype=np.bool_).tobytes())
+
+
+@profiling.profiled("tfexbin.from_file")
+def from_file(file_path, mmap_mode='r'):
+    """ Create a tfex object from a binary tfex file
+
+    Parameters
+    ----------
+    file_path : str
+    mmap_mode : str or None
+        'r' (read-only) or 'c' (copy-on-write): data and timestamps are
+        views on the memory-mapped file, nothing is read until used.
+        None: arrays are read into memory.
+
+    Returns
+    -------
+    utclib.tfex.tfex
+    """
+    with open(file_path, "rb") as fp:
+        prefix = fp.read(PREFIX.size)
+        if len(prefix) < PREFIX.size or prefix[:8] != MAGIC:
+            logging.error("Not a binary tfex file: %s" % file_path)
+            raise SystemExit
+        _, nrows, data_offset, tai_offset, hdr_len, dtype_len = \
+            PREFIX.unpack(prefix)
+        hdr_text = fp.read(hdr_len).decode('utf-8')
+        description = json.loads(fp.read(dtype_len))
+        dtype = np.dtype([tuple(d[:2]) for d in description])
+        mask_offsets = {d[0]: d[2] for d in description if len(d) > 2}
+
+    tf = tfex.tfex()
+    tf.hdr.reads(hdr_text.splitlines())
+    # Fixed-point columns stored as integers are scaled columns
+    tf.scales = {k: v for k, v in tfex.scaled_columns(tf.hdr.COLUMNS).items()
+                 if k in dtype.names and dtype[k].kind in "iu"}
+    tf.parse_dtypes()
+
+    if mmap_mode is None:
+        with open(file_path, "rb") as fp:
+            fp.seek(data_offset)
+            data = np.fromfile(fp, dtype=dtype, count=nrows)
+            fp.seek(tai_offset)
+            tai = np.fromfile(fp, dtype='<i8', count=2 * nrows)
+    else:
+        if nrows == 0:
+            data = np.empty((0, ), dtype=dtype)
+            tai = np.empty((0, ), dtype='<i8')
+        else:
+            data = np.memmap(file_path, dtype=dtype, mode=mmap_mode,
+                             offset=data_offset, shape=(nrows, ))
+            tai = np.memmap(file_path, dtype='<i8', mode=mmap_mode,
+                            offset=tai_offset, shape=(2 * nrows, ))
+    tf.data = tabarray(data)
+    for name, offset in mask_offsets.items():
+        if mmap_mode is None:
+            with open(file_path, "rb") as fp:
+                fp.seek(offset)
+                mask = np.fromfile(fp, dtype=np.bool_, count=nrows)
+        else:
+            mask = np.memmap(file_path, dtype=np.bool_, mode=mmap_mode,
+                             offset=offset, shape=(nrows, ))
+        tf.data.valid[name] = mask
+    tf.timestamps = taiseconds()
+    tf.timestamps.tai_seconds = tai.reshape((nrows, 2))
+    return tf
+
+
+def text_to_binary(src, dst):
+    """ Convert a text tfex file to a binary tfex file
+    """
+    write_to_file(tfex.tfex.from_file(src), dst)
+
+
+def binary_to_text(src, dst):
+    """ Convert a binary tfex file to a text tfex file
+    """
+    from_file(src).write_to_file(dst)
@@ -0,0 +1,155 @@
+"""
+tfexcache  - A parse cache for tfex.from_file
+Copyright (C) 2024  Giulio Tagliaferro, Frédéric Meynadier
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Parsed files are stored as binary tfex files (see tfexbin) in a cache
+directory, under a name derived from the absolute path, size and mtime of
+the source file: modifying the source invalidates its entry, and the stale
+entry is eventually evicted. Entries are touched when used, and the least
+recently used ones are removed when the cache exceeds its size cap.
+
+    cache = tfexcache.ParseCache("/scratch/tfexcache", max_bytes=10e9)
+    tf = tfex.tfex.from_file("link.tfex", cache=cache)
+"""
+import hashlib
+import logging
+import os
+
+from utclib import profiling
+import utclib.tfexbin as tfexbin
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "utclib",
+                           "tfex")
+DEFAULT_MAX_BYTES = 2**30
+EXT = ".tfexb"
+
+_default_cache = None
+
+
+class ParseCache:
+    """ Size-capped LRU cache of parsed tfex files
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Parameters
+        ----------
+        directory : str (opt)
+            cache directory, default : $UTCLIB_CACHE_DIR or
+            ~/.cache/utclib/tfex
+        max_bytes : int
+            size cap of the cache directory
+        """
+        if directory is None:
+            directory = os.environ.get("UTCLIB_CACHE_DIR", DEFAULT_DIR)
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry_path(self, file_path):
+        """ Path of the cache entry of a source file in its current state
+        """
+        st = os.stat(file_path)
+        key = "{}\0{}\0{}".format(os.path.abspath(file_path), st.st_size,
+                                  st.st_mtime_ns)
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode('utf-8')).hexdigest() + EXT)
+
+    def get(self, file_path):
+        """ Return the cached tfex object of file_path, or None
+
+        Data and timestamps are copy-on-write maps of the cache entry: they
+        can be modified without altering the cache.
+        """
+        entry = self.entry_path(file_path)
+        if not os.path.exists(entry):
+            return None
+        try:
+            tf = tfexbin.from_file(entry, mmap_mode='c')
+        except (SystemExit, ValueError, OSError):
+            logging.warning("Invalid cache entry %s, removing it" % entry)
+            self.remove(entry)
+            return None
+        # Mark as recently used
+        os.utime(entry)
+        return tf
+
+    def put(self, file_path, tf):
+        """ Store a parsed tfex object for file_path
+        """
+        entry = self.entry_path(file_path)
+        tmp = entry + ".{}.tmp".format(os.getpid())
+        tfexbin.write_to_file(tf, tmp)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def entries(self):
+        """ List of (mtime, size, path) of the cache entries, oldest first
+        """
+        out = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(EXT):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            out.append((st.st_mtime_ns, st.st_size, path))
+        return sorted(out)
+
+    def evict(self):
+        """ Remove least recently used entries until the size cap is met
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.remove(path)
+
+
+def default_cache():
+    """ ParseCache in the default directory, created on first use
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+@profiling.profiled("tfexcache.load")
+def load(tfex_cls, file_path, cache):
+    """ from_file through a cache: return the cached object if valid,
+    otherwise parse the file and store the result
+    """
+    if cache is True:
+        cache = default_cache()
+    tf = cache.get(file_path)
+    if tf is None:
+        tf = tfex_cls.from_file(file_path)
+        cache.put(file_path, tf)
+    return tf
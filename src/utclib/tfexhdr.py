@@ -6,9 +6,11 @@ tfex header is supposed to be following TOML syntax
 A fixed set of parameters is allowed
 """
 
-import toml
 import logging
 
+from utclib import profiling
+from utclib.compression import open_text
+
 class TfexHdrError(Exception):
     pass
 
@@ -33,23 +35,34 @@ class tfexhdr:
         for kw in self.valid_keywords_and_types.keys():
             setattr(self, kw, None)
 
+    @profiling.profiled("tfexhdr.read")
     def read(self, filepath: str):
-        """ Read header from a tfex file
+        """ Read header from a tfex file (possibly compressed, see
+        utclib.compression)
+        """
+        with open_text(filepath) as fp:
+            self.reads(fp)
+
+    def reads(self, lines):
+        """ Read header from the lines of a tfex file (any iterable of
+        strings, e.g. an open file or the output of write().splitlines())
         """
-        with open(filepath) as fp:
-            buf = []
-            for line in fp:
-                if line[0] != "#":
-                    # Header stops at first line with not starting with "#"
-                    break
-                # Remove trailing '#' and removes spaces
-                buf.append(line.replace('#', '').strip())
+        buf = []
+        for line in lines:
+            if not line.startswith("#"):
+                # Header stops at first line with not starting with "#"
+                break
+            # Remove trailing '#' and removes spaces
+            buf.append(line.replace('#', '').strip())
         toml_string = "\n".join(buf)
         self.loads(toml_string)
 
     def loads(self, toml_string: str):
         """ Loads values from an input string that is valid TOML
         """
+        # toml is only needed when a header is actually parsed
+        import toml
+
         try:
             parsed_toml = toml.loads(toml_string)
         except toml.decoder.TomlDecodeError as inst:
@@ -89,13 +102,17 @@ class tfexhdr:
                     hdr_lines.append("#   {},".format(toml_repr(v)))
                 hdr_lines.append("# ]")
             else:
-                hdr_lines.append("# {} = {}".format(kw, toml_repr(val)))
+                # Multi-line strings: every line of the header needs its "#"
+                lines = "{} = {}".format(kw, toml_repr(val)).split("\n")
+                hdr_lines += ["# " + line for line in lines]
         return "\n".join(hdr_lines)
 
 
 def toml_repr(val):
     # Adjust representation of python types in TOML to keep inline dicts
     if isinstance(val, str):
+        if "\n" in val:
+            return "'''" + val + "'''"
         return "'" + val + "'"
     elif isinstance(val, dict):
         out = "{"
@@ -0,0 +1,53 @@
+from utclib import catalog, synthetic, pycggtts
+from pathlib import Path
+import shutil
+import logging
+import os
+
+p = Path(__file__).resolve().parent
+
+
+class TestCatalog:
+
+    def test_update_and_query(self, tmp_path):
+        synthetic.gen_cggtts_archive(tmp_path / 'cggtts', const='GAL',
+                                     freq='L3E', ndays=3)
+        shutil.copy(p / 'test_data' / 'input.tfex', tmp_path / 'link.tfex')
+        cat = catalog.Catalog(tmp_path / 'cat.sqlite')
+        assert(cat.update([tmp_path]) == 4)
+        assert(cat.update([tmp_path]) == 0)
+        rows = cat.find_cggtts(const='GAL', mjd_start=60001)
+        assert([r['mjd'] for r in rows] == [60001, 60002])
+        assert(rows[0]['frc'] == 'L3E')
+        assert(len(cat.find_tfex(ts='UTC(PTB)', mjd_start=60300)) == 1)
+        assert(len(cat.find_tfex(ts='UTC(OP)')) == 0)
+        tf = cat.load_tfex(dev='NICT01', lazy=True)[0]
+        assert(tf.hdr.MJDSTART == 60250)
+
+        # Incremental update: deleted files are forgotten
+        os.remove(rows[0]['path'])
+        assert(cat.update([tmp_path]) == 0)
+        assert(len(cat.find_cggtts(const='GAL')) == 2)
+
+    def test_load_multiple_files(self, tmp_path, caplog):
+        paths = synthetic.gen_cggtts_archive(tmp_path, const='GPS',
+                                             freq='L3P', ndays=2)
+        c1 = synthetic.gen_cggtts_archive(tmp_path / 'c1', const='GPS',
+                                          freq='C1', ndays=1)
+        os.mkdir(tmp_path / 'copy')
+        shutil.copy(paths[0], tmp_path / 'copy')
+        cat = catalog.Catalog(tmp_path / 'cat.sqlite')
+        cat.update([tmp_path])
+        name = os.path.basename(paths[0])
+        with caplog.at_level(logging.WARNING):
+            cg = pycggtts.load_multiple_files(
+                [{'mjd': 60000}, {'mjd': 60001}], name[2:6], 'GPS_L3P',
+                catalog=cat)
+        assert(set(cg.df['MJD']) == {60000, 60001})
+        assert("Several cggtts files" in caplog.text)
+        # M files can hold C1 or P1 : the FRC column is part of the lookup
+        marker = os.path.basename(c1[0])[2:6]
+        assert(not pycggtts.load_multiple_files(
+            [{'mjd': 60000}], marker, 'GPS_C1', catalog=cat).is_empty())
+        assert(pycggtts.load_multiple_files(
+            [{'mjd': 60000}], marker, 'GPS_P1', catalog=cat).is_empty())
@@ -0,0 +1,50 @@
+from utclib import chaining, tfex
+import numpy as np
+
+
+def make_link(ts_a, ts_b, sod, values, unit='si:nanosecond', delays=None):
+    tf = tfex.tfex.from_arrays([
+        (np.full(len(sod), 60000),
+         {'timetag': True, 'label': 'MJD', 'unit': 'si:day', 'format': '5d'}),
+        (np.asarray(sod, dtype=float),
+         {'timetag': True, 'label': 'SoD', 'unit': 'si:second',
+          'format': '8.1f'}),
+        (np.asarray(values, dtype=float),
+         {'label': 'delta_t', 'trip': ['AB'], 'unit': unit,
+          'format': '8.3f'})])
+    tf.hdr.add_refpoint(rp_id='A', rp_ts=ts_a)
+    tf.hdr.add_refpoint(rp_id='B', rp_ts=ts_b)
+    tf.hdr.CONSTANT_DELAYS = delays
+    return tf
+
+
+class TestChaining:
+
+    def test_compute(self):
+        sod = np.arange(10) * 300.
+        tf1 = make_link('UTC(X)', 'UTC(Y)', sod, np.arange(10.))
+        # Y - Z given in microseconds, shifted epochs, with a delay
+        tf2 = make_link('UTC(Y)', 'UTC(Z)', sod[3:] + 0.5, np.ones(7) * 1e-3,
+                        unit='si:microsecond')
+        tf3 = make_link('UTC(W)', 'UTC(Z)', sod[2:] + 0.5, np.ones(8) * 100,
+                        delays=[{'trip': ['AB'], 'unit': 'si:nanosecond',
+                                 'value': 5.}])
+        net = chaining.Network([tf1, tf2, tf3])
+        assert(net.nodes() == ['UTC(W)', 'UTC(X)', 'UTC(Y)', 'UTC(Z)'])
+
+        xy = net.compute('UTC(Y)', 'UTC(X)')
+        assert(np.array_equal(xy.data['delta_t'], -np.arange(10.)))
+        # No common epoch between tf1 and tf2 (0.5 s shift)
+        assert(len(net.compute('UTC(X)', 'UTC(Z)').data) == 0)
+        # Y - W = (Y - Z) - (W - Z), delay applied on W - Z
+        yw = net.compute('UTC(Y)', 'UTC(W)')
+        assert(np.allclose(yw.data['delta_t'], 1 - 105))
+        assert(len(yw.data) == 7)
+
+        pairs = net.all_pairs(max_workers=2)
+        assert(len(pairs) == 6)
+        assert(('UTC(W)', 'UTC(X)') in pairs)
+
+    def test_trip(self):
+        assert(chaining.parse_leg('AB') == ('A', 'B'))
+        assert(chaining.parse_leg('A1-B2') == ('A1', 'B2'))
@@ -0,0 +1,36 @@
+from utclib import tfex, tfexhdr, synthetic, pycggtts, catalog
+from pathlib import Path
+import numpy as np
+import gzip
+
+p = Path(__file__).resolve().parent
+
+
+class TestCompression:
+
+    def test_tfex(self, tmp_path):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        for ext in ('.gz', '.bz2', '.xz'):
+            path = tmp_path / ('out.tfex' + ext)
+            tf.write_to_file(path)
+            tf2 = tfex.tfex.from_file(path)
+            assert(np.array_equal(tf2.timestamps.tai_seconds,
+                                  tf.timestamps.tai_seconds))
+            hdr = tfexhdr.tfexhdr()
+            hdr.read(path)
+            assert(hdr.COLUMNS == tf.hdr.COLUMNS)
+        with gzip.open(tmp_path / 'out.tfex.gz', 'rt') as fp:
+            assert(fp.readline().startswith('# TFEXVER'))
+
+    def test_cggtts(self, tmp_path):
+        path = tmp_path / "gzxx0160.000"
+        n = synthetic.write_cggtts(path, nlines=50)
+        with open(path, 'rb') as fi, gzip.open(str(path) + '.gz', 'wb') as fo:
+            fo.write(fi.read())
+        path.unlink()
+        cg = pycggtts.Cggtts(const='GPS', freq='L3P', ll='XX', mo='01',
+                             mjd=60000)
+        cg.read_from_path(tmp_path)
+        assert(len(cg.df) == n)
+        cat = catalog.Catalog(tmp_path / 'cat.sqlite')
+        assert(cat.update([tmp_path]) == 1)
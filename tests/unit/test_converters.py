@@ -0,0 +1,18 @@
+from utclib import converters
+
+
+class TestConverters:
+
+    def test_tsoft_rounding(self, tmp_path):
+        # 5 decimals of a day are 0.864 s: 0.864 s and 299.808 s are
+        # rounded to the nearest second
+        filename = tmp_path / 'lab.PPPA_'
+        filename.write_text(
+            "Link LAB__A-B Tau0= 300s\n"
+            "60250.00000   1.000   1.000   0.000\n"
+            "60250.00001   2.000   2.000   0.000\n"
+            "60250.00347   3.000   3.000   0.000\n")
+        tf = converters.parse_tsoft_file(str(filename))
+        mjd, sod = tf.timestamps.getIntMJDSOD()
+        assert(list(mjd) == [60250, 60250, 60250])
+        assert(list(sod) == [0, 1, 300])
@@ -0,0 +1,52 @@
+from utclib import delays, tfex
+from pathlib import Path
+import numpy as np
+
+p = Path(__file__).resolve().parent
+
+
+class TestDelays:
+
+    def test_constant_delays(self):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        ref = tf.data['delta_t'].copy()
+        tf.hdr.CONSTANT_DELAYS.append(
+            {'trip': ['CE'], 'unit': 'si:microsecond', 'value': 0.1,
+             'type': 'CABDLY'})
+        applied = delays.apply_constant_delays(tf)
+        # ED extends the AB + CE trip, CE corrects its last leg
+        assert(len(applied) == 2)
+        assert(np.allclose(tf.data['delta_t'], ref + 202.7, equal_nan=True))
+        assert(tf.hdr.CONSTANT_DELAYS is None)
+        assert(tf.hdr.COLUMNS[-1]['trip'] == ['AB', 'CE', 'ED'])
+        assert(delays.apply_constant_delays(tf) == [])
+
+    def test_matching_delays(self):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        tf.hdr.CONSTANT_DELAYS.append(
+            {'trip': ['XA'], 'unit': 'si:nanosecond', 'value': 1.})
+        tf.hdr.CONSTANT_DELAYS.append(
+            {'trip': ['BC'], 'unit': 'si:nanosecond', 'value': 1.})
+        found, trip = delays.matching_delays(tf.hdr, ['AB', 'CE'])
+        assert([d['trip'] for d in found] == [['ED'], ['XA']])
+        assert(trip == ['XA', 'AB', 'CE', 'ED'])
+
+    def test_calibration(self):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        ref = tf.data['delta_t'].copy()
+        cal = tfex.tfex.from_arrays([
+            (np.array([60250, 60250]),
+             {'timetag': True, 'label': 'MJD', 'unit': 'si:day',
+              'format': '5d'}),
+            (np.array([2., 10.]),
+             {'timetag': True, 'label': 'SoD', 'unit': 'si:second',
+              'format': '8.3f'}),
+            (np.array([1., 2.]),
+             {'label': 'cal', 'unit': 'si:nanosecond', 'format': '8.3f'})])
+        # Epochs 0, 5, 10 s: undefined, 1 ns, 2 ns
+        assert(delays.apply_calibration(tf, 'delta_t', cal) == 1)
+        assert(tf.data['delta_t'][0] == ref[0])
+        assert(not tf.data.get_valid('delta_t')[0])
+        assert(np.allclose(tf.data['delta_t'][1:3], ref[1:3] + [1, 2]))
+        delays.apply_calibration(tf, 'delta_t', cal, sign=-1)
+        assert(np.allclose(tf.data['delta_t'][:3], ref[:3]))
@@ -0,0 +1,22 @@
+from utclib import plotting
+import numpy as np
+
+
+class TestDecimate:
+
+    def test_minmax_decimate(self):
+        x = np.arange(1000000, dtype=np.float64)
+        y = np.sin(x / 1000)
+        y[123456] = 50
+        y[500] = np.nan
+        xd, yd = plotting.minmax_decimate(x, y, 1000)
+        assert(xd.size <= 2002)
+        assert(np.all(np.diff(xd) > 0))
+        assert(yd.max() == 50)
+        assert(xd[0] == 0 and xd[-1] == 999999)
+        assert(not np.isnan(yd).any())
+
+    def test_short_series(self):
+        x = np.arange(10.)
+        xd, yd = plotting.minmax_decimate(x, x, 1000)
+        assert(np.array_equal(xd, x))
@@ -0,0 +1,26 @@
+from utclib import profiling, tfex
+from pathlib import Path
+
+p = Path(__file__).resolve().parent
+
+
+class TestProfiling:
+
+    def test_disabled(self):
+        with profiling.stage("nothing") as st:
+            st.rows = 1
+        assert(profiling.get_report() == [])
+
+    def test_from_file(self):
+        profiling.enable()
+        try:
+            tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+            report = {s["stage"]: s for s in profiling.get_report()}
+        finally:
+            profiling.disable()
+        assert("tfex.from_file" in report)
+        assert("tfex.from_file/tfexhdr.read" in report)
+        parse = report["tfex.from_file/parse_data"]
+        assert(parse["rows"] == 4)
+        assert(parse["peak_bytes"] >= 0)
+        assert(report["tfex.from_file"]["wall_s"] >= parse["wall_s"])
@@ -0,0 +1,39 @@
+from utclib import pycggtts, synthetic
+import logging
+
+
+class TestPycggtts:
+
+    def test_checksum_noiono(self, caplog):
+        cg = pycggtts.Cggtts()
+        cg.iono_avail = False
+        cg.update_cols()
+        line = [' '] * 111
+        for c in cg.cols[:-1]:
+            line[c['rng'][1] - 1] = '1'
+        line = ''.join(line)
+        ck = cg.checksum(line)
+        with caplog.at_level(logging.WARNING):
+            buf = cg.parse_data(line + ck)
+        assert(buf[cg.colnum['CK']] == ck)
+        assert("Checksum error" not in caplog.text)
+
+    def test_cggtts_missing_int(self, tmp_path):
+        path = tmp_path / "gmxx0160.000"
+        synthetic.write_cggtts(path, iono=False, nlines=20)
+        cg = pycggtts.Cggtts()
+        cg.read(path)
+        rng = [c['rng'] for c in cg.cols if c['label'] == 'DSG'][0]
+        lines = path.read_text().splitlines()
+        first = len(lines) - 20
+        w = rng[1] - rng[0] + 1
+        lines[first] = (lines[first][:rng[0] - 1] + "*" * w
+                        + lines[first][rng[1]:])
+        path.write_text("\n".join(lines) + "\n")
+        cg = pycggtts.Cggtts()
+        cg.read(path)
+        assert(str(cg.df['DSG'].dtype) == "Int64")
+        assert(cg.df['DSG'].isna().sum() == 1)
+        assert(str(cg.df['REFSYS'].dtype) == "int64")
+        assert(len(cg.refsys_weighted_average_per_epoch()) > 0)
+        assert("*" * w in cg.gen_data_output())
@@ -0,0 +1,48 @@
+from utclib import smoothing, tfex
+from utclib.smoothing import _solve_banded
+from pathlib import Path
+import numpy as np
+
+p = Path(__file__).resolve().parent
+
+
+class TestVondrak:
+
+    def test_banded_solver(self):
+        rng = np.random.default_rng(0)
+        for n in (30, 31, 32):
+            a = np.zeros((n, n))
+            for d in range(4):
+                v = rng.normal(size=n - d)
+                a += np.diag(v, -d) + (np.diag(v, d) if d else 0)
+            a += np.eye(n) * 20
+            b = rng.normal(size=n)
+            diags = [np.r_[np.zeros(d), np.diag(a, -d)] for d in range(4)]
+            assert(np.allclose(_solve_banded(diags, b),
+                               np.linalg.solve(a, b)))
+
+    def test_filter(self):
+        # Quadratics are not penalized, even with irregular sampling and gaps
+        t = np.arange(5000.) * 60 + np.random.default_rng(1).uniform(0, 6, 5000)
+        trend = 1e-10 * (t - 1e5) ** 2
+        y = trend.copy()
+        y[1000:1050] = np.nan
+        z = smoothing.vondrak(t, y, cutoff_s=7200)
+        assert(np.allclose(z, trend, rtol=0, atol=1e-5))
+        # Short periods are removed
+        t = np.arange(5000.) * 60
+        y = 1e-10 * (t - 1e5) ** 2 + np.sin(2 * np.pi * t / 600)
+        z = smoothing.vondrak(t, y, cutoff_s=7200)
+        assert(np.max(np.abs(z - y + np.sin(2 * np.pi * t / 600))
+                      [500:-500]) < 1e-3)
+        # Segments give the same result as a single solve
+        zs = smoothing.vondrak(t, y, cutoff_s=7200, segment=1000)
+        assert(np.max(np.abs(zs - z)[500:-500]) < 1e-3)
+
+    def test_tfex(self):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        smoothing.tfex_vondrak(tf, 'delta_t', 86400, new_label='smoothed')
+        assert(tf.data.dtype.names == ('delta_t', 'smoothed'))
+        assert(tf.hdr.COLUMNS[-1]['unit'] == 'si:nanosecond')
+        assert(tf.hdr.COMMENT.endswith('smoothed: Vondrak smoothing of '
+                                       'delta_t, cutoff 86400 s'))
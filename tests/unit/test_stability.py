@@ -0,0 +1,44 @@
+from utclib import stability, tfex, synthetic
+import numpy as np
+
+
+class TestStability:
+
+    def test_white_phase(self):
+        # White phase noise: oadev ~ sqrt(3) sigma / tau
+        rng = np.random.default_rng(1)
+        x = rng.normal(0, 1e-9, 100000)
+        taus, dev, n = stability.deviation(x, 1., 'oadev', [1, 10])
+        assert(np.allclose(dev * taus, np.sqrt(3) * 1e-9, rtol=0.05))
+        taus, dev, n = stability.deviation(x, 1., 'tdev', [1])
+        # m = 1: tdev = sqrt(oadev^2 tau^2 / 3) = sigma
+        assert(np.isclose(dev[0], 1e-9, rtol=0.05))
+
+    def test_reference(self):
+        # Direct evaluation of the definitions
+        rng = np.random.default_rng(2)
+        x = np.cumsum(rng.normal(0, 1, 200))
+        x[50:60] = np.nan
+        m = 3
+        d = x[2 * m:] - 2 * x[m:-m] + x[:-2 * m]
+        ref_oadev = np.sqrt(np.nanmean(d ** 2) / (2 * m ** 2))
+        s = np.array([d[j:j + m].sum() for j in range(len(d) - m + 1)])
+        ref_mdev = np.sqrt(np.nanmean(s ** 2) / (2 * m ** 4))
+        ref_adev = np.sqrt(np.nanmean(d[::m] ** 2) / (2 * m ** 2))
+        for kind, ref in (('oadev', ref_oadev), ('mdev', ref_mdev),
+                          ('adev', ref_adev)):
+            _, dev, _ = stability.deviation(x, 1., kind, [m])
+            assert(np.isclose(dev[0], ref))
+            # Same result when streamed in chunks
+            acc = stability.DeviationAccumulator(1., [m], kind)
+            for chunk in np.array_split(x, 7):
+                acc.push(chunk)
+            assert(np.isclose(acc.result()[1][0], ref))
+
+    def test_tfex(self, tmp_path):
+        path = tmp_path / "synth.tfex"
+        synthetic.write_tfex(path, ndays=2, sampling_s=300, gap_fraction=0.1)
+        tf = tfex.tfex.from_file(path)
+        taus, dev, n = stability.tfex_deviation(tf, 'delta_t', 'oadev')
+        assert(taus[0] == 300 and np.all(np.isfinite(dev)))
+        assert(n[0] < 2 * 288 - 2)
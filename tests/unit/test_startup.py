@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+p = Path(__file__).resolve().parent
+src = p.parents[1] / 'src'
+
+# Modules loaded only when needed, the start-up time itself is measured by
+# benchmarks/bench_startup.py
+HEAVY_MODULES = ['numpy', 'pandas', 'toml', 'matplotlib']
+
+SCRIPT = """
+import json, sys
+import utclib.main as main
+sys.argv = [{name!r}] + {args!r}
+try:
+    getattr(main, {name!r})()
+except SystemExit:
+    pass
+print(json.dumps({{'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_python(code):
+    env = dict(os.environ, PYTHONPATH=str(src))
+    out = subprocess.run([sys.executable, '-c', code], env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+class TestStartup:
+
+    def test_import(self):
+        code = ("import json, sys\n"
+                "import utclib\n"
+                "print(json.dumps({{'heavy': [m for m in {!r} "
+                "if m in sys.modules]}}))\n").format(HEAVY_MODULES)
+        assert(run_python(code)['heavy'] == [])
+
+    @pytest.mark.parametrize('name', ['tfexconv', 'tfexdiff', 'tfexplot'])
+    def test_entry_point(self, name):
+        res = run_python(SCRIPT.format(name=name, args=['--help'],
+                                       heavy=HEAVY_MODULES))
+        assert(res['heavy'] == [])
+
+    def test_convert(self, tmp_path):
+        args = ['-t', 'tfex', str(p / 'test_data' / 'input.tfex'),
+                '-o', str(tmp_path / 'out.tfex')]
+        res = run_python(SCRIPT.format(name='tfexconv', args=args,
+                                       heavy=HEAVY_MODULES))
+        assert(res['heavy'] == ['numpy', 'toml'])
+
+    def test_header_only(self):
+        code = (
+            "import json, sys\n"
+            "from utclib import tfexhdr\n"
+            "hdr = tfexhdr.tfexhdr()\n"
+            "hdr.read({!r})\n"
+            "print(json.dumps({{'heavy': [m for m in ['numpy', 'pandas'] "
+            "if m in sys.modules]}}))\n").format(
+                str(p / 'test_data' / 'input.tfex'))
+        assert(run_python(code)['heavy'] == [])
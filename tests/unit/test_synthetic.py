@@ -0,0 +1,41 @@
+from utclib import synthetic, pycggtts, tfex
+import logging
+
+
+class TestSynthetic:
+
+    def test_cggtts(self, tmp_path, caplog):
+        paths = synthetic.gen_cggtts_archive(
+            tmp_path, const='GAL', freq='L3E', ndays=2, ext_type='REFUTC')
+        assert(len(paths) == 2)
+        cg = pycggtts.Cggtts()
+        cg.extend('REFUTC')
+        with caplog.at_level(logging.WARNING):
+            cg.read(paths[1])
+        assert("Checksum error" not in caplog.text)
+        assert(cg.const == 'GAL' and cg.mjd == 60001)
+        assert(cg.iono_avail)
+        assert(len(cg.df) > 500)
+        assert(cg.header['CKSUM'] == synthetic.header_checksum(cg))
+
+    def test_cggtts_noiono(self, tmp_path, caplog):
+        path = tmp_path / "gmxx0160.000"
+        n = synthetic.write_cggtts(path, iono=False, nlines=100)
+        cg = pycggtts.Cggtts()
+        with caplog.at_level(logging.WARNING):
+            cg.read(path)
+        assert("Checksum error" not in caplog.text)
+        assert(len(cg.df) == n == 100)
+
+    def test_tfex(self, tmp_path):
+        path = tmp_path / "synth.tfex"
+        n = synthetic.write_tfex(path, ndays=1, ncols=2, sampling_s=30,
+                                 gap_fraction=0.1, missing_fraction=0.1)
+        tf = tfex.tfex.from_file(path)
+        assert(tf.hdr.NDATA == n == len(tf.data))
+        assert(tf.hdr.MISSING_EPOCHS)
+        assert(n < 2880)
+        assert(tf.hdr.MJDSTOP == tf.timestamps.getMJD()[-1])
+        n = synthetic.write_tfex(path, ndays=2, sampling_s=30, nlines=1000)
+        tf = tfex.tfex.from_file(path)
+        assert(tf.hdr.MJDSTOP == tf.timestamps.getMJD()[-1])
@@ -0,0 +1,54 @@
+from utclib.tabarray import tabarray
+import numpy as np
+
+
+class TestTabarray:
+
+    def test_setitem(self):
+        t = tabarray(np.zeros((6, ), dtype=[('a', np.float64), ('ab', np.int32)]))
+        t[:, 0] = np.arange(6)
+        t[::-2, 'ab'] = [1, 2, 3]
+        t[2:4, 1] = 7
+        t[-1, 0] = -1
+        assert(np.array_equal(t['a'], [0, 1, 2, 3, 4, -1]))
+        assert(np.array_equal(t['ab'], [0, 3, 7, 7, 0, 1]))
+        # 2-character labels are field names, not (row, column) keys
+        t['ab'] = 5
+        assert(np.all(t['ab'] == 5))
+        assert(t[1, 'a'] == 1 and np.array_equal(t[1:3, 0], [1, 2]))
+        t[np.int64(0)] = (9, 9)
+        assert(t[0, 1] == 9)
+
+    def test_valid(self):
+        t = tabarray(np.zeros((4, ), dtype=[('a', np.float64), ('b', np.int32)]))
+        t.set_valid('b', [True, False, True, True])
+        c = t.copy()
+        assert(np.array_equal(c.get_valid('b'), [1, 0, 1, 1]))
+        assert(np.array_equal(t[::-1].get_valid('b'), [1, 1, 0, 1]))
+        t[[0]] = t[[1]]
+        t[1] = (1, 1)
+        assert(np.array_equal(t.get_valid('b'), [0, 1, 1, 1]))
+        assert(np.array_equal(c.get_valid('b'), [1, 0, 1, 1]))
+
+
+class TestColtabarray:
+
+    def test_columns(self):
+        from utclib.tabarray import coltabarray
+        rec = tabarray(np.zeros((5, ), dtype=[('a', np.float64), ('b', np.int32)]))
+        rec[:, 0] = np.arange(5)
+        t = coltabarray.from_records(rec)
+        assert(t.dtype == rec.dtype and len(t) == 5)
+        assert(t['a'].flags.c_contiguous and t[:, 'b'].dtype == np.int32)
+        t[1:3, 1] = 7
+        assert(np.array_equal(t[:, 'b'], [0, 7, 7, 0, 0]))
+        sub = t[t['a'] > 1]
+        assert(np.array_equal(sub[:, 0], [2, 3, 4]) and sub[0] == (2, 7))
+        assert(np.array_equal(np.asarray(t)['b'], t['b']))
+        assert(t.to_records().dtype == rec.dtype)
+        t.set_valid('b', [True, False, True, True, True])
+        t[[0]] = t[[1]]
+        assert(np.array_equal(t.get_valid('b'), [0, 0, 1, 1, 1]))
+        # Contiguous inputs are not copied
+        single = np.arange(4.).view([('x', np.float64)])
+        assert(np.shares_memory(coltabarray.from_records(single)['x'], single))
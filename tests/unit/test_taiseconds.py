@@ -42,3 +42,94 @@ class TestTaiSeconds:
         print("1000 x 1 taiseconds creation time : {:.3f} ms".format(t2 * 1000))
         print("1 x 1000 taiseconds creation time : {:.3f} ms".format(t3 * 1000))
         print("1 x 1000 datetime64 creation time : {:.3f} ms".format(t4 * 1000))
+
+    def test_compress(self):
+        ts = taiseconds.taiseconds
+        t = ts.fromMJDSoD(np.full(100, 60000), np.arange(100) * 30.)
+        full = t.tai_seconds.copy()
+        # one missing epoch, one off the grid
+        t.tai_seconds = np.delete(full, 40, axis=0)
+        t.tai_seconds[70, 1] = 5
+        expected = t.tai_seconds.copy()
+        assert(t.compress() and t.is_compressed and len(t) == 99)
+        assert(np.array_equal(t.index_of(ts.fromMJDSoD(
+            np.full(3, 60000), np.array([1200., 1230., 1260.]))),
+            [-1, 40, 41]))
+        assert(np.array_equal(t.index_of(t[[70]]), [70]))
+        # Getters and indexing read the grid without decompressing it
+        assert(np.array_equal(t[[-1, 39, 40, 70]].tai_seconds,
+                              expected[[-1, 39, 40, 70]]))
+        assert(np.array_equal(t[t.getMJD() > 60000.01].tai_seconds,
+                              expected[29:]))
+        assert(t.is_compressed)
+        assert(np.array_equal(t.tai_seconds, expected))
+        assert(not t.is_compressed)
+        g = ts.fromGrid(t[[0]], 1., 10**9)
+        assert(len(g) == 10**9 and len(g[10:20]) == 10)
+        assert(g[10:20].is_compressed)
+        assert(g[10:20].tai_seconds[0, 0] == t.tai_seconds[0, 0] + 10)
+
+    def test_cache(self):
+        t = taiseconds.taiseconds.fromMJDSoD(np.full(4, 60000),
+                                             np.arange(4) * 30.)
+        mjd = t.getMJD()
+        mjd -= 60000
+        assert(t.getMJD()[0] == 60000 and mjd[0] == 0)
+        t[[1]] = t[[0]]
+        assert(t.getMJD()[1] == t.getMJD()[0])
+        t.append(t[[3]])
+        assert(len(t.getIntMJDSOD()[0]) == 5)
+        t.getUnixTimeInt(True)
+        ncached = len(t._cache)
+        t.getUnixTimeInt()
+        assert(len(t._cache) == ncached)
+        t.CACHE_MAX_BYTES = 0
+        t.clear_cache()
+        assert(t.getMJD() is not t.getMJD())
+        # Without cache, a getter still builds the epochs of a grid once
+        g = taiseconds.taiseconds.fromGrid(t[[0]], 30., 10)
+        g.CACHE_MAX_BYTES = 0
+        calls = []
+        materialize = g._materialize
+        g._materialize = lambda: calls.append(1) or materialize()
+        g.getMJD()
+        assert(len(calls) == 1)
+
+    def test_civil(self):
+        day_number = np.arange(-800000, 800000, 7)
+        years, months, days = taiseconds.civil_from_days(day_number)
+        assert(np.array_equal(taiseconds.days_from_civil(years, months, days),
+                              day_number))
+        dates = day_number.astype('datetime64[D]')
+        assert(np.array_equal(dates.astype('M8[Y]').astype(np.int64) + 1970,
+                              years))
+        t = taiseconds.taiseconds.fromUTCCalendar(
+            np.array([1969, 2024]), np.array([12, 2]), np.array([31, 29]),
+            np.array([23, 12]), np.array([59, 0]),
+            np.array([59.5, 1.123456789]))
+        assert(np.array_equal(t.getNPDateTime(), np.array(
+            ['1969-12-31T23:59:59.5', '2024-02-29T12:00:01.123456789'],
+            dtype='datetime64[ns]')))
+
+    def test_iso8601(self):
+        dates = ['2016-12-31T23:59:60.25Z', '2017-01-01 00:00:00',
+                 '2023-11-06T12:34:56.0000000000000001Z']
+        t = taiseconds.taiseconds.fromISO8601(dates)
+        assert(t.tai_seconds[1, 0] - t.tai_seconds[0, 0] == 1)
+        assert(t.tai_seconds[2, 1] == 1)
+        assert(list(t.toISO8601(2)) == ['2016-12-31T23:59:60.25Z',
+                                        '2017-01-01T00:00:00.00Z',
+                                        '2023-11-06T12:34:56.00Z'])
+        assert(t.toISO8601(16)[2] == dates[2])
+        assert(taiseconds.taiseconds.fromISO8601(['2023-11-06']) is None)
+
+    def test_decimal_text(self):
+        ints, frac = taiseconds.decimal_from_text(
+            ['  86399.0000000000000001', '-1.25', '42', ' .5'])
+        assert(list(ints) == [86399, -2, 42, 0])
+        assert(list(frac) == [1, 7500000000000000, 0, 5000000000000000])
+        assert(taiseconds.decimal_from_text(['1.2.3', '4']) is None)
+        t = taiseconds.taiseconds.fromMJDSoDText(
+            ['60000', '60000.5'], ['   3.000000000123', '0.5'])
+        assert(t.tai_seconds[1, 0] - t.tai_seconds[0, 0] == 43197)
+        assert(list(t.tai_seconds[:, 1]) == [1230000, 5000000000000000])
@@ -1,5 +1,7 @@
-from utclib import tfex
+from utclib import tfex, tfexbin, synthetic, delays
+from utclib.tabarray import masked_reduce
 from pathlib import Path
+import numpy as np
 
 p = Path(__file__).resolve().parent
 
@@ -9,8 +11,145 @@ class TestHeader:
         tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
         assert(tf.timestamps.tai_seconds[0][0] == 2077574437)
 
-    def test_write(self):
+    def test_write(self, tmp_path):
         tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
-        tf.write_to_file('output.tfex')
+        tf.write_to_file(tmp_path / 'output.tfex')
 
 
+
+    def test_columns(self, tmp_path):
+        path = tmp_path / "synth.tfex"
+        synthetic.write_tfex(path, ncols=3, sampling_s=300,
+                             missing_fraction=0.1)
+        tf = tfex.tfex.from_file(path)
+        label = tf.data.dtype.names[1]
+        tfc = tfex.tfex.from_file(path, columns=[label])
+        assert(tfc.data.dtype.names == (label, ))
+        assert([c["label"] for c in tfc.hdr.COLUMNS] == ["MJD", "SoD", label])
+        assert(np.array_equal(tfc.data[label], tf.data[label], equal_nan=True))
+        tfc.write_to_file(tmp_path / "out.tfex")
+        tfo = tfex.tfex.from_file(tmp_path / "out.tfex")
+        assert(tfo.data.dtype.names == (label, ))
+
+    def test_lazy(self):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex', lazy=True)
+        assert(not tf.is_loaded)
+        assert(tf.hdr.MJDSTART == 60250 and len(tf.hdr.REFPOINTS) == 5)
+        assert(not tf.is_loaded)
+        assert(tf.timestamps.tai_seconds[0][0] == 2077574437)
+        assert(tf.is_loaded and len(tf.data) == 4)
+
+    def test_storage_columns(self, tmp_path):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        tfc = tfex.tfex.from_file(p / 'test_data' / 'input.tfex',
+                                  storage="columns")
+        assert(tfc.data.dtype == tf.data.dtype)
+        for i, name in enumerate(tf.data.dtype.names):
+            assert(tfc.data[name].flags.c_contiguous)
+            assert(np.array_equal(tfc.data[:, i], tf.data[:, i],
+                                  equal_nan=True))
+        tfc.select_mjd_range(mjd_start=60250.5)
+        tfc.write_to_file(tmp_path / "out.tfex")
+        tfo = tfex.tfex.from_file(tmp_path / "out.tfex")
+        assert(len(tfo.data) == len(tfc.data))
+
+    def test_missing_int(self, tmp_path):
+        counts = np.ma.masked_array([3, 5, 7, 9], mask=[0, 1, 0, 0])
+        tf = tfex.tfex.from_arrays([
+            (np.array([60250, 60250, 60250, 60250]),
+             {'timetag': True, 'label': 'MJD', 'format': '5d'}),
+            (np.array([0., 300., 600., 900.]),
+             {'timetag': True, 'label': 'SoD', 'format': '9.3f'}),
+            (counts, {'label': 'nsat', 'format': '3d'})])
+        tf.write_to_file(tmp_path / "out.tfex")
+        assert("  * " in (tmp_path / "out.tfex").read_text())
+        tfo = tfex.tfex.from_file(tmp_path / "out.tfex")
+        assert(tfo.data['nsat'].dtype == np.int32)
+        assert(np.array_equal(tfo.data.get_valid('nsat'), [1, 0, 1, 1]))
+        assert(masked_reduce(tfo.data, 'nsat', np.sum) == 19)
+        nsat = tfo.get_values('nsat')
+        assert(np.isnan(nsat[1]) and nsat[2] == 7)
+        assert(masked_reduce(tfo.data[1:], 0, np.mean) == 8)
+        tfexbin.write_to_file(tfo, tmp_path / "out.tfexb")
+        tfb = tfexbin.from_file(tmp_path / "out.tfexb")
+        assert(np.array_equal(tfb.data.valid['nsat'], [1, 0, 1, 1]))
+
+    def test_scaled(self, tmp_path):
+        path = p / 'test_data' / 'input.tfex'
+        tf = tfex.tfex.from_file(path, scaled=True)
+        assert(tf.scales == {'delta_t': 3})
+        assert(tf.data['delta_t'].dtype == np.int32)
+        assert(tf.data['delta_t'][0] == -595187)
+        assert(np.array_equal(tf.get_values('delta_t'),
+                              tfex.tfex.from_file(path).data['delta_t'],
+                              equal_nan=True))
+        tf.write_to_file(tmp_path / "a.tfex")
+        tfex.tfex.from_file(tmp_path / "a.tfex",
+                            scaled=True).write_to_file(tmp_path / "b.tfex")
+        assert((tmp_path / "a.tfex").read_text()
+               == (tmp_path / "b.tfex").read_text())
+        # Widened to int64 only when the values no longer fit
+        tf.hdr.CONSTANT_DELAYS = [{"trip": ["AB"], "value": 3e9,
+                                   "unit": "si:nanosecond"}]
+        delays.apply_constant_delays(tf)
+        assert(tf.data['delta_t'].dtype == np.int64)
+        assert(tf.data['delta_t'][1] == 3000000000000 - 595271)
+        assert(tfex.format_scaled([-5, 1234], 3, 8, "0")
+               == ["-000.005", "0001.234"])
+
+    def test_timetag_sets(self, tmp_path):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        value = {'label': 'delta_t', 'unit': 'si:nanosecond',
+                 'format': '12.3f'}
+        for cols in ([('Unix', 'utc', '14.3f')],
+                     [('WN', 'gal', '4d'), ('SoW', 'gal', '10.3f')],
+                     [('ISO8601', 'utc', '24s')],
+                     [('Unix', 'utc', '21.9f')],
+                     [('WN', 'gpstime', '4d'), ('SoW', 'gpstime', '16.9f')]):
+            tf.hdr.COLUMNS = [{'timetag': True, 'label': label,
+                               'scale': scale, 'format': fmt}
+                              for label, scale, fmt in cols] + [value]
+            tf.dtypes, tf.ranges, tf.data_cols, tf.ttag_cols = [], [], [], []
+            tf.parse_dtypes()
+            tf.write_to_file(tmp_path / "a.tfex")
+            tf2 = tfex.tfex.from_file(tmp_path / "a.tfex")
+            assert(np.array_equal(tf2.timestamps.tai_seconds,
+                                  tf.timestamps.tai_seconds))
+            if cols[0][0] == 'ISO8601':
+                assert((tmp_path / "a.tfex").read_text().splitlines()[-1]
+                       .startswith('2023-11-02T00:00:15.000Z'))
+                # Sub-microsecond epochs for the 9 decimals sets
+                tai = tf.timestamps.tai_seconds.copy()
+                tai[:, 1] = 1234567890000000
+                tf.timestamps.tai_seconds = tai
+        assert((tmp_path / "a.tfex").read_text().splitlines()[-1]
+               .split()[1] == '345633.123456789')
+        tf.hdr.COLUMNS = [{'timetag': True, 'label': 'MJD',
+                           'format': '22.16f'}, value]
+        tf.dtypes, tf.ranges, tf.data_cols, tf.ttag_cols = [], [], [], []
+        tf.parse_dtypes()
+        tf.write_to_file(tmp_path / "a.tfex")
+        assert((tmp_path / "a.tfex").read_text().splitlines()[-1]
+               .split()[0] == '60250.0001750400091319')
+
+    def test_compressed_timestamps(self, tmp_path):
+        path = tmp_path / "grid.tfex"
+        synthetic.write_tfex(path, ndays=2, sampling_s=30)
+        tf = tfex.tfex.from_file(path, mjd_start=60000.5)
+        assert(tf.timestamps.is_compressed and len(tf.timestamps) == 4320)
+        tf.write_to_file(tmp_path / "out.tfex")
+        assert(tf.timestamps.is_compressed)
+
+    def test_subns_sod(self, tmp_path):
+        path = tmp_path / "subns.tfex"
+        path.write_text(
+            "# TFEXVER = '0.3'\n"
+            "# COLUMNS = [\n"
+            "# {timetag = true, label = 'MJD', scale = 'utc', format = '5d'},\n"
+            "# {timetag = true, label = 'SoD', scale = 'utc',"
+            " format = '22.16f'},\n"
+            "# {label = 'link', unit = 'si:nanosecond', format = '6.1f'},\n"
+            "# ]\n"
+            "60000 86399.1234567890123456    1.0\n")
+        tf = tfex.tfex.from_file(path)
+        assert(tf.timestamps.tai_seconds[0, 1] == 1234567890123456)
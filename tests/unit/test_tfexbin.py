@@ -0,0 +1,27 @@
+from utclib import tfex, tfexbin
+from pathlib import Path
+import numpy as np
+
+p = Path(__file__).resolve().parent
+
+
+class TestTfexBin:
+
+    def test_roundtrip(self, tmp_path):
+        tf = tfex.tfex.from_file(p / 'test_data' / 'input.tfex')
+        tfexbin.write_to_file(tf, tmp_path / 'link.tfexb')
+        tf2 = tfexbin.from_file(tmp_path / 'link.tfexb')
+        assert(not tf2.data.flags.writeable)
+        assert(tf2.hdr.COLUMNS == tf.hdr.COLUMNS)
+        assert(np.array_equal(tf2.timestamps.tai_seconds,
+                              tf.timestamps.tai_seconds))
+        assert(np.array_equal(tf2.data['delta_t'], tf.data['delta_t'],
+                              equal_nan=True))
+
+    def test_text_conversion(self, tmp_path):
+        tfex.tfex.from_file(p / 'test_data' / 'input.tfex').write_to_file(
+            tmp_path / 'a.tfex')
+        tfexbin.text_to_binary(tmp_path / 'a.tfex', tmp_path / 'a.tfexb')
+        tfexbin.binary_to_text(tmp_path / 'a.tfexb', tmp_path / 'b.tfex')
+        assert((tmp_path / 'a.tfex').read_text() ==
+               (tmp_path / 'b.tfex').read_text())
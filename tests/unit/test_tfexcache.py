@@ -0,0 +1,44 @@
+from utclib import tfex, tfexcache, profiling
+from pathlib import Path
+import numpy as np
+import shutil
+
+p = Path(__file__).resolve().parent
+
+
+class TestParseCache:
+
+    def test_hit(self, tmp_path):
+        cache = tfexcache.ParseCache(tmp_path / 'cache')
+        profiling.enable(trace_memory=False)
+        try:
+            tf1 = tfex.tfex.from_file(p / 'test_data' / 'input.tfex',
+                                      cache=cache)
+            tf2 = tfex.tfex.from_file(p / 'test_data' / 'input.tfex',
+                                      cache=cache)
+            report = {s["stage"]: s for s in profiling.get_report()}
+        finally:
+            profiling.disable()
+        assert(report["tfex.from_file/tfexcache.load"]["calls"] == 2)
+        assert(report["tfex.from_file/tfexcache.load/tfex.from_file"]
+               ["calls"] == 1)
+        assert(np.array_equal(tf1.timestamps.tai_seconds,
+                              tf2.timestamps.tai_seconds))
+        # copy-on-write: modifying the result leaves the cache unchanged
+        tf2.data['delta_t'][0] = 0
+        tf3 = tfex.tfex.from_file(p / 'test_data' / 'input.tfex',
+                                  cache=cache)
+        assert(tf3.data['delta_t'][0] == tf1.data['delta_t'][0])
+
+    def test_invalidation_and_eviction(self, tmp_path):
+        src = tmp_path / 'a.tfex'
+        shutil.copy(p / 'test_data' / 'input.tfex', src)
+        cache = tfexcache.ParseCache(tmp_path / 'cache', max_bytes=10**6)
+        tfex.tfex.from_file(src, cache=cache)
+        entry = cache.entry_path(src)
+        src.write_text(src.read_text() + "\n")
+        assert(cache.entry_path(src) != entry)
+        assert(cache.get(src) is None)
+        cache.max_bytes = 0
+        cache.evict()
+        assert(cache.entries() == [])